@@ -0,0 +1,3 @@
+"""
+Benchmarklar (qidiruv, katalog va baza hot path lari)
+"""
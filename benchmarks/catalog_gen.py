@@ -0,0 +1,140 @@
+"""
+Sintetik katalog generatori (benchmarklar uchun)
+
+Bir xil seed - bir xil katalog: natijalarni turli buildlar orasida solishtirish
+mumkin. Yozuvlar catalog.py formatida (qismli kitoblar 'parts' bilan).
+
+Ishlatish:
+    python -m benchmarks.catalog_gen 100k catalog.jsonl
+"""
+import argparse
+import json
+import random
+from typing import Dict, Iterator, Tuple
+
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+_ADJECTIVES = [
+    "Oq", "Qora", "Sariq", "Yashil", "Ko'k", "Qizil", "Oltin", "Kumush", "Yulduzli", "Sirli",
+    "Unutilgan", "So'nggi", "Birinchi", "Yo'qolgan", "Mangu", "Sokin", "G'amgin", "Shirin", "Uzoq", "Yangi",
+]
+_NOUNS = [
+    "kunlar", "tunlar", "kema", "bog'", "daryo", "tog'", "yo'l", "qishloq", "shahar", "bahor",
+    "kuz", "qish", "yoz", "osmon", "yulduz", "oy", "quyosh", "ona", "ota", "do'st",
+    "muhabbat", "sadoqat", "vatan", "tuproq", "non", "qalam", "maktub", "xotira", "orzu", "taqdir",
+    "ilm", "hikmat", "ertak", "doston", "qo'shiq", "nido", "sabr", "g'alaba", "chashma", "dala",
+]
+_TOPICS = [
+    "Matematika", "Fizika", "Kimyo", "Biologiya", "Tarix", "Geografiya", "Ona tili", "Adabiyot",
+    "Ingliz tili", "Informatika", "Iqtisodiyot", "Psixologiya", "Falsafa", "Huquq", "Tibbiyot",
+]
+_CYRILLIC = [
+    "Ўтган кунлар", "Меҳробдан чаён", "Кеча ва кундуз", "Дунёнинг ишлари", "Шум бола",
+    "Икки эшик ораси", "Сариқ девни миниб", "Юлдузли тунлар", "Улуғбек хазинаси", "Баҳор қайтмайди",
+]
+_CLASSICS = [
+    ("O'tkan kunlar", "Abdulla Qodiriy"), ("Mehrobdan chayon", "Abdulla Qodiriy"),
+    ("Kecha va kunduz", "Cho'lpon"), ("Dunyoning ishlari", "O'tkir Hoshimov"),
+    ("Ikki eshik orasi", "O'tkir Hoshimov"), ("Shum bola", "G'afur G'ulom"),
+    ("Sariq devni minib", "Xudoyberdi To'xtaboyev"), ("Yulduzli tunlar", "Pirimqul Qodirov"),
+    ("Ulug'bek xazinasi", "Odil Yoqubov"), ("Bahor qaytmaydi", "O'tkir Hoshimov"),
+    ("Boburnoma", "Zahiriddin Muhammad Bobur"), ("Xamsa", "Alisher Navoiy"),
+]
+_FIRST_NAMES = [
+    "Abdulla", "O'tkir", "Erkin", "Said", "Shukur", "Tohir", "Xurshid", "Nodira", "Zulfiya", "Halima",
+    "Asqad", "Odil", "Pirimqul", "Oybek", "G'afur", "Hamid", "Muhammad", "Lutfulla", "Sharof", "Gulchehra",
+]
+_LAST_NAMES = [
+    "Qodiriy", "Hoshimov", "Vohidov", "Ahmad", "Xolmirzayev", "Malik", "Davron", "Olimjon", "Muxtor",
+    "Yoqubov", "Qodirov", "G'ulom", "Rashidov", "Nurmatov", "Azimov", "To'xtaboyev", "Aminov", "Sodiqova",
+]
+
+
+def parse_size(value: str) -> int:
+    """'10k', '100k', '1m' yoki oddiy son"""
+    value = value.lower()
+    if value in SIZES:
+        return SIZES[value]
+    if value.endswith('k'):
+        return int(float(value[:-1]) * 1_000)
+    if value.endswith('m'):
+        return int(float(value[:-1]) * 1_000_000)
+    return int(value)
+
+
+def _author(rng: random.Random) -> str:
+    if rng.random() < 0.05:
+        return ""
+    return f"{rng.choice(_FIRST_NAMES)} {rng.choice(_LAST_NAMES)}"
+
+
+def _title(rng: random.Random, index: int) -> Tuple[str, str]:
+    roll = rng.random()
+    if roll < 0.03:
+        title, author = rng.choice(_CLASSICS)
+        # Bir asarning turli nashrlari
+        return f"{title} ({rng.randint(1990, 2024)}-nashr)", author
+    if roll < 0.10:
+        return rng.choice(_CYRILLIC), _author(rng)
+    if roll < 0.25:
+        return f"{rng.choice(_TOPICS)} {rng.randint(5, 11)}-sinf", _author(rng)
+    if roll < 0.35:
+        return f"{rng.choice(_NOUNS).capitalize()} va {rng.choice(_NOUNS)}", _author(rng)
+    if roll < 0.45:
+        return f"{rng.choice(_ADJECTIVES)} {rng.choice(_NOUNS)} {rng.randint(1, 5)}-jild", _author(rng)
+    # Noyob qism (ID) - har bir nom takrorlanmasin
+    return f"{rng.choice(_ADJECTIVES)} {rng.choice(_NOUNS)} #{index}", _author(rng)
+
+
+def _file(rng: random.Random, uid: str, file_type: str) -> Dict:
+    size = rng.randint(200_000, 50_000_000) if file_type == 'audio' else rng.randint(50_000, 20_000_000)
+    return {
+        'file_id': f"BQACAgIAAxk{uid}",
+        'file_type': file_type,
+        'file_size': size,
+        'storage_message_id': rng.randint(1, 10_000_000),
+        'storage_chat_id': "-1001234567890",
+        'file_unique_id': f"AgAD{uid}",
+    }
+
+
+def generate(count: int, seed: int = 42, multi_part_ratio: float = 0.05) -> Iterator[Tuple[int, Dict]]:
+    """(tartib raqami, yozuv) - catalog.import_records uchun"""
+    rng = random.Random(seed)
+    for index in range(1, count + 1):
+        title, author = _title(rng, index)
+        record = {
+            'title': title,
+            'author': author,
+            'description': rng.choice(["", "", f"{author} asari", "Audio kitob", "Darslik"]),
+            'upload_date': f"20{rng.randint(20, 25)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 12:00:00",
+        }
+        if rng.random() < multi_part_ratio:
+            # Qismli kitob: bir nechta audio va ba'zan e-kitob qismlari
+            audio = rng.randint(2, 30)
+            documents = rng.choice([0, 0, 1, 2])
+            record['parts'] = (
+                [_file(rng, f"{index}d{i}", 'document') for i in range(documents)] +
+                [_file(rng, f"{index}a{i}", 'audio') for i in range(audio)]
+            )
+        else:
+            file_type = 'audio' if rng.random() < 0.2 else 'document'
+            record.update(_file(rng, str(index), file_type))
+            record['parts'] = []
+        yield index, record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sintetik katalogni JSONL faylga yozish")
+    parser.add_argument('size', help="10k, 100k, 1m yoki son")
+    parser.add_argument('path')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    with open(args.path, 'w', encoding='utf-8') as f:
+        for _, record in generate(parse_size(args.size), args.seed):
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Yuklama testlari uchun lokal Bot API server (haqiqiy Telegram o'rnida)
+
+Bot ishlatadigan metodlar (getUpdates, sendMessage, copyMessage(s), getChatMember,
+editMessageText, send* fayllar va boshqalar) soxta, lekin to'g'ri tuzilgan javob
+qaytaradi. Har bir so'rovga kechikish (latency +- jitter) qo'shiladi, flood_rate
+ulushiga esa 429 (retry_after) qaytariladi. Noma'lum metodlar True qaytaradi.
+
+Boshqaruv:
+    POST /control/updates  - update (yoki ro'yxat) qo'shish, getUpdates orqali beriladi
+    GET  /control/stats    - metodlar bo'yicha so'rovlar va 429 lar soni
+    POST /control/reset    - statistikani tozalash
+
+Ishlatish:
+    python -m benchmarks.fake_api --port 8081 --latency 0.05 --flood-rate 0.01
+    TELEGRAM_API_URL=http://127.0.0.1:8081 BOT_TOKEN=123456:TEST python main.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from aiohttp import web
+
+BOT_USER = {'id': 123456789, 'is_bot': True, 'first_name': "Kitob Bot (test)", 'username': 'kitob_test_bot'}
+
+# Limit (429) va kechikish qo'shilmaydigan metodlar
+_SERVICE_METHODS = {'getupdates', 'getme', 'deletewebhook', 'close', 'logout'}
+# Fayl yuboradigan metodlar: so'rov maydoni va javobdagi obyekt
+_MEDIA_METHODS = {
+    'senddocument': 'document', 'sendaudio': 'audio', 'sendphoto': 'photo', 'sendvideo': 'video',
+    'sendvoice': 'voice', 'sendanimation': 'animation', 'sendsticker': 'sticker', 'sendvideonote': 'video_note',
+}
+
+
+def _value(raw: Any) -> Any:
+    """Form maydoni: aiogram ro'yxat va obyektlarni JSON satr sifatida yuboradi"""
+    if isinstance(raw, str) and raw[:1] in ('[', '{'):
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return raw
+    return raw
+
+
+class FakeBotAPI:
+    """Soxta Bot API: holat (xabar id lari, update navbati) va statistika xotirada"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, flood_rate: float = 0.0,
+                 retry_after: int = 1, member_status: str = 'member', seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.member_status = member_status
+        self.rng = random.Random(seed)
+        self.updates: List[Dict] = []
+        self.next_update_id = 1
+        self.updates_changed = asyncio.Event()
+        self.message_ids: Dict[int, int] = {}
+        self.usernames: Dict[str, int] = {}
+        self.requests: Counter = Counter()
+        self.flood: Counter = Counter()
+        self.started = time.monotonic()
+        self._runner: Optional[web.AppRunner] = None
+
+    # --- holat ---
+
+    def push_update(self, update: Dict) -> int:
+        """Update ni navbatga qo'shish (update_id ketma-ketligi server tomonidan beriladi)"""
+        update = {**update, 'update_id': self.next_update_id}
+        self.next_update_id += 1
+        self.updates.append(update)
+        self.updates_changed.set()
+        return update['update_id']
+
+    def _chat_id(self, raw: Any) -> int:
+        if isinstance(raw, str) and raw.startswith('@'):
+            return self.usernames.setdefault(raw, -1001000000000 - len(self.usernames))
+        return int(raw)
+
+    def _message(self, chat_id: Any, **fields) -> Dict:
+        chat = self._chat_id(chat_id)
+        self.message_ids[chat] = self.message_ids.get(chat, 0) + 1
+        return {
+            'message_id': self.message_ids[chat],
+            'date': int(time.time()),
+            'chat': {'id': chat, 'type': 'private' if chat > 0 else 'supergroup', 'title': None if chat > 0 else "Test"},
+            'from': BOT_USER,
+            **fields,
+        }
+
+    def _media(self, kind: str) -> Any:
+        uid = f"{kind}{self.rng.getrandbits(48):x}"
+        media = {'file_id': f"BQACAgIAAxk{uid}", 'file_unique_id': f"AgAD{uid}"}
+        if kind == 'photo':
+            return [{**media, 'width': 320, 'height': 240}]
+        if kind in ('video', 'animation'):
+            media.update(width=320, height=240, duration=10)
+        elif kind in ('audio', 'voice'):
+            media['duration'] = 60
+        elif kind == 'video_note':
+            media.update(length=240, duration=10)
+        elif kind == 'sticker':
+            media.update(type='regular', width=512, height=512, is_animated=False, is_video=False)
+        return media
+
+    # --- metodlar ---
+
+    async def get_updates(self, params: Dict) -> List[Dict]:
+        offset = int(params.get('offset') or 0)
+        if offset:
+            # Tasdiqlangan update lar navbatdan olib tashlanadi
+            self.updates = [u for u in self.updates if u['update_id'] >= offset]
+        timeout = min(float(params.get('timeout') or 0), 30.0)
+        if not self.updates and timeout:
+            self.updates_changed.clear()
+            try:
+                await asyncio.wait_for(self.updates_changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        limit = int(params.get('limit') or 100)
+        return self.updates[:limit]
+
+    def call(self, method: str, params: Dict) -> Any:
+        """getUpdates dan boshqa metodlar javobi"""
+        if method == 'getme':
+            return BOT_USER
+        if method == 'sendmessage':
+            return self._message(params['chat_id'], text=params.get('text', ''))
+        if method in _MEDIA_METHODS:
+            kind = _MEDIA_METHODS[method]
+            return self._message(params['chat_id'], caption=params.get('caption'), **{kind: self._media(kind)})
+        if method == 'sendmediagroup':
+            return [self._message(params['chat_id'], document=self._media('document')) for _ in params.get('media', [])]
+        if method == 'forwardmessage':
+            return self._message(params['chat_id'], text="(forward)")
+        if method == 'copymessage':
+            return {'message_id': self._message(params['chat_id'])['message_id']}
+        if method == 'copymessages':
+            return [{'message_id': self._message(params['chat_id'])['message_id']} for _ in params.get('message_ids', [])]
+        if method in ('editmessagetext', 'editmessagecaption', 'editmessagereplymarkup'):
+            if params.get('inline_message_id'):
+                return True
+            chat = self._chat_id(params['chat_id'])
+            return {**self._message(chat, text=params.get('text', '')), 'message_id': int(params['message_id'])}
+        if method == 'getchatmember':
+            user = {'id': int(params['user_id']), 'is_bot': False, 'first_name': "Test"}
+            if self.member_status == 'creator':
+                return {'status': 'creator', 'user': user, 'is_anonymous': False}
+            return {'status': self.member_status, 'user': user}
+        if method == 'getchat':
+            chat = self._chat_id(params['chat_id'])
+            return {'id': chat, 'type': 'private' if chat > 0 else 'channel', 'title': "Test kanal", 'username': 'test_channel'}
+        if method == 'exportchatinvitelink':
+            return f"https://t.me/+fake{abs(self._chat_id(params['chat_id']))}"
+        if method == 'createchatinvitelink':
+            return {
+                'invite_link': f"https://t.me/+fake{self.rng.getrandbits(32):x}", 'creator': BOT_USER,
+                'creates_join_request': False, 'is_primary': False, 'is_revoked': False,
+            }
+        return True
+
+    # --- HTTP ---
+
+    async def _api_handler(self, request: web.Request) -> web.Response:
+        method = request.match_info['method'].lower()
+        if request.content_type == 'application/json':
+            params = await request.json()
+        else:
+            params = {key: _value(value) for key, value in (await request.post()).items()}
+        self.requests[method] += 1
+
+        if method == 'getupdates':
+            return web.json_response({'ok': True, 'result': await self.get_updates(params)})
+        if method not in _SERVICE_METHODS:
+            delay = self.latency + self.rng.uniform(-self.jitter, self.jitter)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self.flood_rate and self.rng.random() < self.flood_rate:
+                self.flood[method] += 1
+                return web.json_response({
+                    'ok': False, 'error_code': 429,
+                    'description': f"Too Many Requests: retry after {self.retry_after}",
+                    'parameters': {'retry_after': self.retry_after},
+                }, status=429)
+        try:
+            result = self.call(method, params)
+        except (KeyError, ValueError, TypeError) as e:
+            return web.json_response({'ok': False, 'error_code': 400, 'description': f"Bad Request: {e}"}, status=400)
+        return web.json_response({'ok': True, 'result': result})
+
+    async def _push_handler(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        ids = [self.push_update(update) for update in (payload if isinstance(payload, list) else [payload])]
+        return web.json_response({'ok': True, 'result': ids})
+
+    async def _stats_handler(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats())
+
+    async def _reset_handler(self, request: web.Request) -> web.Response:
+        self.requests.clear()
+        self.flood.clear()
+        self.started = time.monotonic()
+        return web.json_response({'ok': True})
+
+    def stats(self) -> Dict:
+        elapsed = time.monotonic() - self.started
+        total = sum(count for method, count in self.requests.items() if method != 'getupdates')
+        return {
+            'requests': total,
+            'requests_per_sec': round(total / elapsed, 1) if elapsed else None,
+            'flood_429': sum(self.flood.values()),
+            'pending_updates': len(self.updates),
+            'methods': dict(self.requests.most_common()),
+            'flood_methods': dict(self.flood.most_common()),
+        }
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=50 * 1024 * 1024)
+        app.router.add_post('/bot{token}/{method}', self._api_handler)
+        app.router.add_get('/bot{token}/{method}', self._api_handler)
+        app.router.add_post('/control/updates', self._push_handler)
+        app.router.add_get('/control/stats', self._stats_handler)
+        app.router.add_post('/control/reset', self._reset_handler)
+        return app
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8081) -> str:
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            # Long polling dagi getUpdates kutib qolmasin
+            self.updates_changed.set()
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--latency', type=float, default=0.05, help="har bir so'rov kechikishi (soniya)")
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--flood-rate', type=float, default=0.0, help="429 qaytariladigan so'rovlar ulushi (0..1)")
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--member-status', default='member', choices=['member', 'left', 'creator'],
+                        help="getChatMember javobi (majburiy obuna tekshiruvi)")
+    parser.add_argument('--seed', type=int, default=42)
+
+
+def server_from_args(args) -> FakeBotAPI:
+    return FakeBotAPI(args.latency, args.jitter, args.flood_rate, args.retry_after, args.member_status, args.seed)
+
+
+async def serve(args):
+    server = server_from_args(args)
+    if args.updates:
+        from benchmarks.replay import load_recording
+        for _, update in load_recording(args.updates):
+            server.push_update(update)
+    url = await server.start(args.host, args.port)
+    print(f"🧪 Soxta Bot API: {url}  (TELEGRAM_API_URL={url})")
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.fake_api', description="Lokal soxta Bot API server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--updates', help="getUpdates orqali beriladigan yozib olingan update lar (JSONL)")
+    add_server_arguments(parser)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
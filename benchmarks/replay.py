@@ -0,0 +1,267 @@
+"""
+Update oqimini qayta o'ynatish: butun dispatcher ning end-to-end yuklama testi
+
+Yozib olingan (UPDATE_RECORD_PATH) yoki sintetik update lar asl vaqt oraliqlari
+bilan N marta tezroq dispatcher ga beriladi. Bot haqiqiy Telegram o'rniga soxta
+Bot API serveriga (benchmarks/fake_api.py) ulanadi, baza - vaqtinchalik nusxa.
+Natija: update/soniya va har bir update ning kelgan paytidan handler tugaguncha
+bo'lgan vaqti (p50/p90/p99), update turlari bo'yicha. Fon navbatlaridagi ishlar
+(qismli kitoblarni yuborish, ingest) bu vaqtga kirmaydi.
+
+Ishlatish:
+    python -m benchmarks.replay run updates.jsonl --speed 10 --flood-rate 0.01
+    python -m benchmarks.replay run updates.jsonl --speed 0 --catalog 100k --outbound-scale 1000
+    python -m benchmarks.replay synth 5000 synthetic.jsonl --rate 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Loyiha papkasini Python path ga qo'shish
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+
+import config
+from benchmarks.fake_api import add_server_arguments, server_from_args
+from benchmarks.run import RESULTS_DIR, SEARCH_QUERIES, _git_revision
+
+# Soxta server har qanday tokenni qabul qiladi (haqiqiy token test serverga yuborilmaydi)
+FAKE_TOKEN = "123456789:replay-load-test"
+GROUP_CHAT_ID = -1001111111111
+
+
+def load_recording(path: str) -> Iterator[Tuple[float, Dict]]:
+    """(vaqt, update) - UpdateRecorderMiddleware formati"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield record.get('ts', 0.0), record['update']
+
+
+def _percentiles(values: List[float]) -> Dict:
+    ordered = sorted(values)
+    if not ordered:
+        return {'count': 0}
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 2)
+
+    return {
+        'count': len(ordered),
+        'p50_ms': pick(0.50),
+        'p90_ms': pick(0.90),
+        'p99_ms': pick(0.99),
+        'max_ms': round(ordered[-1] * 1000, 2),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+    }
+
+
+def _prepare_database(workdir: str, source: Optional[str], catalog: Optional[str]) -> str:
+    """Ishchi bazaning nusxasi (replay unga yozadi) va ixtiyoriy sintetik katalog"""
+    path = os.path.join(workdir, 'replay.db')
+    if source and os.path.exists(source):
+        src = sqlite3.connect(source)
+        dst = sqlite3.connect(path)
+        src.backup(dst)
+        src.close()
+        dst.close()
+    elif source:
+        print(f"⚠️ {source} topilmadi: bo'sh baza ishlatiladi")
+    config.DATABASE_PATH = path
+
+    if catalog:
+        from benchmarks.catalog_gen import generate, parse_size
+        from catalog import import_records
+        from database.db import get_db
+        stats = import_records(get_db().db_path, generate(parse_size(catalog)), 5000, None, source='generator')
+        print(f"📚 Sintetik katalog: {stats['imported']} ta kitob")
+    return path
+
+
+async def replay(args) -> Dict:
+    records = list(load_recording(args.recording))[:args.limit or None]
+    if not records:
+        raise SystemExit("Yozuvda update yo'q")
+
+    server = None
+    with tempfile.TemporaryDirectory(prefix='kitob_replay_') as workdir:
+        _prepare_database(workdir, args.database, args.catalog)
+        # Replay o'zini qayta yozmasin, /metrics faqat so'ralganda
+        config.UPDATE_RECORD_PATH = ''
+        config.METRICS_PORT = args.metrics_port
+        # Chiquvchi limitlar (Telegram limitlari) ko'paytiriladi: dispatcher ning o'z sig'imini o'lchash uchun
+        for name in ('GLOBAL', 'PRIVATE', 'GROUP'):
+            for kind in ('RATE', 'BURST'):
+                key = f'OUTBOUND_{name}_{kind}'
+                setattr(config, key, getattr(config, key) * args.outbound_scale)
+        if args.api_url:
+            config.TELEGRAM_API_URL = args.api_url
+        else:
+            server = server_from_args(args)
+            config.TELEGRAM_API_URL = await server.start(port=args.port)
+
+        from aiogram.types import Update
+        import main as bot_main
+        bot = bot_main.create_bot(FAKE_TOKEN)
+        dp = bot_main.create_dispatcher()
+        await dp.emit_startup(bot=bot, dispatcher=dp, bots=[bot], **dp.workflow_data)
+        # start_polling dagi kabi: bot.me() keshlanadi
+        await bot.me()
+
+        updates = []
+        for update_id, (ts, data) in enumerate(records, start=1):
+            update = Update.model_validate({**data, 'update_id': update_id}, context={'bot': bot})
+            updates.append((ts, update))
+
+        loop = asyncio.get_running_loop()
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        errors = 0
+        semaphore = asyncio.Semaphore(args.concurrency) if args.concurrency else None
+
+        async def handle(update: Update, due: float):
+            nonlocal errors
+            try:
+                if semaphore is None:
+                    await dp.feed_update(bot, update)
+                else:
+                    async with semaphore:
+                        await dp.feed_update(bot, update)
+            except Exception:
+                errors += 1
+            latencies[update.event_type].append(loop.time() - due)
+
+        print(f"▶️ {len(updates)} ta update, tezlik x{args.speed or 'max'}")
+        started = loop.time()
+        first_ts = updates[0][0]
+        tasks = []
+        for ts, update in updates:
+            # Polling dagi kabi har bir update alohida task (handle_as_tasks)
+            due = started + (ts - first_ts) / args.speed if args.speed else loop.time()
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(handle(update, due)))
+        await asyncio.gather(*tasks)
+        elapsed = loop.time() - started
+
+        await dp.emit_shutdown(bot=bot, dispatcher=dp, bots=[bot], **dp.workflow_data)
+        await bot.session.close()
+        if server is not None:
+            api_stats = server.stats()
+            await server.stop()
+        else:
+            import aiohttp
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f"{args.api_url.rstrip('/')}/control/stats") as response:
+                    api_stats = await response.json()
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'revision': _git_revision(),
+            'recording': args.recording,
+            'speed': args.speed,
+            'concurrency': args.concurrency,
+            'catalog': args.catalog,
+            'outbound_scale': args.outbound_scale,
+            'api': args.api_url or {
+                'latency': args.latency, 'jitter': args.jitter,
+                'flood_rate': args.flood_rate, 'retry_after': args.retry_after,
+            },
+        },
+        'updates': len(updates),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'updates_per_sec': round(len(updates) / elapsed, 1) if elapsed else None,
+        'latency': _percentiles(all_latencies),
+        'by_event': {event: _percentiles(values) for event, values in sorted(latencies.items())},
+        'api': api_stats,
+    }
+
+
+def synthesize(count: int, rate: float, users: int, seed: int) -> Iterator[Dict]:
+    """Sintetik oqim: shaxsiy chatda qidiruv va buyruqlar, inline qidiruv, guruhda oddiy va reklama xabarlari"""
+    from benchmarks.spam import CORPUS_PATH, load_corpus
+    rng = random.Random(seed)
+    group_texts = [item['text'] for item in load_corpus(CORPUS_PATH)]
+    ts = time.time()
+    for index in range(1, count + 1):
+        ts += rng.expovariate(rate)
+        user_id = 1000 + rng.randrange(users)
+        user = {'id': user_id, 'is_bot': False, 'first_name': f"User{user_id}", 'language_code': 'uz'}
+        roll = rng.random()
+        if roll >= 0.9:
+            query = rng.choice(SEARCH_QUERIES)
+            inline_query = {'id': str(index), 'from': user, 'query': query, 'offset': rng.choice(['', '', '20'])}
+            yield {'ts': round(ts, 3), 'update': {'update_id': index, 'inline_query': inline_query}}
+            continue
+        if roll < 0.2:
+            chat = {'id': GROUP_CHAT_ID, 'type': 'supergroup', 'title': "Kitoblar guruhi"}
+            text = rng.choice(group_texts)
+        else:
+            chat = {'id': user_id, 'type': 'private', 'first_name': user['first_name']}
+            text = rng.choice(['/start', '/help']) if roll < 0.3 else rng.choice(SEARCH_QUERIES)
+        message = {'message_id': index, 'date': int(ts), 'chat': chat, 'from': user, 'text': text}
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+        yield {'ts': round(ts, 3), 'update': {'update_id': index, 'message': message}}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.replay', description="Update larni qayta o'ynatish")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="yozuvni dispatcher ga berish")
+    run_parser.add_argument('recording')
+    run_parser.add_argument('--speed', type=float, default=1.0, help="asl tezlikdan necha marta tez (0 - kutmasdan)")
+    run_parser.add_argument('--concurrency', type=int, default=0, help="bir vaqtda ishlanadigan update lar (0 - cheklanmagan)")
+    run_parser.add_argument('--limit', type=int, default=0)
+    run_parser.add_argument('--outbound-scale', type=float, default=1.0,
+                            help="chiquvchi so'rovlar limitlarini necha marta oshirish (1 - Telegram limitlari)")
+    run_parser.add_argument('--database', default=config.DATABASE_PATH, help="nusxasi olinadigan baza")
+    run_parser.add_argument('--catalog', help="bazaga qo'shiladigan sintetik katalog: 10k, 100k, ...")
+    run_parser.add_argument('--api-url', help="tashqi soxta server (standart: shu jarayonda ishga tushiriladi)")
+    run_parser.add_argument('--port', type=int, default=8082)
+    run_parser.add_argument('--metrics-port', type=int, default=0)
+    run_parser.add_argument('--out', help="JSON fayl (standart: benchmarks/results/replay_<vaqt>_<commit>.json)")
+    add_server_arguments(run_parser)
+
+    synth_parser = commands.add_parser('synth', help="sintetik yozuv yaratish")
+    synth_parser.add_argument('count', type=int)
+    synth_parser.add_argument('path')
+    synth_parser.add_argument('--rate', type=float, default=20.0, help="o'rtacha update/soniya")
+    synth_parser.add_argument('--users', type=int, default=500)
+    synth_parser.add_argument('--seed', type=int, default=42)
+
+    args = parser.parse_args(argv)
+    if args.command == 'synth':
+        with open(args.path, 'w', encoding='utf-8') as f:
+            for record in synthesize(args.count, args.rate, args.users, args.seed):
+                f.write(json.dumps(record, ensure_ascii=False))
+                f.write('\n')
+        return
+
+    report = asyncio.run(replay(args))
+    latency = report['latency']
+    print(f"✅ {report['updates']} ta update {report['seconds']} s: {report['updates_per_sec']} update/s, "
+          f"p50 {latency['p50_ms']} ms, p99 {latency['p99_ms']} ms, xatolar {report['errors']}, "
+          f"429: {report['api'].get('flood_429')}")
+    out = args.out or os.path.join(RESULTS_DIR, f"replay_{time.strftime('%Y%m%d-%H%M%S')}_{report['meta']['revision'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ Natijalar: {out}")
+
+
+if __name__ == "__main__":
+    main()
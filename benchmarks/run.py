@@ -0,0 +1,263 @@
+"""
+Benchmark runner: qidiruv, katalog va baza hot path lari
+
+Har bir o'lcham uchun vaqtinchalik baza yaratiladi, sintetik katalog import
+qilinadi va o'lchovlar JSON faylga yoziladi (build lar solishtirish uchun).
+
+Ishlatish:
+    python -m benchmarks                               # 10k va 100k
+    python -m benchmarks --sizes 10k,100k,1m --repeat 7 --out natija.json
+    python -m benchmarks compare eski.json yangi.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+# Loyiha papkasini Python path ga qo'shish
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+
+import config
+from benchmarks.catalog_gen import generate, parse_size
+
+RESULTS_DIR = os.path.join(project_dir, 'benchmarks', 'results')
+
+# Qidiruv so'rovlari: ko'p natija, o'rtacha, kirill, muallif, noyob va topilmaydigan
+SEARCH_QUERIES = ["kunlar", "Matematika", "Ўтган", "Hoshimov", "O'tkan kunlar", "zzqxw"]
+ADD_USER_OPS = 2000
+BOOK_FILES_SAMPLE = 200
+
+
+def _stats(times: List[float], ops: int = 1) -> Dict:
+    """Har bir takrorlash vaqtlari (soniya) -> ms dagi statistika"""
+    ordered = sorted(times)
+    per_op = [t / ops for t in ordered]
+    return {
+        'repeat': len(times),
+        'ops': ops,
+        'median_ms': round(statistics.median(per_op) * 1000, 4),
+        'mean_ms': round(statistics.fmean(per_op) * 1000, 4),
+        'p95_ms': round(per_op[min(len(per_op) - 1, int(len(per_op) * 0.95))] * 1000, 4),
+        'min_ms': round(per_op[0] * 1000, 4),
+        'ops_per_sec': round(ops / statistics.median(ordered), 2) if ordered[0] > 0 else None,
+    }
+
+
+def _measure(func: Callable, repeat: int, ops: int = 1, warmup: bool = True) -> Dict:
+    if warmup:
+        func()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return _stats(times, ops)
+
+
+async def _noop(*args, **kwargs):
+    return None
+
+
+class SizeBenchmark:
+    """Bitta katalog o'lchami uchun barcha o'lchovlar"""
+
+    def __init__(self, label: str, count: int, workdir: str, repeat: int, seed: int):
+        self.label = label
+        self.count = count
+        self.repeat = repeat
+        self.seed = seed
+        self.db_path = os.path.join(workdir, f"bench_{label}.db")
+        self.results: List[Dict] = []
+        self.loop = asyncio.new_event_loop()
+
+    def add(self, name: str, stats: Dict, rows: Optional[int] = None, **params):
+        """params - o'lchov kaliti (solishtirishda), rows - natija qatorlari soni (ma'lumot uchun)"""
+        self.results.append({'size': self.label, 'books': self.count, 'name': name, 'params': params, 'rows': rows, **stats})
+        print(f"  {self.label:>6} {name:<22} {json.dumps(params, ensure_ascii=False):<32} "
+              f"median {stats['median_ms']:>10.3f} ms  p95 {stats['p95_ms']:>10.3f} ms")
+
+    def run(self) -> List[Dict]:
+        from database.db import Database
+        config.DATABASE_PATH = self.db_path
+
+        def cold_start():
+            Database._ready_paths.discard(self.db_path)
+            if os.path.exists(self.db_path):
+                os.remove(self.db_path)
+            Database()
+
+        self.add('init_database_cold', _measure(cold_start, self.repeat, warmup=False))
+        db = Database()
+        self._import(db)
+
+        def warm_start():
+            # Jarayon qayta ishga tushgandagi kabi: user_version tekshiruvi
+            Database._ready_paths.discard(self.db_path)
+            Database()
+
+        self.add('init_database_warm', _measure(warm_start, self.repeat))
+
+        for query in SEARCH_QUERIES:
+            rows = len(db.search_books(query))
+            self.add('search_books', _measure(lambda: db.search_books(query), self.repeat), rows, query=query)
+
+        self.add('get_all_books', _measure(db.get_all_books, self.repeat), self.count)
+        self._book_files(db)
+        self._add_user(db)
+        self._pagination(db)
+        self.loop.close()
+        return self.results
+
+    def _import(self, db):
+        from catalog import import_records
+        started = time.perf_counter()
+        stats = import_records(db.db_path, generate(self.count, self.seed), 5000, config.ADMIN_ID or None, source='generator')
+        elapsed = time.perf_counter() - started
+        # Generatsiya vaqti ham ichida (katalog fayldan o'qilgandagiga yaqin)
+        self.add('catalog_import', _stats([elapsed], stats['imported']), stats['parts'])
+
+    def _book_files(self, db):
+        conn = sqlite3.connect(self.db_path)
+        ids = [row[0] for row in conn.execute("SELECT id FROM books WHERE is_multi_part = 1")]
+        conn.close()
+        sample = random.Random(self.seed).sample(ids, min(BOOK_FILES_SAMPLE, len(ids)))
+        if not sample:
+            return
+
+        def all_files():
+            for book_id in sample:
+                db.get_book_files(book_id)
+
+        def audio_files():
+            for book_id in sample:
+                db.get_book_files(book_id, 'audio')
+
+        self.add('get_book_files', _measure(all_files, self.repeat, ops=len(sample)), file_type=None)
+        self.add('get_book_files', _measure(audio_files, self.repeat, ops=len(sample)), file_type='audio')
+
+    def _add_user(self, db):
+        counter = iter(range(1, 10 ** 9))
+
+        def add_users():
+            for _ in range(ADD_USER_OPS):
+                user_id = next(counter) % 50000
+                db.add_user(user_id, f"user{user_id}", "Foydalanuvchi", None, False, 'uz')
+
+        self.add('add_user', _measure(add_users, max(1, self.repeat // 2), ops=ADD_USER_OPS, warmup=False))
+
+    def _pagination(self, db):
+        """Sahifalash: handlerlardagi kabi ro'yxat olinadi va sahifa tayyorlanadi (Telegram so'rovisiz)"""
+        from handlers.books import update_search_results
+        from handlers.basic import _show_admin_delete_list
+        callback = SimpleNamespace(message=SimpleNamespace(edit_text=_noop))
+
+        query = SEARCH_QUERIES[0]
+        books = db.search_books(query)
+        page = max(0, (len(books) - 1) // 10 // 2)
+
+        def search_page():
+            found = db.search_books(query)
+            self.loop.run_until_complete(update_search_results(callback, found, query, page, None))
+
+        self.add('search_page', _measure(search_page, self.repeat), query=query, page=page)
+
+        admin_page = max(0, (self.count - 1) // 10 // 2)
+
+        def admin_delete_page():
+            all_books = db.get_all_books()
+            self.loop.run_until_complete(_show_admin_delete_list(callback, all_books, db, admin_page))
+
+        self.add('admin_delete_page', _measure(admin_delete_page, self.repeat), page=admin_page)
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_dir,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=project_dir,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return f"{revision}-dirty" if dirty else revision
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> str:
+    revision = _git_revision()
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'revision': revision,
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'sizes': args.sizes,
+            'repeat': args.repeat,
+            'seed': args.seed,
+        },
+        'results': [],
+    }
+    with tempfile.TemporaryDirectory(prefix='kitob_bench_') as workdir:
+        for label in args.sizes.split(','):
+            label = label.strip().lower()
+            print(f"📚 {label}: katalog tayyorlanmoqda...")
+            benchmark = SizeBenchmark(label, parse_size(label), workdir, args.repeat, args.seed)
+            report['results'].extend(benchmark.run())
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}_{revision or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ Natijalar: {out}")
+    return out
+
+
+def compare(old_path: str, new_path: str):
+    """Ikki natija faylini median bo'yicha solishtirish"""
+    def load(path):
+        with open(path, encoding='utf-8') as f:
+            report = json.load(f)
+        return report['meta'], {
+            (r['size'], r['name'], json.dumps(r['params'], sort_keys=True, ensure_ascii=False)): r
+            for r in report['results']
+        }
+
+    old_meta, old = load(old_path)
+    new_meta, new = load(new_path)
+    print(f"{old_meta.get('revision')} -> {new_meta.get('revision')}")
+    for key, result in new.items():
+        before = old.get(key)
+        if before is None:
+            continue
+        ratio = result['median_ms'] / before['median_ms'] if before['median_ms'] else float('inf')
+        mark = "🔺" if ratio > 1.1 else ("🟢" if ratio < 0.9 else "  ")
+        print(f"{mark} {key[0]:>6} {key[1]:<22} {key[2]:<40} "
+              f"{before['median_ms']:>10.3f} -> {result['median_ms']:>10.3f} ms  x{ratio:.2f}")
+
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['compare']:
+        parser = argparse.ArgumentParser(prog='python -m benchmarks compare')
+        parser.add_argument('old')
+        parser.add_argument('new')
+        args = parser.parse_args(argv[1:])
+        compare(args.old, args.new)
+        return
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description="Qidiruv, katalog va baza benchmarklari")
+    parser.add_argument('--sizes', default='10k,100k', help="vergul bilan: 10k,100k,1m")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', help="JSON fayl (standart: benchmarks/results/<vaqt>_<commit>.json)")
+    run(parser.parse_args(argv))
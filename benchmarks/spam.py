@@ -0,0 +1,204 @@
+"""
+Reklama detektorlari: aniqlik (precision/recall) va tezlik (xabar/soniya)
+
+Belgilangan korpus (benchmarks/data/spam_corpus.jsonl: uz/ru/en, label - 'ad'
+yoki 'ok') bo'yicha har bir detektor tekshiriladi:
+    group        - ad_rules.contains_advertisement (guruhlar anti-spami)
+    strict       - ad_rules.contains_advertisement(strict=True) (books.py)
+    reference    - group qoidalari bittadan, prefilter va umumiy regexsiz (natijasi group bilan bir xil bo'lishi kerak)
+    spam_filter  - SpamFilter._is_advertisement (matn + entity lar + kanal forwardi)
+
+Ishlatish:
+    python -m benchmarks.spam
+    python -m benchmarks.spam --compare eski.json --fail-on-regression
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+# Loyiha papkasini Python path ga qo'shish
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+
+import config
+from benchmarks.run import RESULTS_DIR, _git_revision
+
+CORPUS_PATH = os.path.join(project_dir, 'benchmarks', 'data', 'spam_corpus.jsonl')
+MAX_EXAMPLES = 20
+
+
+def load_corpus(path: str) -> List[Dict]:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _message(item: Dict) -> SimpleNamespace:
+    """SpamFilter uchun Message o'rnini bosuvchi obyekt (faqat u o'qiydigan maydonlar)"""
+    entities = [SimpleNamespace(type=kind) for kind in item.get('entities', [])] or None
+    forward_chat = SimpleNamespace(type=item['forward']) if item.get('forward') else None
+    return SimpleNamespace(text=item['text'], caption=None, entities=entities,
+                           caption_entities=None, forward_from_chat=forward_chat)
+
+
+def build_detectors() -> Dict[str, Callable[[Dict], bool]]:
+    from utils import ad_rules
+    from handlers.groups import SpamFilter
+
+    engine = ad_rules.engine
+    engine.load()
+    group_rules = [
+        engine._compiled[rule_id] for rule_id, rule in sorted(engine.rules.items())
+        if rule['scope'] == 'group' and rule_id in engine._compiled
+    ]
+
+    def reference(item: Dict) -> bool:
+        text = item['text']
+        if not text:
+            return False
+        clean_text, text_lower = ad_rules.normalize_text(text)
+        spaced_text = ad_rules._WHITESPACE_RE.sub('', text_lower)
+        emoji_count = ad_rules.count_emojis(clean_text)
+        text_len = len(clean_text.replace(' ', ''))
+        emoji_heavy = text_len > 0 and (emoji_count / text_len > 0.4 or emoji_count > 8)
+        return any(
+            ad_rules._rule_matches(kind, pattern, requires, clean_text, text_lower, spaced_text, emoji_heavy)
+            for kind, pattern, requires in group_rules
+        )
+
+    return {
+        'group': lambda item: ad_rules.contains_advertisement(item['text']),
+        'strict': lambda item: ad_rules.contains_advertisement(item['text'], strict=True),
+        'reference': reference,
+        'spam_filter': lambda item: SpamFilter._is_advertisement(item['_message']),
+    }
+
+
+def _ratio(numerator: int, denominator: int) -> Optional[float]:
+    return round(numerator / denominator, 4) if denominator else None
+
+
+def evaluate(detect: Callable[[Dict], bool], corpus: List[Dict]) -> Dict:
+    counts = {'tp': 0, 'fp': 0, 'fn': 0, 'tn': 0}
+    by_lang: Dict[str, Dict[str, int]] = {}
+    false_positives, false_negatives = [], []
+    for item in corpus:
+        predicted = bool(detect(item))
+        actual = item['label'] == 'ad'
+        key = ('tp' if actual else 'fp') if predicted else ('fn' if actual else 'tn')
+        counts[key] += 1
+        by_lang.setdefault(item['lang'], {'tp': 0, 'fp': 0, 'fn': 0, 'tn': 0})[key] += 1
+        if key == 'fp':
+            false_positives.append(item['text'])
+        elif key == 'fn':
+            false_negatives.append(item['text'])
+
+    def summary(c: Dict[str, int]) -> Dict:
+        precision = _ratio(c['tp'], c['tp'] + c['fp'])
+        recall = _ratio(c['tp'], c['tp'] + c['fn'])
+        f1 = round(2 * precision * recall / (precision + recall), 4) if precision and recall else None
+        return {**c, 'precision': precision, 'recall': recall, 'f1': f1}
+
+    return {
+        **summary(counts),
+        'by_lang': {lang: summary(c) for lang, c in sorted(by_lang.items())},
+        'false_positives': false_positives[:MAX_EXAMPLES],
+        'false_negatives': false_negatives[:MAX_EXAMPLES],
+    }
+
+
+def throughput(detect: Callable[[Dict], bool], corpus: List[Dict], min_time: float) -> Dict:
+    """Korpusni min_time soniya davomida qayta-qayta tekshirish"""
+    for item in corpus:
+        detect(item)
+    messages = 0
+    started = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        for item in corpus:
+            detect(item)
+        messages += len(corpus)
+        elapsed = time.perf_counter() - started
+    return {'messages': messages, 'msgs_per_sec': round(messages / elapsed, 1), 'us_per_msg': round(elapsed / messages * 1e6, 3)}
+
+
+def compare(old: Dict, new: Dict) -> List[str]:
+    """Aniqlik pasaygan detektorlar ro'yxati (va jadvalni chiqarish)"""
+    regressions = []
+    print(f"{old['meta'].get('revision')} -> {new['meta'].get('revision')}")
+    for name, result in new['detectors'].items():
+        before = old['detectors'].get(name)
+        if before is None:
+            continue
+        line = [f"{name:<12}"]
+        for metric in ('precision', 'recall'):
+            was, now = before.get(metric) or 0, result.get(metric) or 0
+            line.append(f"{metric} {was:.3f} -> {now:.3f}")
+            if now < was:
+                regressions.append(f"{name}.{metric}")
+        speed = result['msgs_per_sec'] / before['msgs_per_sec'] if before.get('msgs_per_sec') else 0
+        line.append(f"tezlik x{speed:.2f}")
+        print("  ".join(line))
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.spam', description="Reklama detektorlari benchmarki")
+    parser.add_argument('--corpus', default=CORPUS_PATH)
+    parser.add_argument('--min-time', type=float, default=1.0, help="har bir detektor tezligini o'lchash vaqti (soniya)")
+    parser.add_argument('--out', help="JSON fayl (standart: benchmarks/results/spam_<vaqt>_<commit>.json)")
+    parser.add_argument('--compare', help="oldingi natija fayli")
+    parser.add_argument('--fail-on-regression', action='store_true', help="precision yoki recall pasaysa, exit code 1")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus)
+    for item in corpus:
+        item['_message'] = _message(item)
+
+    revision = _git_revision()
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'revision': revision,
+            'corpus': os.path.relpath(args.corpus, project_dir),
+            'messages': len(corpus),
+            'ads': sum(1 for item in corpus if item['label'] == 'ad'),
+        },
+        'detectors': {},
+    }
+    with tempfile.TemporaryDirectory(prefix='kitob_spam_') as workdir:
+        # Qoidalar vaqtinchalik bazaga standart ro'yxatdan yoziladi (ishchi bazaga tegmaydi)
+        config.DATABASE_PATH = os.path.join(workdir, 'spam.db')
+        detectors = build_detectors()
+        for name, detect in detectors.items():
+            result = evaluate(detect, corpus)
+            result.update(throughput(detect, corpus, args.min_time))
+            report['detectors'][name] = result
+            print(f"{name:<12} precision {result['precision']}  recall {result['recall']}  "
+                  f"FP {result['fp']}  FN {result['fn']}  {result['msgs_per_sec']:>10.1f} xabar/s")
+
+    group, reference = report['detectors']['group'], report['detectors']['reference']
+    if (group['false_positives'], group['false_negatives']) != (reference['false_positives'], reference['false_negatives']):
+        print("⚠️ group va reference natijalari farq qiladi: prefilter yoki umumiy regex qoidani o'tkazib yubormoqda")
+
+    out = args.out or os.path.join(RESULTS_DIR, f"spam_{time.strftime('%Y%m%d-%H%M%S')}_{revision or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ Natijalar: {out}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(json.load(f), report)
+        if regressions:
+            print(f"❌ Aniqlik pasaydi: {', '.join(regressions)}")
+            if args.fail_on_regression:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
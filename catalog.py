@@ -0,0 +1,289 @@
+"""
+Kitoblar katalogini import/eksport qilish (bot ishlamayotgan paytda, oflayn)
+
+Ishlatish:
+    python catalog.py import books.csv
+    python catalog.py import books.jsonl --batch-size 5000
+    python catalog.py export catalog.jsonl
+    python catalog.py export catalog.csv
+
+Ustunlar: title, author, file_id, file_type, file_size, storage_message_id,
+storage_chat_id, description, file_unique_id, upload_date, parts.
+parts - qismli kitob fayllari ro'yxati (CSV da JSON satr ko'rinishida):
+[{"file_id": ..., "file_type": "audio", "file_size": ..., "storage_message_id": ...,
+  "storage_chat_id": ..., "file_unique_id": ...}, ...]
+
+Fayllar oqim (stream) tarzida o'qiladi/yoziladi, import esa bitta
+tranzaksiyada, guruhlab executemany bilan bajariladi.
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Loyiha papkasini Python path ga qo'shish
+project_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, project_dir)
+
+import config
+from database.db import Database
+
+FIELDS = [
+    'title', 'author', 'file_id', 'file_type', 'file_size', 'storage_message_id',
+    'storage_chat_id', 'description', 'file_unique_id', 'upload_date', 'parts'
+]
+PART_FIELDS = ['file_id', 'file_type', 'file_size', 'storage_message_id', 'storage_chat_id', 'file_unique_id']
+FILE_TYPES = {'document', 'audio'}
+
+
+def _detect_format(path: str, fmt: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    return 'jsonl' if path.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def _int_or_none(value):
+    if value in (None, ''):
+        return None
+    return int(value)
+
+
+def read_records(path: str, fmt: str) -> Iterator[Tuple[int, Dict]]:
+    """(qator raqami, yozuv) juftliklarini oqim tarzida o'qish"""
+    with open(path, encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            for line_no, row in enumerate(csv.DictReader(f), 2):
+                parts = row.get('parts')
+                row['parts'] = json.loads(parts) if parts else []
+                yield line_no, row
+        else:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if line:
+                    yield line_no, json.loads(line)
+
+
+def normalize_record(record: Dict, uploader_id: Optional[int]) -> Dict:
+    """Yozuvni tekshirish va bazaga yoziladigan ko'rinishga keltirish (xato bo'lsa ValueError)"""
+    title = (record.get('title') or '').strip()
+    if not title:
+        raise ValueError("title bo'sh")
+    parts = []
+    for part in record.get('parts') or []:
+        if not part.get('file_id') or part.get('file_type') not in FILE_TYPES:
+            raise ValueError("qismda file_id yoki file_type noto'g'ri")
+        parts.append({
+            'file_id': part['file_id'],
+            'file_type': part['file_type'],
+            'file_size': _int_or_none(part.get('file_size')),
+            'storage_message_id': _int_or_none(part.get('storage_message_id')),
+            'storage_chat_id': str(part['storage_chat_id']) if part.get('storage_chat_id') else None,
+            'file_unique_id': part.get('file_unique_id') or None,
+        })
+    # Qismli kitobda asosiy fayl - birinchi qism (bot ham shunday saqlaydi)
+    main = parts[0] if parts else record
+    file_type = main.get('file_type')
+    if not main.get('file_id') or file_type not in FILE_TYPES:
+        raise ValueError("file_id yoki file_type noto'g'ri")
+    book = {
+        'title': title,
+        'author': (record.get('author') or '').strip() or "Noma'lum",
+        'file_id': main['file_id'],
+        'file_type': file_type,
+        'file_size': _int_or_none(main.get('file_size')),
+        'uploader_id': uploader_id,
+        'description': record.get('description') or "",
+        'storage_message_id': _int_or_none(main.get('storage_message_id')),
+        'storage_chat_id': str(main['storage_chat_id']) if main.get('storage_chat_id') else None,
+        'upload_date': record.get('upload_date') or None,
+        'is_multi_part': 1 if parts else 0,
+        'file_unique_id': None if parts else (record.get('file_unique_id') or None),
+    }
+    if not parts:
+        parts = [{key: book[key] for key in PART_FIELDS}]
+    return {'book': book, 'parts': parts}
+
+
+def _batched(items: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _existing_unique_ids(cursor: sqlite3.Cursor, unique_ids: List[str]) -> set:
+    found = set()
+    for i in range(0, len(unique_ids), 500):
+        chunk = unique_ids[i:i + 500]
+        cursor.execute(
+            f"SELECT file_unique_id FROM book_files WHERE file_unique_id IN ({','.join('?' * len(chunk))})",
+            chunk
+        )
+        found.update(row[0] for row in cursor.fetchall())
+    return found
+
+
+def _next_book_id(cursor: sqlite3.Cursor) -> int:
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'books'")
+    row = cursor.fetchone()
+    return (row[0] if row else 0) + 1
+
+
+def import_catalog(db_path: str, path: str, fmt: str, batch_size: int, uploader_id: Optional[int]) -> Dict:
+    """Katalog faylini bitta tranzaksiyada import qilish"""
+    return import_records(db_path, read_records(path, fmt), batch_size, uploader_id, source=path)
+
+
+def import_records(db_path: str, records: Iterable[Tuple[int, Dict]], batch_size: int,
+                   uploader_id: Optional[int], source: str = '') -> Dict:
+    """(qator raqami, yozuv) oqimini bitta tranzaksiyada import qilish"""
+    stats = {'imported': 0, 'parts': 0, 'duplicates': 0, 'invalid': 0}
+    seen = set()
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    cursor = conn.cursor()
+    # Import davomida diskka sinxronlash shart emas: xato bo'lsa tranzaksiya bekor qilinadi
+    cursor.execute("PRAGMA synchronous = OFF")
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        for batch in _batched(records, batch_size):
+            entries = []
+            for line_no, record in batch:
+                try:
+                    entries.append(normalize_record(record, uploader_id))
+                except (ValueError, TypeError, AttributeError) as e:
+                    stats['invalid'] += 1
+                    print(f"{source}:{line_no}: o'tkazib yuborildi ({e})", file=sys.stderr)
+
+            # Bazada yoki shu faylda bor fayllar (file_unique_id) qayta qo'shilmaydi
+            unique_ids = [p['file_unique_id'] for entry in entries for p in entry['parts'] if p['file_unique_id']]
+            known = _existing_unique_ids(cursor, unique_ids) if unique_ids else set()
+            fresh = []
+            for entry in entries:
+                ids = [p['file_unique_id'] for p in entry['parts'] if p['file_unique_id']]
+                if any(uid in known or uid in seen for uid in ids) or len(set(ids)) != len(ids):
+                    stats['duplicates'] += 1
+                    continue
+                seen.update(ids)
+                fresh.append(entry)
+            if not fresh:
+                continue
+
+            # AUTOINCREMENT: tranzaksiya ichida yangi ID lar ketma-ket beriladi
+            first_id = _next_book_id(cursor)
+            cursor.executemany('''
+                INSERT INTO books (title, author, file_id, file_type, file_size, upload_date, uploader_id,
+                                   description, storage_message_id, storage_chat_id, is_multi_part, file_unique_id)
+                VALUES (:title, :author, :file_id, :file_type, :file_size, COALESCE(:upload_date, CURRENT_TIMESTAMP),
+                        :uploader_id, :description, :storage_message_id, :storage_chat_id, :is_multi_part, :file_unique_id)
+            ''', [entry['book'] for entry in fresh])
+            if _next_book_id(cursor) != first_id + len(fresh):
+                raise RuntimeError("books ID lari ketma-ket emas, import to'xtatildi")
+            file_rows = [
+                (book_id, p['file_id'], p['file_type'], p['file_size'], p['storage_message_id'],
+                 p['storage_chat_id'], p['file_unique_id'])
+                for book_id, entry in enumerate(fresh, first_id)
+                for p in entry['parts']
+            ]
+            cursor.executemany('''
+                INSERT INTO book_files (book_id, file_id, file_type, file_size, storage_message_id, storage_chat_id, file_unique_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', file_rows)
+            stats['imported'] += len(fresh)
+            stats['parts'] += len(file_rows)
+        cursor.execute("COMMIT")
+    except BaseException:
+        cursor.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return stats
+
+
+def iter_catalog(db_path: str) -> Iterator[Dict]:
+    """Kitoblarni qismlari bilan oqim tarzida o'qish (ikkala jadval ID bo'yicha birga yuradi)"""
+    conn = sqlite3.connect(db_path)
+    try:
+        books = conn.execute('''
+            SELECT id, title, author, file_id, file_type, file_size, storage_message_id, storage_chat_id,
+                   description, file_unique_id, upload_date, COALESCE(is_multi_part, 0)
+            FROM books ORDER BY id
+        ''')
+        files = conn.execute('''
+            SELECT book_id, file_id, file_type, file_size, storage_message_id, storage_chat_id, file_unique_id
+            FROM book_files ORDER BY book_id, id
+        ''')
+        pending = files.fetchone()
+        for row in books:
+            book_id = row[0]
+            book_files = []
+            while pending is not None and pending[0] <= book_id:
+                if pending[0] == book_id:
+                    book_files.append(dict(zip(PART_FIELDS, pending[1:])))
+                pending = files.fetchone()
+            record = dict(zip(FIELDS[:-1], row[1:11]))
+            if row[11]:
+                record['parts'] = book_files
+            else:
+                record['parts'] = []
+                if not record['file_unique_id'] and book_files:
+                    record['file_unique_id'] = book_files[0]['file_unique_id']
+            yield record
+    finally:
+        conn.close()
+
+
+def export_catalog(db_path: str, path: str, fmt: str) -> int:
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            for record in iter_catalog(db_path):
+                record['parts'] = json.dumps(record['parts'], ensure_ascii=False) if record['parts'] else ''
+                writer.writerow(record)
+                count += 1
+        else:
+            for record in iter_catalog(db_path):
+                f.write(json.dumps(record, ensure_ascii=False))
+                f.write('\n')
+                count += 1
+    return count
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Kitoblar katalogini CSV/JSONL dan import yoki eksport qilish")
+    sub = parser.add_subparsers(dest='command', required=True)
+    imp = sub.add_parser('import', help="Katalogni bazaga yuklash")
+    imp.add_argument('path')
+    imp.add_argument('--format', choices=['csv', 'jsonl'])
+    imp.add_argument('--batch-size', type=int, default=2000)
+    imp.add_argument('--uploader-id', type=int, default=getattr(config, 'ADMIN_ID', None))
+    exp = sub.add_parser('export', help="Katalogni faylga yozish")
+    exp.add_argument('path')
+    exp.add_argument('--format', choices=['csv', 'jsonl'])
+    args = parser.parse_args(argv)
+
+    # Jadvallar va migratsiyalar tayyor bo'lishi uchun
+    db_path = Database().db_path
+    fmt = _detect_format(args.path, args.format)
+    started = time.perf_counter()
+    if args.command == 'import':
+        stats = import_catalog(db_path, args.path, fmt, max(1, args.batch_size), args.uploader_id)
+        print(f"✅ Import: {stats['imported']} ta kitob ({stats['parts']} ta fayl), "
+              f"takroriy: {stats['duplicates']}, xato: {stats['invalid']} "
+              f"- {time.perf_counter() - started:.2f} s")
+    else:
+        count = export_catalog(db_path, args.path, fmt)
+        print(f"✅ Eksport: {count} ta kitob -> {args.path} ({time.perf_counter() - started:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -40,3 +40,136 @@ ALLOWED_FILE_TYPES = {
 
 # Maksimal fayl hajmi (MB)
 MAX_FILE_SIZE = 7000000
+
+# Reklama qoidalari: bazadagi o'zgarishlarni tekshirish oralig'i (soniya)
+AD_RULES_RELOAD_INTERVAL = 30
+
+# Reklama qoidalari: har N-xabarda har bir qoidaning narxini o'lchash (0 - o'chirilgan)
+AD_RULES_PROFILE_EVERY = 200
+
+# Takroriy spam detektori: vaqt oynasi (soniya) va xotiradagi maksimal yozuvlar soni
+DUPLICATE_WINDOW_SECONDS = 600
+DUPLICATE_MAX_ENTRIES = 20000
+
+# Bitta foydalanuvchi bir xil xabarni shuncha turli guruhga tashlasa spam deb belgilanadi
+DUPLICATE_MIN_CHATS = 3
+
+# SimHash: yaqin nusxa deb hisoblanadigan maksimal Hamming masofasi (<= 3)
+DUPLICATE_MAX_DISTANCE = 3
+
+# Fingerprint olinadigan matnning minimal uzunligi va maksimal tokenlar soni
+DUPLICATE_MIN_TEXT_LENGTH = 30
+DUPLICATE_MAX_TOKENS = 64
+
+# Flood limiter (token bucket): rate - soniyasiga token, burst - maksimal zaxira
+THROTTLE_PRIVATE_RATE = 0.5
+THROTTLE_PRIVATE_BURST = 5
+THROTTLE_GROUP_USER_RATE = 0.2
+THROTTLE_GROUP_USER_BURST = 3
+THROTTLE_GROUP_CHAT_RATE = 1.0
+THROTTLE_GROUP_CHAT_BURST = 10
+
+# Limitdan oshganda: 'reply' - bitta ogohlantirish yuborish, 'drop' - jimgina tashlab yuborish
+THROTTLE_PRIVATE_MODE = 'reply'
+THROTTLE_GROUP_MODE = 'drop'
+
+# Ogohlantirishlar orasidagi minimal vaqt (soniya) va xotiradagi maksimal bucketlar soni
+THROTTLE_NOTICE_INTERVAL = 10
+THROTTLE_MAX_KEYS = 100000
+
+# Reklama xabarlarini yig'ib o'chirish: oyna (soniya) va ogohlantirish sozlamalari
+SPAM_BATCH_WINDOW = 1.5
+SPAM_WARNING_EDIT_WINDOW = 60  # shu vaqt ichida yangi ogohlantirish o'rniga eskisi tahrirlanadi
+SPAM_WARNING_TTL = 0  # ogohlantirishni avtomatik o'chirish (soniya), 0 - o'chirilmaydi
+SPAM_WARNING_MAX_MENTIONS = 5
+
+# Qismli kitoblarni yuborish: 'album' - sendMediaGroup (10 tadan), 'copy' - copyMessages
+# (ombor kanalidan, asl izohlar bilan), 'single' - har bir qism alohida
+MULTI_PART_DELIVERY_MODE = 'album'
+MEDIA_GROUP_SIZE = 10
+
+# Chiquvchi so'rovlar rejalashtiruvchisi (Telegram limitlari: ~30 xabar/s umumiy,
+# 1 xabar/s bitta chatga, daqiqasiga 20 xabar bitta guruhga)
+OUTBOUND_GLOBAL_RATE = 30
+OUTBOUND_GLOBAL_BURST = 30
+OUTBOUND_PRIVATE_RATE = 1.0
+OUTBOUND_PRIVATE_BURST = 3
+OUTBOUND_GROUP_RATE = 20 / 60
+OUTBOUND_GROUP_BURST = 5
+# Kanallar (ombor kanali va @username): guruhlarning 20/daqiqa limiti ularga tegishli emas,
+# yuklash va fayllarni bittadan saqlash guruh javoblari bilan navbat talashmaydi
+OUTBOUND_CHANNEL_RATE = 1.0
+OUTBOUND_CHANNEL_BURST = 10
+OUTBOUND_BULK_RESERVE = 5  # broadcast tegmaydigan global tokenlar (interaktiv javoblar uchun)
+OUTBOUND_MAX_RETRIES = 3  # retry_after dan keyin qayta yuborishlar soni
+OUTBOUND_MAX_BUCKETS = 50000
+
+# Qismli kitoblarni yuborish navbati: ishchilar soni va status xabarini yangilash oralig'i (soniya)
+DELIVERY_WORKERS = 3
+DELIVERY_STATUS_INTERVAL = 5
+
+# Kitob izohlari va tugmalari keshi (kitoblar soni)
+RENDER_CACHE_SIZE = 5000
+
+# Yuklab olishlar va qidiruv so'rovlari hisoblagichlari: bazaga yozish oralig'i (soniya)
+# va statistikada saqlanadigan so'rov uzunligi
+POPULARITY_FLUSH_INTERVAL = 30
+POPULARITY_QUERY_MAX_LENGTH = 100
+
+# /top va /new ro'yxatlari: xotirada saqlanadigan kitoblar soni, sahifadagi kitoblar
+# va yangi qo'shilgan kitoblarni tekshirish oralig'i (soniya)
+BOOK_LISTS_SIZE = 100
+BOOK_LISTS_PAGE_SIZE = 10
+BOOK_LISTS_REFRESH_INTERVAL = 60
+
+# Kitob havolalari (t.me/<bot>?start=b<kod>) imzosi uchun kalit (bo'sh - BOT_TOKEN dan olinadi)
+DEEP_LINK_SECRET = os.getenv('DEEP_LINK_SECRET', '')
+
+# Inline rejim (@bot so'rov): sahifadagi natijalar (Telegram limiti 50), minimal so'rov uzunligi,
+# Telegram keshlaydigan vaqt (soniya), server tomondagi qidiruv keshi (so'rovlar soni va TTL)
+# va obuna tekshiruvi natijasini eslab qolish vaqti (har bir harfga getChatMember qilmaslik uchun)
+INLINE_PAGE_SIZE = 20
+INLINE_MIN_QUERY_LENGTH = 2
+INLINE_CACHE_TIME = 300
+INLINE_DENIED_CACHE_TIME = 10
+INLINE_SEARCH_CACHE_SIZE = 1000
+INLINE_SEARCH_CACHE_TTL = 120
+INLINE_SUBSCRIPTION_TTL = 60
+
+# Avtomatik yuklash konveyeri: ishchilar soni, guruh hajmi, guruhni yig'ish oynasi (soniya)
+# va omborga saqlash usuli ('copy' - copyMessages bilan guruhlab, 'single' - har bir fayl alohida)
+INGEST_WORKERS = 2
+INGEST_BATCH_SIZE = 50
+INGEST_BATCH_WINDOW = 2.0
+INGEST_STORAGE_MODE = 'copy'
+
+# Log sozlamalari: umumiy daraja, modullar bo'yicha darajalar, format ('text' yoki 'json')
+# va DEBUG sampling (bir xil DEBUG xabaridan har N tadan bittasi yoziladi)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_LEVELS = {
+    'aiogram': 'INFO',
+    'aiogram.event': 'WARNING',
+    'aiohttp': 'WARNING',
+    'asyncio': 'WARNING',
+}
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+LOG_DEBUG_SAMPLE_EVERY = 100
+
+# Prometheus metrikalari: http://METRICS_HOST:METRICS_PORT/metrics (standart 0 - o'chirilgan, masalan 9100)
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+
+# Sekin update lar: shundan uzoq davom etsa barcha spanlari bilan logga yoziladi (soniya),
+# update larning shu ulushi cProfile bilan TRACE_PROFILE_DIR ga saqlanadi (0 - o'chirilgan)
+TRACE_SLOW_THRESHOLD = float(os.getenv('TRACE_SLOW_THRESHOLD', 2.0))
+TRACE_PROFILE_SAMPLE_RATE = float(os.getenv('TRACE_PROFILE_SAMPLE_RATE', 0.0))
+TRACE_PROFILE_DIR = 'logs/profiles'
+TRACE_MAX_SPANS = 200
+
+# Bot API manzili (bo'sh - api.telegram.org): lokal Bot API server yoki yuklama testlari
+# uchun test server (python -m benchmarks.fake_api), masalan http://127.0.0.1:8081
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', '')
+
+# Kelgan update larni JSONL faylga yozish (replay uchun; bo'sh - o'chirilgan).
+# Faylda foydalanuvchilar xabarlari bo'ladi, uni faqat lokal saqlang
+UPDATE_RECORD_PATH = os.getenv('UPDATE_RECORD_PATH', '')
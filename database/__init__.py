@@ -1,6 +1,6 @@
 """
 Database modullari uchun __init__.py fayli
 """
-from .db import Database
+from .db import Database, get_db, add_query_hook
 
-__all__ = ['Database']
+__all__ = ['Database', 'get_db', 'add_query_hook']
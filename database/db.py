@@ -3,172 +3,397 @@ Ma'lumotlar bazasi modellari va funksiyalari
 """
 import sqlite3
 import json
+import time
+from functools import lru_cache
 from typing import List, Dict, Optional
 from datetime import datetime
 import config
 
+def _migration_1_schema(cursor: sqlite3.Cursor):
+    """Asosiy jadvallar (versiyasiz eski bazalar uchun yetishmayotgan ustunlar ham qo'shiladi)"""
+    # Kitoblar jadvali
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS books (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            author TEXT,
+            file_id TEXT NOT NULL,
+            file_type TEXT NOT NULL,
+            file_size INTEGER,
+            upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            uploader_id INTEGER,
+            description TEXT,
+            storage_message_id INTEGER,
+            storage_chat_id TEXT,
+            is_multi_part BOOLEAN DEFAULT FALSE
+        )
+    ''')
+
+    # Qo'shimcha ustunlar mavjudligini tekshirish va qo'shish (migratsiya)
+    cursor.execute("PRAGMA table_info(books)")
+    existing_cols = {row[1] for row in cursor.fetchall()}
+    if 'storage_message_id' not in existing_cols:
+        cursor.execute("ALTER TABLE books ADD COLUMN storage_message_id INTEGER")
+    if 'storage_chat_id' not in existing_cols:
+        cursor.execute("ALTER TABLE books ADD COLUMN storage_chat_id TEXT")
+    if 'is_multi_part' not in existing_cols:
+        cursor.execute("ALTER TABLE books ADD COLUMN is_multi_part BOOLEAN DEFAULT FALSE")
+    if 'file_unique_id' not in existing_cols:
+        cursor.execute("ALTER TABLE books ADD COLUMN file_unique_id TEXT")
+    # Kitob fayllari jadvali (qismlar)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS book_files (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            book_id INTEGER NOT NULL,
+            file_id TEXT NOT NULL,
+            file_type TEXT NOT NULL,
+            file_size INTEGER,
+            storage_message_id INTEGER,
+            storage_chat_id TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(book_id) REFERENCES books(id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute("PRAGMA table_info(book_files)")
+    bf_existing_cols = {row[1] for row in cursor.fetchall()}
+    if 'file_unique_id' not in bf_existing_cols:
+        cursor.execute("ALTER TABLE book_files ADD COLUMN file_unique_id TEXT")
+    # Bitta fayl (file_unique_id) bazada faqat bir marta saqlanadi.
+    # Qismli kitoblarda books qatoriga file_unique_id yozilmaydi (u book_files da turadi)
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_books_file_unique_id
+        ON books (file_unique_id) WHERE file_unique_id IS NOT NULL
+    ''')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_book_files_file_unique_id
+        ON book_files (file_unique_id) WHERE file_unique_id IS NOT NULL
+    ''')
+
+
+    # Foydalanuvchilar jadvali
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            last_name TEXT,
+            is_bot BOOLEAN DEFAULT FALSE,
+            language_code TEXT,
+            join_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Guruhlar jadvali
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS groups (
+            id INTEGER PRIMARY KEY,
+            title TEXT,
+            type TEXT,
+            join_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT TRUE
+        )
+    ''')
+    # Guruhlar jadvali uchun migratsiya: last_activity ustunini qo'shish
+    cursor.execute("PRAGMA table_info(groups)")
+    groups_existing_cols = {row[1] for row in cursor.fetchall()}
+    if 'last_activity' not in groups_existing_cols:
+        cursor.execute("ALTER TABLE groups ADD COLUMN last_activity TIMESTAMP")
+
+    # Majburiy obuna kanallari
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS required_channels (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel_id TEXT UNIQUE NOT NULL,
+            channel_title TEXT,
+            channel_username TEXT,
+            invite_link TEXT,
+            added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT TRUE
+        )
+    ''')
+    # Qo'shimcha ustunlarni migratsiya tarzida qo'shish
+    cursor.execute("PRAGMA table_info(required_channels)")
+    rc_existing_cols = {row[1] for row in cursor.fetchall()}
+    if 'invite_link' not in rc_existing_cols:
+        cursor.execute("ALTER TABLE required_channels ADD COLUMN invite_link TEXT")
+
+    # Reklama aniqlash qoidalari (admin panel orqali tahrirlanadi)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ad_rules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            kind TEXT NOT NULL DEFAULT 'regex',
+            pattern TEXT NOT NULL,
+            requires TEXT,
+            scope TEXT NOT NULL DEFAULT 'group',
+            enabled BOOLEAN DEFAULT TRUE,
+            hits INTEGER DEFAULT 0,
+            cost_ns INTEGER DEFAULT 0,
+            samples INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Qismli kitoblarni yuborish navbati (restartdan keyin davom ettiriladi)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS delivery_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            chat_id INTEGER NOT NULL,
+            book_id INTEGER NOT NULL,
+            file_type TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            sent_count INTEGER DEFAULT 0,
+            total INTEGER DEFAULT 0,
+            status_message_id INTEGER,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Bir chatga bir kitobni bir vaqtda faqat bitta faol vazifa yuboradi
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_delivery_jobs_active
+        ON delivery_jobs (chat_id, book_id, file_type)
+        WHERE status IN ('pending', 'running')
+    ''')
+
+
+def _migration_2_backfill_book_files(cursor: sqlite3.Cursor):
+    """Eski kitoblar uchun book_files jadvalini bitta so'rov bilan to'ldirish"""
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_book_files_book_id ON book_files (book_id, file_type)
+    ''')
+    cursor.execute('''
+        INSERT INTO book_files (book_id, file_id, file_type, file_size, storage_message_id, storage_chat_id)
+        SELECT b.id, b.file_id, b.file_type, b.file_size, b.storage_message_id, b.storage_chat_id
+        FROM books b
+        WHERE NOT EXISTS (SELECT 1 FROM book_files bf WHERE bf.book_id = b.id)
+    ''')
+
+
+def _migration_3_popularity(cursor: sqlite3.Cursor):
+    """Yuklab olishlar hisoblagichi (qidiruv tartibi uchun) va qidiruv so'rovlari statistikasi"""
+    cursor.execute("PRAGMA table_info(books)")
+    if 'downloads' not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute("ALTER TABLE books ADD COLUMN downloads INTEGER NOT NULL DEFAULT 0")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS search_queries (
+            query TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0,
+            results INTEGER,
+            last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _migration_4_book_list_indexes(cursor: sqlite3.Cursor):
+    """/top va /new ro'yxatlarini yuklash jadvalni to'liq o'qimasligi uchun indekslar"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_books_downloads ON books (downloads DESC, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_books_upload_date ON books (upload_date DESC, id DESC)')
+
+
+# Sxema migratsiyalari: i-element bazani i+1 versiyaga o'tkazadi (PRAGMA user_version).
+# Yangi o'zgarish faqat ro'yxat oxiriga yangi funksiya sifatida qo'shiladi
+MIGRATIONS = [
+    _migration_1_schema,
+    _migration_2_backfill_book_files,
+    _migration_3_popularity,
+    _migration_4_book_list_indexes,
+]
+
+
+# So'rov vaqtini kuzatuvchilar: hook(statement_kind, seconds) (masalan, metrikalar)
+_query_hooks: list = []
+
+
+def add_query_hook(hook):
+    """Har bir execute/executemany dan keyin chaqiriladigan funksiyani qo'shish"""
+    _query_hooks.append(hook)
+
+
+def _observe_query(sql: str, started: float):
+    elapsed = time.perf_counter() - started
+    kind = _statement_kind(sql)
+    for hook in _query_hooks:
+        hook(kind, elapsed)
+
+
+@lru_cache(maxsize=1024)
+def _statement_kind(sql: str) -> str:
+    """Metrika labeli: SQL ning birinchi so'zi (SELECT, INSERT, ...)"""
+    words = sql.split(None, 1)
+    return words[0].upper() if words else 'EMPTY'
+
+
+class _TimedCursor(sqlite3.Cursor):
+    """execute/executemany vaqtini query hooklarga uzatadi"""
+
+    def execute(self, sql, parameters=()):
+        if not _query_hooks:
+            return super().execute(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _observe_query(sql, started)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not _query_hooks:
+            return super().executemany(sql, seq_of_parameters)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _observe_query(sql, started)
+
+
+class _TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=_TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def _connect(db_path: str, **kwargs) -> sqlite3.Connection:
+    return sqlite3.connect(db_path, factory=_TimedConnection, **kwargs)
+
+
 class Database:
+    # Shu jarayonda sxemasi tayyor bo'lgan bazalar: qayta Database() yaratish bazaga murojaat qilmaydi
+    _ready_paths: set = set()
+
     def __init__(self):
         self.db_path = config.DATABASE_PATH
-        self.init_database()
+        if self.db_path not in Database._ready_paths:
+            self.init_database()
     
     def init_database(self):
-        """Ma'lumotlar bazasini yaratish va jadvallarni tayyorlash"""
+        """Ma'lumotlar bazasini yaratish va bajarilmagan migratsiyalarni bir marta bajarish"""
         import os
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Kitoblar jadvali
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS books (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                author TEXT,
-                file_id TEXT NOT NULL,
-                file_type TEXT NOT NULL,
-                file_size INTEGER,
-                upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                uploader_id INTEGER,
-                description TEXT,
-                storage_message_id INTEGER,
-                storage_chat_id TEXT,
-                is_multi_part BOOLEAN DEFAULT FALSE
-            )
-        ''')
-
-        # Qo'shimcha ustunlar mavjudligini tekshirish va qo'shish (migratsiya)
-        cursor.execute("PRAGMA table_info(books)")
-        existing_cols = {row[1] for row in cursor.fetchall()}
-        if 'storage_message_id' not in existing_cols:
-            cursor.execute("ALTER TABLE books ADD COLUMN storage_message_id INTEGER")
-        if 'storage_chat_id' not in existing_cols:
-            cursor.execute("ALTER TABLE books ADD COLUMN storage_chat_id TEXT")
-        if 'is_multi_part' not in existing_cols:
-            cursor.execute("ALTER TABLE books ADD COLUMN is_multi_part BOOLEAN DEFAULT FALSE")
-        # Kitob fayllari jadvali (qismlar)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS book_files (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                book_id INTEGER NOT NULL,
-                file_id TEXT NOT NULL,
-                file_type TEXT NOT NULL,
-                file_size INTEGER,
-                storage_message_id INTEGER,
-                storage_chat_id TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY(book_id) REFERENCES books(id) ON DELETE CASCADE
-            )
-        ''')
-
-        
-        # Foydalanuvchilar jadvali
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY,
-                username TEXT,
-                first_name TEXT,
-                last_name TEXT,
-                is_bot BOOLEAN DEFAULT FALSE,
-                language_code TEXT,
-                join_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Guruhlar jadvali
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS groups (
-                id INTEGER PRIMARY KEY,
-                title TEXT,
-                type TEXT,
-                join_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                is_active BOOLEAN DEFAULT TRUE
-            )
-        ''')
-        # Guruhlar jadvali uchun migratsiya: last_activity ustunini qo'shish
-        cursor.execute("PRAGMA table_info(groups)")
-        groups_existing_cols = {row[1] for row in cursor.fetchall()}
-        if 'last_activity' not in groups_existing_cols:
-            cursor.execute("ALTER TABLE groups ADD COLUMN last_activity TIMESTAMP")
-        
-        # Majburiy obuna kanallari
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS required_channels (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                channel_id TEXT UNIQUE NOT NULL,
-                channel_title TEXT,
-                channel_username TEXT,
-                invite_link TEXT,
-                added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                is_active BOOLEAN DEFAULT TRUE
-            )
-        ''')
-        # Qo'shimcha ustunlarni migratsiya tarzida qo'shish
-        cursor.execute("PRAGMA table_info(required_channels)")
-        rc_existing_cols = {row[1] for row in cursor.fetchall()}
-        if 'invite_link' not in rc_existing_cols:
-            cursor.execute("ALTER TABLE required_channels ADD COLUMN invite_link TEXT")
-        
-        # Eski kitoblar uchun book_files jadvalini to'ldirish
-        cursor.execute('SELECT id, file_id, file_type, file_size, storage_message_id, storage_chat_id FROM books')
-        books_rows = cursor.fetchall()
-        for row in books_rows:
-            cursor.execute('SELECT 1 FROM book_files WHERE book_id = ? LIMIT 1', (row[0],))
-            exists = cursor.fetchone()
-            if not exists:
-                cursor.execute('''
-                    INSERT INTO book_files (book_id, file_id, file_type, file_size, storage_message_id, storage_chat_id)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (row[0], row[1], row[2], row[3], row[4], row[5]))
-        
-        conn.commit()
-        conn.close()
+        conn = _connect(self.db_path, isolation_level=None)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("PRAGMA user_version")
+            if cursor.fetchone()[0] < len(MIGRATIONS):
+                cursor.execute("BEGIN IMMEDIATE")
+                # Boshqa jarayon shu orada migratsiya qilgan bo'lishi mumkin
+                cursor.execute("PRAGMA user_version")
+                version = cursor.fetchone()[0]
+                for target, migration in enumerate(MIGRATIONS[version:], version + 1):
+                    migration(cursor)
+                    cursor.execute(f"PRAGMA user_version = {target}")
+                cursor.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            conn.close()
+        Database._ready_paths.add(self.db_path)
+    
+    def close(self):
+        """Bot to'xtaganda: SQLite so'rov rejalashtiruvchisi statistikasini yangilash"""
+        conn = _connect(self.db_path)
+        try:
+            conn.execute("PRAGMA optimize")
+        except Exception as e:
+            print(f"PRAGMA optimize xatolik: {e}")
+        finally:
+            conn.close()
     
     def add_book(self, title: str, author: str, file_id: str, file_type: str, 
                  file_size: int, uploader_id: int, description: str = "",
                  storage_message_id: int | None = None, storage_chat_id: str | None = None,
-                 is_multi_part: bool = False) -> int | bool:
+                 is_multi_part: bool = False, file_unique_id: str | None = None) -> int | bool:
         """Yangi kitob qo'shish. Muvaffaqiyatli bo'lsa book_id qaytaradi."""
+        conn = _connect(self.db_path)
         try:
-            conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
-                INSERT INTO books (title, author, file_id, file_type, file_size, uploader_id, description, storage_message_id, storage_chat_id, is_multi_part)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (title, author, file_id, file_type, file_size, uploader_id, description, storage_message_id, storage_chat_id, int(is_multi_part)))
-            
+                INSERT INTO books (title, author, file_id, file_type, file_size, uploader_id, description, storage_message_id, storage_chat_id, is_multi_part, file_unique_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (title, author, file_id, file_type, file_size, uploader_id, description, storage_message_id, storage_chat_id,
+                  int(is_multi_part), None if is_multi_part else file_unique_id))
             book_id = cursor.lastrowid
+            # Asosiy faylni book_files jadvaliga shu tranzaksiyada qo'shish
+            # (fayl takroriy bo'lsa, kitob ham qo'shilmaydi)
+            cursor.execute('''
+                INSERT INTO book_files (book_id, file_id, file_type, file_size, storage_message_id, storage_chat_id, file_unique_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (book_id, file_id, file_type, file_size, storage_message_id, storage_chat_id, file_unique_id))
             conn.commit()
-            conn.close()
-            # Asosiy faylni book_files jadvaliga qo'shish
-            self.add_book_file(
-                book_id=book_id,
-                file_id=file_id,
-                file_type=file_type,
-                file_size=file_size,
-                storage_message_id=storage_message_id,
-                storage_chat_id=storage_chat_id
-            )
             return book_id
         except Exception as e:
+            conn.rollback()
             print(f"Kitob qo'shishda xatolik: {e}")
             return False
+        finally:
+            conn.close()
+    
+    def add_books_bulk(self, books: List[Dict]) -> List[Optional[int]]:
+        """Bir nechta kitobni bitta tranzaksiyada qo'shish (avtomatik yuklash uchun).
+        book_id lar ro'yxatini kirish tartibida qaytaradi; bazada bor fayl (unique index)
+        faqat o'z qatorini o'tkazib yuboradi (None), qolganlari saqlanadi."""
+        if not books:
+            return []
+        conn = _connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            # Savepoint lar bitta tashqi tranzaksiya ichida bo'lishi uchun (RELEASE commit qilmaydi)
+            cursor.execute('BEGIN')
+            book_ids = []
+            for book in books:
+                cursor.execute('SAVEPOINT book_row')
+                try:
+                    cursor.execute('''
+                        INSERT INTO books (title, author, file_id, file_type, file_size, uploader_id, description, storage_message_id, storage_chat_id, is_multi_part, file_unique_id)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0, ?)
+                    ''', (book['title'], book['author'], book['file_id'], book['file_type'], book['file_size'],
+                          book['uploader_id'], book.get('description', ""), book.get('storage_message_id'),
+                          book.get('storage_chat_id'), book.get('file_unique_id')))
+                    book_id = cursor.lastrowid
+                    cursor.execute('''
+                        INSERT INTO book_files (book_id, file_id, file_type, file_size, storage_message_id, storage_chat_id, file_unique_id)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ''', (book_id, book['file_id'], book['file_type'], book['file_size'],
+                          book.get('storage_message_id'), book.get('storage_chat_id'), book.get('file_unique_id')))
+                except sqlite3.IntegrityError as e:
+                    cursor.execute('ROLLBACK TO book_row')
+                    print(f"Kitob o'tkazib yuborildi ({book['title']}): {e}")
+                    book_id = None
+                cursor.execute('RELEASE book_row')
+                book_ids.append(book_id)
+            conn.commit()
+            return book_ids
+        except Exception as e:
+            conn.rollback()
+            print(f"Kitoblarni qo'shishda xatolik: {e}")
+            return [None] * len(books)
+        finally:
+            conn.close()
     
     def search_books(self, query: str) -> List[Dict]:
-        """Kitob qidirish"""
-        conn = sqlite3.connect(self.db_path)
+        """Kitob qidirish (avval ko'p yuklab olinganlari)"""
+        conn = _connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
             SELECT id, title, author, file_id, file_type, file_size, upload_date,
                    uploader_id, description, storage_message_id, storage_chat_id,
-                    COALESCE(is_multi_part, 0)
+                    COALESCE(is_multi_part, 0), downloads
             FROM books 
             WHERE title LIKE ? OR author LIKE ? OR description LIKE ?
-            ORDER BY title
+            ORDER BY downloads DESC, title
         ''', (f'%{query}%', f'%{query}%', f'%{query}%'))
         
         books = []
@@ -185,7 +410,8 @@ class Database:
                 'description': row[8],
                 'storage_message_id': row[9],
                 'storage_chat_id': row[10],
-                'is_multi_part': bool(row[11])
+                'is_multi_part': bool(row[11]),
+                'downloads': row[12]
             })
         
         conn.close()
@@ -194,7 +420,7 @@ class Database:
     def delete_book(self, book_id: int) -> bool:
         """Kitobni o'chirish"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = _connect(self.db_path)
             cursor = conn.cursor()
             cursor.execute('DELETE FROM book_files WHERE book_id = ?', (book_id,))
             cursor.execute('DELETE FROM books WHERE id = ?', (book_id,))
@@ -208,7 +434,7 @@ class Database:
     
     def get_all_books(self) -> List[Dict]:
         """Barcha kitoblarni olish"""
-        conn = sqlite3.connect(self.db_path)
+        conn = _connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -242,7 +468,7 @@ class Database:
     def add_user(self, user_id: int, username: str, first_name: str, 
                  last_name: str, is_bot: bool, language_code: str):
         """Foydalanuvchini qo'shish yoki yangilash"""
-        conn = sqlite3.connect(self.db_path)
+        conn = _connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -256,7 +482,7 @@ class Database:
     
     def add_group(self, group_id: int, title: str, group_type: str):
         """Guruhni qo'shish yoki yangilash"""
-        conn = sqlite3.connect(self.db_path)
+        conn = _connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -270,7 +496,7 @@ class Database:
     
     def add_required_channel(self, channel_id: str, channel_title: str, channel_username: str | None, invite_link: str | None = None):
         """Majburiy obuna kanalini qo'shish"""
-        conn = sqlite3.connect(self.db_path)
+        conn = _connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -284,7 +510,7 @@ class Database:
     
     def get_required_channels(self) -> List[Dict]:
         """Majburiy obuna kanallarini olish"""
-        conn = sqlite3.connect(self.db_path)
+        conn = _connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('SELECT id, channel_id, channel_title, channel_username, invite_link, added_date, is_active FROM required_channels WHERE is_active = TRUE')
@@ -307,7 +533,7 @@ class Database:
     def delete_required_channel(self, rc_id: int) -> bool:
         """Majburiy obuna kanalini o'chirish (faolsizlantirish)"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = _connect(self.db_path)
             cursor = conn.cursor()
             cursor.execute('UPDATE required_channels SET is_active = FALSE WHERE id = ?', (rc_id,))
             conn.commit()
@@ -321,7 +547,7 @@ class Database:
     def update_required_channel_invite_link(self, rc_id: int, invite_link: str) -> bool:
         """Kanal uchun invite_link qiymatini yangilash"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = _connect(self.db_path)
             cursor = conn.cursor()
             cursor.execute('UPDATE required_channels SET invite_link = ? WHERE id = ?', (invite_link, rc_id))
             conn.commit()
@@ -334,7 +560,7 @@ class Database:
     
     def get_statistics(self) -> Dict:
         """Statistikani olish"""
-        conn = sqlite3.connect(self.db_path)
+        conn = _connect(self.db_path)
         cursor = conn.cursor()
         
         # Kitoblar soni
@@ -352,6 +578,10 @@ class Database:
         # Majburiy obuna kanallari soni
         cursor.execute('SELECT COUNT(*) FROM required_channels WHERE is_active = TRUE')
         channels_count = cursor.fetchone()[0]
+
+        # Yuklab olishlar (hisoblagichlar har POPULARITY_FLUSH_INTERVAL da yoziladi)
+        cursor.execute('SELECT COALESCE(SUM(downloads), 0) FROM books')
+        downloads_count = cursor.fetchone()[0]
         
         conn.close()
         
@@ -359,12 +589,13 @@ class Database:
             'books_count': books_count,
             'users_count': users_count,
             'groups_count': groups_count,
-            'channels_count': channels_count
+            'channels_count': channels_count,
+            'downloads_count': downloads_count
         }
 
     def get_all_user_ids(self) -> List[int]:
         """Barcha foydalanuvchi chat_id larini olish"""
-        conn = sqlite3.connect(self.db_path)
+        conn = _connect(self.db_path)
         cursor = conn.cursor()
         cursor.execute('SELECT id FROM users')
         ids = [row[0] for row in cursor.fetchall()]
@@ -373,7 +604,7 @@ class Database:
 
     def get_all_group_ids(self) -> List[int]:
         """Barcha guruh chat_id larini olish (faollar)"""
-        conn = sqlite3.connect(self.db_path)
+        conn = _connect(self.db_path)
         cursor = conn.cursor()
         try:
             cursor.execute('SELECT id FROM groups WHERE is_active = TRUE')
@@ -386,25 +617,52 @@ class Database:
     def add_book_file(self, book_id: int, file_id: str, file_type: str,
                       file_size: int | None = None,
                       storage_message_id: int | None = None,
-                      storage_chat_id: str | None = None) -> bool:
+                      storage_chat_id: str | None = None,
+                      file_unique_id: str | None = None) -> bool:
         """Kitobga tegishli fayl (qism) qo'shish"""
+        conn = _connect(self.db_path)
         try:
-            conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             cursor.execute('''
-                INSERT INTO book_files (book_id, file_id, file_type, file_size, storage_message_id, storage_chat_id)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (book_id, file_id, file_type, file_size, storage_message_id, storage_chat_id))
+                INSERT INTO book_files (book_id, file_id, file_type, file_size, storage_message_id, storage_chat_id, file_unique_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (book_id, file_id, file_type, file_size, storage_message_id, storage_chat_id, file_unique_id))
             conn.commit()
-            conn.close()
             return True
         except Exception as e:
             print(f"Kitob faylini qo'shishda xatolik: {e}")
             return False
+        finally:
+            conn.close()
+
+    def find_file_by_unique_id(self, file_unique_id: str) -> Optional[Dict]:
+        """Fayl bazada bormi (file_unique_id bo'yicha): kitob va fayl ma'lumotlari yoki None"""
+        if not file_unique_id:
+            return None
+        conn = _connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT bf.book_id, bf.file_type, b.title, b.author, COALESCE(b.is_multi_part, 0)
+            FROM book_files bf
+            JOIN books b ON b.id = bf.book_id
+            WHERE bf.file_unique_id = ?
+            LIMIT 1
+        ''', (file_unique_id,))
+        row = cursor.fetchone()
+        conn.close()
+        if not row:
+            return None
+        return {
+            'book_id': row[0],
+            'file_type': row[1],
+            'title': row[2],
+            'author': row[3],
+            'is_multi_part': bool(row[4])
+        }
 
     def get_book_files(self, book_id: int, file_type: str | None = None) -> List[Dict]:
         """Belgilangan kitobga tegishli barcha qism fayllarini olish"""
-        conn = sqlite3.connect(self.db_path)
+        conn = _connect(self.db_path)
         cursor = conn.cursor()
         if file_type:
             cursor.execute('''
@@ -433,9 +691,20 @@ class Database:
         conn.close()
         return files
 
+    def get_book_file_counts(self, book_id: int) -> Dict[str, int]:
+        """Kitob qismlari soni turlar bo'yicha: {'document': n, 'audio': m}"""
+        conn = _connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT file_type, COUNT(*) FROM book_files WHERE book_id = ? GROUP BY file_type
+        ''', (book_id,))
+        counts = {row[0]: row[1] for row in cursor.fetchall()}
+        conn.close()
+        return counts
+
     def get_book_by_id(self, book_id: int) -> Optional[Dict]:
         """Bitta kitob ma'lumotlarini olish"""
-        conn = sqlite3.connect(self.db_path)
+        conn = _connect(self.db_path)
         cursor = conn.cursor()
         cursor.execute('''
             SELECT id, title, author, file_id, file_type, file_size, upload_date,
@@ -462,3 +731,315 @@ class Database:
             'storage_chat_id': row[10],
             'is_multi_part': bool(row[11])
         }
+
+    def get_ad_rules(self, include_disabled: bool = True) -> List[Dict]:
+        """Reklama aniqlash qoidalarini olish"""
+        conn = _connect(self.db_path)
+        cursor = conn.cursor()
+        query = '''
+            SELECT id, name, kind, pattern, requires, scope, enabled, hits, cost_ns, samples
+            FROM ad_rules
+        '''
+        if not include_disabled:
+            query += ' WHERE enabled = TRUE'
+        cursor.execute(query + ' ORDER BY id')
+        rules = []
+        for row in cursor.fetchall():
+            rules.append({
+                'id': row[0],
+                'name': row[1],
+                'kind': row[2],
+                'pattern': row[3],
+                'requires': row[4],
+                'scope': row[5],
+                'enabled': bool(row[6]),
+                'hits': row[7] or 0,
+                'cost_ns': row[8] or 0,
+                'samples': row[9] or 0
+            })
+        conn.close()
+        return rules
+
+    def get_ad_rules_signature(self) -> tuple:
+        """Qoidalar o'zgarganini aniqlash uchun arzon "imzo" (hot-reload uchun)"""
+        conn = _connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT COUNT(*), COALESCE(MAX(updated_at), ''), COALESCE(SUM(enabled), 0),
+                   COALESCE(SUM(LENGTH(pattern) + LENGTH(COALESCE(requires, ''))), 0)
+            FROM ad_rules
+        ''')
+        signature = tuple(cursor.fetchone())
+        conn.close()
+        return signature
+
+    def seed_ad_rules(self, rules: List[Dict]) -> bool:
+        """Standart qoidalarni yozish (faqat jadval hech qachon to'ldirilmagan bo'lsa)"""
+        try:
+            conn = _connect(self.db_path)
+            cursor = conn.cursor()
+            # AUTOINCREMENT jadvallar sqlite_sequence da iz qoldiradi, shuning uchun
+            # admin barcha qoidalarni o'chirsa ham ular qayta tiklanmaydi
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'")
+            if cursor.fetchone():
+                cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'ad_rules'")
+                if cursor.fetchone():
+                    conn.close()
+                    return False
+            cursor.executemany('''
+                INSERT INTO ad_rules (name, kind, pattern, requires, scope)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(r['name'], r['kind'], r['pattern'], r.get('requires'), r.get('scope', 'group')) for r in rules])
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Reklama qoidalarini yozishda xatolik: {e}")
+            return False
+
+    def add_ad_rule(self, name: str, kind: str, pattern: str,
+                    requires: str | None = None, scope: str = 'group') -> int | bool:
+        """Yangi reklama qoidasini qo'shish. Muvaffaqiyatli bo'lsa rule_id qaytaradi."""
+        try:
+            conn = _connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO ad_rules (name, kind, pattern, requires, scope)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (name, kind, pattern, requires, scope))
+            rule_id = cursor.lastrowid
+            conn.commit()
+            conn.close()
+            return rule_id
+        except Exception as e:
+            print(f"Reklama qoidasini qo'shishda xatolik: {e}")
+            return False
+
+    def set_ad_rule_enabled(self, rule_id: int, enabled: bool) -> bool:
+        """Reklama qoidasini yoqish yoki o'chirish"""
+        try:
+            conn = _connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE ad_rules SET enabled = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?
+            ''', (int(enabled), rule_id))
+            conn.commit()
+            affected = cursor.rowcount
+            conn.close()
+            return affected > 0
+        except Exception as e:
+            print(f"Reklama qoidasini yangilashda xatolik: {e}")
+            return False
+
+    def delete_ad_rule(self, rule_id: int) -> bool:
+        """Reklama qoidasini o'chirish"""
+        try:
+            conn = _connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM ad_rules WHERE id = ?', (rule_id,))
+            conn.commit()
+            affected = cursor.rowcount
+            conn.close()
+            return affected > 0
+        except Exception as e:
+            print(f"Reklama qoidasini o'chirishda xatolik: {e}")
+            return False
+
+    def add_ad_rule_stats(self, stats: List[tuple]) -> bool:
+        """Qoida hisoblagichlarini qo'shish: [(hits, cost_ns, samples, rule_id), ...]"""
+        if not stats:
+            return True
+        try:
+            conn = _connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.executemany('''
+                UPDATE ad_rules
+                SET hits = hits + ?, cost_ns = cost_ns + ?, samples = samples + ?
+                WHERE id = ?
+            ''', stats)
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Qoida statistikasini saqlashda xatolik: {e}")
+            return False
+
+    def add_popularity_counts(self, downloads: List[tuple], queries: List[tuple]) -> bool:
+        """Hisoblagichlarni bitta tranzaksiyada qo'shish:
+        downloads - [(soni, book_id), ...], queries - [(so'rov, soni, natijalar), ...]"""
+        if not downloads and not queries:
+            return True
+        try:
+            conn = _connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.executemany('UPDATE books SET downloads = downloads + ? WHERE id = ?', downloads)
+            cursor.executemany('''
+                INSERT INTO search_queries (query, count, results, last_seen)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(query) DO UPDATE SET
+                    count = count + excluded.count,
+                    results = excluded.results,
+                    last_seen = excluded.last_seen
+            ''', queries)
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Hisoblagichlarni saqlashda xatolik: {e}")
+            return False
+
+    def get_top_queries(self, limit: int = 10) -> List[Dict]:
+        """Eng ko'p qidirilgan so'rovlar"""
+        conn = _connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT query, count, results FROM search_queries ORDER BY count DESC LIMIT ?', (limit,))
+        queries = [{'query': row[0], 'count': row[1], 'results': row[2]} for row in cursor.fetchall()]
+        conn.close()
+        return queries
+
+    _BOOK_SUMMARY_COLUMNS = 'id, title, author, COALESCE(is_multi_part, 0), downloads, upload_date'
+
+    def _book_summary_from_row(self, row) -> Dict:
+        return {
+            'id': row[0],
+            'title': row[1],
+            'author': row[2],
+            'is_multi_part': bool(row[3]),
+            'downloads': row[4],
+            'upload_date': row[5]
+        }
+
+    def _get_book_summaries(self, where: str, params: tuple = ()) -> List[Dict]:
+        conn = _connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT {self._BOOK_SUMMARY_COLUMNS} FROM books {where}', params)
+        books = [self._book_summary_from_row(row) for row in cursor.fetchall()]
+        conn.close()
+        return books
+
+    def get_top_books(self, limit: int) -> List[Dict]:
+        """Eng ko'p yuklab olingan kitoblar (ro'yxatlar uchun qisqa ma'lumot)"""
+        return self._get_book_summaries('ORDER BY downloads DESC, id LIMIT ?', (limit,))
+
+    def get_new_books(self, limit: int) -> List[Dict]:
+        """Oxirgi qo'shilgan kitoblar (ro'yxatlar uchun qisqa ma'lumot)"""
+        return self._get_book_summaries('ORDER BY upload_date DESC, id DESC LIMIT ?', (limit,))
+
+    def get_books_after(self, book_id: int) -> List[Dict]:
+        """ID si book_id dan katta kitoblar (yangi qo'shilganlar)"""
+        return self._get_book_summaries('WHERE id > ? ORDER BY id', (book_id,))
+
+    def get_books_by_ids(self, book_ids: List[int]) -> List[Dict]:
+        """Berilgan ID lar bo'yicha kitoblar (qisqa ma'lumot)"""
+        books = []
+        for i in range(0, len(book_ids), 500):
+            chunk = book_ids[i:i + 500]
+            books.extend(self._get_book_summaries(
+                f"WHERE id IN ({', '.join('?' * len(chunk))})", tuple(chunk)
+            ))
+        return books
+
+    def get_last_book_id(self) -> int:
+        """Eng katta kitob ID si (kitob bo'lmasa 0)"""
+        conn = _connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM books')
+        book_id = cursor.fetchone()[0]
+        conn.close()
+        return book_id
+
+    def _delivery_job_from_row(self, row) -> Dict:
+        return {
+            'id': row[0],
+            'user_id': row[1],
+            'chat_id': row[2],
+            'book_id': row[3],
+            'file_type': row[4],
+            'status': row[5],
+            'sent_count': row[6],
+            'total': row[7],
+            'status_message_id': row[8],
+            'error': row[9],
+        }
+
+    def create_delivery_job(self, user_id: int, chat_id: int, book_id: int, file_type: str, total: int) -> tuple:
+        """
+        Yuborish vazifasini yaratish: (job_id, created). Shu chat va kitob uchun faol
+        vazifa bo'lsa, yangisi yaratilmaydi va mavjudining ID si qaytadi.
+        """
+        conn = _connect(self.db_path)
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                INSERT INTO delivery_jobs (user_id, chat_id, book_id, file_type, total)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (user_id, chat_id, book_id, file_type, total))
+            conn.commit()
+            return cursor.lastrowid, True
+        except sqlite3.IntegrityError:
+            cursor.execute('''
+                SELECT id FROM delivery_jobs
+                WHERE chat_id = ? AND book_id = ? AND file_type = ? AND status IN ('pending', 'running')
+            ''', (chat_id, book_id, file_type))
+            row = cursor.fetchone()
+            return (row[0] if row else None), False
+        finally:
+            conn.close()
+
+    def get_delivery_job(self, job_id: int) -> Optional[Dict]:
+        """Bitta yuborish vazifasini olish"""
+        conn = _connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, user_id, chat_id, book_id, file_type, status, sent_count, total, status_message_id, error
+            FROM delivery_jobs WHERE id = ?
+        ''', (job_id,))
+        row = cursor.fetchone()
+        conn.close()
+        return self._delivery_job_from_row(row) if row else None
+
+    def get_unfinished_delivery_jobs(self) -> List[Dict]:
+        """Tugallanmagan vazifalar (restartdan keyin davom ettirish uchun). 'running' lar qayta navbatga qo'yiladi."""
+        conn = _connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("UPDATE delivery_jobs SET status = 'pending' WHERE status = 'running'")
+        conn.commit()
+        cursor.execute('''
+            SELECT id, user_id, chat_id, book_id, file_type, status, sent_count, total, status_message_id, error
+            FROM delivery_jobs WHERE status = 'pending' ORDER BY id
+        ''')
+        jobs = [self._delivery_job_from_row(row) for row in cursor.fetchall()]
+        conn.close()
+        return jobs
+
+    def update_delivery_job(self, job_id: int, **fields) -> bool:
+        """Vazifa maydonlarini yangilash (status, sent_count, total, status_message_id, error)"""
+        allowed = {'status', 'sent_count', 'total', 'status_message_id', 'error'}
+        fields = {k: v for k, v in fields.items() if k in allowed}
+        if not fields:
+            return False
+        try:
+            conn = _connect(self.db_path)
+            cursor = conn.cursor()
+            assignments = ", ".join(f"{k} = ?" for k in fields)
+            cursor.execute(
+                f"UPDATE delivery_jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (*fields.values(), job_id)
+            )
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Yuborish vazifasini yangilashda xatolik: {e}")
+            return False
+
+
+_instance: Optional[Database] = None
+
+
+def get_db() -> Database:
+    """Jarayon bo'yicha yagona Database obyekti (handlerlar, navbatlar va dispatcher DI uchun)"""
+    global _instance
+    if _instance is None:
+        _instance = Database()
+    return _instance
@@ -1,6 +1,6 @@
 """
 Handlerlarni birlashtirish uchun __init__.py fayli
 """
-from . import basic, books, groups, admin, broadcast
+from . import basic, books, groups, admin, broadcast, inline, browse
 
-__all__ = ['basic', 'books', 'groups', 'admin', 'broadcast']
+__all__ = ['basic', 'books', 'groups', 'admin', 'broadcast', 'inline', 'browse']
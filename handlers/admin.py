@@ -7,16 +7,20 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from database.db import Database
 from utils.helpers import is_admin, escape_markdown
+from utils import ad_rules
 import config
+import re
 
 router = Router()
-db = Database()
 
 class ChannelStates(StatesGroup):
     waiting_for_channel = State()
 
+class AdRuleStates(StatesGroup):
+    waiting_for_rule = State()
+
 @router.message(ChannelStates.waiting_for_channel, F.forward_from_chat)
-async def process_channel_forward(message: Message, state: FSMContext):
+async def process_channel_forward(message: Message, state: FSMContext, db: Database):
     """Private kanal(post) forwardi orqali kanalni aniqlash"""
     # Admin buyruqlari faqat shaxsiy chatda ishlaydi
     if message.chat.type != "private":
@@ -67,7 +71,7 @@ async def process_channel_forward(message: Message, state: FSMContext):
         await state.clear()
 
 @router.message(ChannelStates.waiting_for_channel)
-async def process_channel(message: Message, state: FSMContext):
+async def process_channel(message: Message, state: FSMContext, db: Database):
     """Kanal ma'lumotlarini qabul qilish"""
     # Admin buyruqlari faqat shaxsiy chatda ishlaydi
     if message.chat.type != "private":
@@ -213,4 +217,193 @@ async def process_channel(message: Message, state: FSMContext):
         await message.answer(f"❌ Kanal qo'shishda xatolik: {str(e)}", reply_markup=keyboard)
     
     await state.clear()
-    
\ No newline at end of file
+
+AD_RULES_PER_PAGE = 10
+
+def _ad_rule_avg_cost_us(rule: dict) -> float:
+    """Qoidaning bir marta tekshirishdagi o'rtacha narxi (mikrosekund)"""
+    if not rule['samples']:
+        return 0.0
+    return rule['cost_ns'] / rule['samples'] / 1000
+
+async def _show_ad_rules(callback: CallbackQuery, db: Database, sort: str = "id", page: int = 0):
+    """Reklama qoidalari ro'yxati (hits va narx bilan)"""
+    # Xotiradagi hisoblagichlarni avval bazaga yozamiz
+    ad_rules.engine.flush_stats()
+    rules = db.get_ad_rules()
+    if sort == "cost":
+        # Kam ishlaydigan va qimmat qoidalar birinchi (tozalash uchun)
+        rules.sort(key=lambda r: (r['hits'], -_ad_rule_avg_cost_us(r)))
+
+    total_pages = max(1, (len(rules) + AD_RULES_PER_PAGE - 1) // AD_RULES_PER_PAGE)
+    page = max(0, min(page, total_pages - 1))
+    page_rules = rules[page * AD_RULES_PER_PAGE:(page + 1) * AD_RULES_PER_PAGE]
+    enabled_count = sum(1 for r in rules if r['enabled'])
+
+    tiers = ad_rules.engine.tier_stats
+    text = f"🛡 Reklama qoidalari (faol: {enabled_count}/{len(rules)})\n"
+    text += (
+        f"📊 Tekshiruvlar: tozalandi {tiers['cleared']} | to'liq {tiers['full']} | "
+        f"reklama {tiers['matched']} | bo'sh {tiers['empty']}\n"
+    )
+    text += "Saralash: " + ("kam ishlagan / qimmat" if sort == "cost" else "ID") + "\n\n"
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
+    for rule in page_rules:
+        status = "✅" if rule['enabled'] else "⛔️"
+        scope = " [qat'iy]" if rule['scope'] == 'strict' else ""
+        text += f"{status} #{rule['id']} {rule['name']}{scope}\n"
+        text += f"   🎯 {rule['hits']} ta | ⏱ {_ad_rule_avg_cost_us(rule):.1f} mks\n"
+        keyboard.inline_keyboard.append([
+            InlineKeyboardButton(
+                text=("⛔️ O'chirish" if rule['enabled'] else "✅ Yoqish") + f" #{rule['id']}",
+                callback_data=f"ad_rule_toggle_{rule['id']}_{sort}_{page}"
+            ),
+            InlineKeyboardButton(text="🗑", callback_data=f"ad_rule_delete_{rule['id']}_{sort}_{page}")
+        ])
+    if not rules:
+        text += "Qoidalar mavjud emas.\n"
+
+    nav_row = []
+    if page > 0:
+        nav_row.append(InlineKeyboardButton(text="◀️", callback_data=f"ad_rules_page_{sort}_{page - 1}"))
+    nav_row.append(InlineKeyboardButton(text="🔙", callback_data="admin_back"))
+    if page < total_pages - 1:
+        nav_row.append(InlineKeyboardButton(text="▶️", callback_data=f"ad_rules_page_{sort}_{page + 1}"))
+    keyboard.inline_keyboard.append(nav_row)
+    keyboard.inline_keyboard.append([
+        InlineKeyboardButton(text="➕ Qoida qo'shish", callback_data="ad_rule_add"),
+        InlineKeyboardButton(
+            text="🔢 ID bo'yicha" if sort == "cost" else "📉 Narx/hit bo'yicha",
+            callback_data=f"ad_rules_page_{'id' if sort == 'cost' else 'cost'}_0"
+        )
+    ])
+    await callback.message.edit_text(text, reply_markup=keyboard)
+
+@router.callback_query(F.data == "admin_ad_rules")
+async def admin_ad_rules_callback(callback: CallbackQuery, state: FSMContext, db: Database):
+    """Reklama qoidalari bo'limi"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("❌ Sizda admin huquqi yo'q!", show_alert=True)
+        return
+    await state.clear()
+    await _show_ad_rules(callback, db)
+
+@router.callback_query(F.data.startswith("ad_rules_page_"))
+async def ad_rules_page_callback(callback: CallbackQuery, db: Database):
+    """Reklama qoidalari sahifalarini almashtirish"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("❌ Sizda admin huquqi yo'q!", show_alert=True)
+        return
+    try:
+        _, _, _, sort, page_str = callback.data.split("_")
+        page = int(page_str)
+    except ValueError:
+        await callback.answer("❌ Noto'g'ri sahifa.", show_alert=True)
+        return
+    await _show_ad_rules(callback, db, sort=sort, page=page)
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("ad_rule_toggle_") | F.data.startswith("ad_rule_delete_"))
+async def ad_rule_edit_callback(callback: CallbackQuery, db: Database):
+    """Qoidani yoqish/o'chirish yoki butunlay o'chirish"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("❌ Sizda admin huquqi yo'q!", show_alert=True)
+        return
+    try:
+        _, _, action, rule_id_str, sort, page_str = callback.data.split("_")
+        rule_id = int(rule_id_str)
+        page = int(page_str)
+    except ValueError:
+        await callback.answer("❌ Noto'g'ri ma'lumot.", show_alert=True)
+        return
+
+    if action == "delete":
+        success = db.delete_ad_rule(rule_id)
+        notice = "🗑 Qoida o'chirildi"
+    else:
+        rule = next((r for r in db.get_ad_rules() if r['id'] == rule_id), None)
+        success = bool(rule) and db.set_ad_rule_enabled(rule_id, not rule['enabled'])
+        notice = "✅ Qoida yangilandi"
+    if not success:
+        await callback.answer("❌ Qoida topilmadi.", show_alert=True)
+        return
+
+    # Qayta ishga tushirmasdan yangi qoidalarni qo'llash
+    ad_rules.engine.reload()
+    await callback.answer(notice)
+    await _show_ad_rules(callback, db, sort=sort, page=page)
+
+@router.callback_query(F.data == "ad_rule_add")
+async def ad_rule_add_callback(callback: CallbackQuery, state: FSMContext):
+    """Yangi reklama qoidasini qo'shish"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("❌ Sizda admin huquqi yo'q!", show_alert=True)
+        return
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔙 Orqaga", callback_data="admin_ad_rules")]
+    ])
+    await callback.message.edit_text(
+        "➕ Yangi qoidani quyidagi formatda yuboring:\n\n"
+        "tur: pattern\n"
+        "shart: regex (ixtiyoriy)\n"
+        "nom: qoida nomi (ixtiyoriy)\n"
+        "doira: group yoki strict (ixtiyoriy)\n\n"
+        f"Turlar: {', '.join(ad_rules.RULE_KINDS)}\n\n"
+        "Misollar:\n"
+        "keyword: pul ishlash\n"
+        "regex: promo\\d+\n"
+        "shart: kanal|bot",
+        reply_markup=keyboard
+    )
+    await state.set_state(AdRuleStates.waiting_for_rule)
+
+@router.message(AdRuleStates.waiting_for_rule)
+async def process_ad_rule(message: Message, state: FSMContext, db: Database):
+    """Yangi qoidani qabul qilish, tekshirish va saqlash"""
+    if message.chat.type != "private":
+        await state.clear()
+        return
+
+    if not is_admin(message.from_user.id):
+        await message.answer("❌ Sizda admin huquqi yo'q!")
+        await state.clear()
+        return
+
+    fields = {}
+    for line in (message.text or "").splitlines():
+        key, sep, value = line.partition(":")
+        if sep and value.strip():
+            fields.setdefault(key.strip().lower(), value.strip())
+
+    kind = next((k for k in ad_rules.RULE_KINDS if k in fields), None)
+    if not kind:
+        await message.answer(f"❌ Qoida turi topilmadi. Turlar: {', '.join(ad_rules.RULE_KINDS)}")
+        return
+    pattern = fields[kind]
+    requires = fields.get("shart")
+    scope = fields.get("doira", "group")
+    if scope not in ad_rules.RULE_SCOPES:
+        await message.answer(f"❌ Noto'g'ri doira. Mumkin: {', '.join(ad_rules.RULE_SCOPES)}")
+        return
+
+    # Patternni tekshirish (noto'g'ri regex dvigatelni buzmasligi uchun)
+    try:
+        ad_rules.compile_rule_pattern(kind, pattern)
+        if requires:
+            re.compile(requires)
+    except re.error as e:
+        await message.answer(f"❌ Noto'g'ri regex: {e}")
+        return
+
+    name = fields.get("nom") or f"Admin: {pattern[:40]}"
+    rule_id = db.add_ad_rule(name=name, kind=kind, pattern=pattern, requires=requires, scope=scope)
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🛡 Qoidalar", callback_data="admin_ad_rules")]
+    ])
+    if not rule_id:
+        await message.answer("❌ Qoidani saqlashda xatolik yuz berdi.", reply_markup=keyboard)
+        return
+
+    ad_rules.engine.reload()
+    await message.answer(f"✅ Qoida qo'shildi: #{rule_id} {name}", reply_markup=keyboard)
+    await state.clear()
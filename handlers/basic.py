@@ -3,17 +3,23 @@ Asosiy handlerlar
 """
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
-from aiogram.filters import Command, StateFilter
+from aiogram.filters import Command, CommandObject, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from database.db import Database
-from utils.helpers import is_admin, escape_markdown, format_file_size
+from utils.formatting import TextBuilder
+from utils.helpers import is_admin, format_file_size
 from utils.subscription import is_subscribed_to_all, check_subscription, get_subscription_message_async
+from utils.render_cache import cache as render_cache
+from utils.inline_cache import cache as inline_cache
+from utils.book_lists import lists as book_lists
+from utils.deep_links import decode_book
 import config
+import logging
 
+logger = logging.getLogger(__name__)
 router = Router()
 # Guruhlarda ham ishlashi uchun filter olib tashlandi
-db = Database()
 
 async def safe_reply_or_send(message: Message, text: str, reply_markup=None, parse_mode=None):
     """Guruhlarda xavfsiz javob berish funksiyasi"""
@@ -34,10 +40,20 @@ async def safe_reply_or_send(message: Message, text: str, reply_markup=None, par
 class AdminStates(StatesGroup):
     pass  # Admin states endi admin.py da
 
+async def open_shared_book(message: Message, payload: str, db: Database):
+    """Deep link (start=b<kod>) orqali kelgan kitobni qidiruvsiz, ID bo'yicha yuborish"""
+    book_id = decode_book(payload)
+    book = db.get_book_by_id(book_id) if book_id is not None else None
+    if not book:
+        await safe_reply_or_send(message, "❌ Havola noto'g'ri yoki kitob o'chirilgan.\n\n🔍 Kitob nomini yozib qidirib ko'ring.")
+        return
+    from handlers.books import send_book
+    await send_book(message, book)
+
 @router.message(Command("start"))
-async def start_handler(message: Message):
-    """Start buyrug'i"""
-    print(f"DEBUG: /start buyrug'i qabul qilindi - chat_id={message.chat.id}, chat_type={message.chat.type}, user_id={message.from_user.id}")
+async def start_handler(message: Message, command: CommandObject, db: Database):
+    """Start buyrug'i (t.me/<bot>?start=b<kod> - kitob havolasi)"""
+    logger.debug("/start buyrug'i qabul qilindi: chat_type=%s", message.chat.type)
     user = message.from_user
     chat = message.chat
     
@@ -59,12 +75,24 @@ async def start_handler(message: Message):
             group_type=chat.type
         )
     
+    payload = (command.args or "").strip()
+    shared_book = decode_book(payload) is not None
+
     # Majburiy obuna tekshirish
     if not await is_subscribed_to_all(message.bot, user.id):
-        print(f"DEBUG: Majburiy obuna tekshiruvi - obuna bo'lmagan")
+        logger.debug("Majburiy obuna: foydalanuvchi obuna bo'lmagan")
         msg_text, keyboard = await get_subscription_message_async(message.bot)
+        if shared_book and keyboard:
+            # Obunadan keyin havolani qayta ochmasdan kitobni olish
+            keyboard.inline_keyboard.append([
+                InlineKeyboardButton(text="📖 Kitobni olish", callback_data=f"open_book_{payload}")
+            ])
         await safe_reply_or_send(message, msg_text, reply_markup=keyboard)
         return
+
+    if payload.startswith("b"):
+        await open_shared_book(message, payload, db)
+        return
     
     welcome_text = f"""
 👋 Salom, {user.first_name}!
@@ -80,9 +108,7 @@ async def start_handler(message: Message):
 Qidirishni boshlang! 🔍
 """
     
-    print(f"DEBUG: Welcome xabar yuborilmoqda")
     await safe_reply_or_send(message, welcome_text)
-    print(f"DEBUG: Welcome xabar yuborildi")
 
 @router.message(Command("stop"))
 async def stop_handler(message: Message, state: FSMContext):
@@ -106,8 +132,17 @@ async def stop_handler(message: Message, state: FSMContext):
     else:
         await message.answer("ℹ️ Avtomatik yuklash rejimi faol emas.")
 
+@router.callback_query(F.data.startswith("open_book_"))
+async def open_book_callback(callback: CallbackQuery, db: Database):
+    """Obuna xabaridagi "Kitobni olish" tugmasi"""
+    if not await is_subscribed_to_all(callback.bot, callback.from_user.id):
+        await callback.answer("❌ Hali barcha kanallarga obuna bo'lmagansiz!", show_alert=True)
+        return
+    await callback.answer()
+    await open_shared_book(callback.message, callback.data[len("open_book_"):], db)
+
 @router.callback_query(F.data == "check_subscription")
-async def check_subscription_callback(callback: CallbackQuery):
+async def check_subscription_callback(callback: CallbackQuery, db: Database):
     """Obuna holatini tekshirish"""
     user_id = callback.from_user.id
     
@@ -139,10 +174,8 @@ Qidirishni boshlang! 🔍
         await callback.message.answer(welcome_text)
     else:
         # Hali barcha kanallarga obuna bo'lmagan
-        from database.db import Database
-        db = Database()
         required_channels = db.get_required_channels()
-        subscription_status = await check_subscription(callback.bot, user_id)
+        subscription_status = await check_subscription(callback.bot, user_id, channels=required_channels)
         
         not_subscribed = []
         for channel in required_channels:
@@ -166,6 +199,10 @@ async def help_handler(message: Message):
 🔍 **Kitob qidirish:**
 Faqat kitob nomini yozing va bot sizga mos keladigan kitoblarni topib beradi.
 
+🔥 **Ro'yxatlar:**
+/top - eng ko'p yuklab olingan kitoblar
+/new - yangi qo'shilgan kitoblar
+
 📚 **Qo'llab-quvvatlanadigan formatlar:**
 • PDF fayllar
 • Audio fayllar (MP3, WAV, OGG, M4A, FLAC)
@@ -194,13 +231,14 @@ async def admin_handler(message: Message):
         [InlineKeyboardButton(text="🗑 Kitob o'chirish", callback_data="admin_delete_book")],
         [InlineKeyboardButton(text="📢 Kanal qo'shish", callback_data="admin_add_channel")],
         [InlineKeyboardButton(text="📋 Kanallar ro'yxati", callback_data="admin_channels")],
-        [InlineKeyboardButton(text="📢 Reklama tarqatish", callback_data="admin_broadcast")]
+        [InlineKeyboardButton(text="📢 Reklama tarqatish", callback_data="admin_broadcast")],
+        [InlineKeyboardButton(text="🛡 Reklama qoidalari", callback_data="admin_ad_rules")]
     ])
     
     await message.answer("👨‍💼 Admin panel:", reply_markup=keyboard)
 
 @router.callback_query(F.data == "admin_stats")
-async def admin_stats_callback(callback: CallbackQuery):
+async def admin_stats_callback(callback: CallbackQuery, db: Database):
     """Statistika ko'rsatish"""
     stats = db.get_statistics()
     
@@ -211,7 +249,14 @@ async def admin_stats_callback(callback: CallbackQuery):
 👥 Foydalanuvchilar soni: {stats['users_count']}
 👥 Guruhlar soni: {stats['groups_count']}
 📢 Majburiy obuna kanallari: {stats['channels_count']}
+📥 Yuklab olishlar: {stats['downloads_count']}
 """
+    top_queries = db.get_top_queries(5)
+    if top_queries:
+        stats_text += "\n🔎 Ko'p qidirilganlar:\n" + "\n".join(
+            f"{i}. {item['query']} — {item['count']} ({item['results']} ta natija)"
+            for i, item in enumerate(top_queries, 1)
+        ) + "\n"
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="🔙 Orqaga", callback_data="admin_back")]
@@ -220,7 +265,7 @@ async def admin_stats_callback(callback: CallbackQuery):
     await callback.message.edit_text(stats_text, reply_markup=keyboard)
 
 @router.callback_query(F.data == "admin_books")
-async def admin_books_callback(callback: CallbackQuery):
+async def admin_books_callback(callback: CallbackQuery, db: Database):
     """Kitoblar ro'yxatini ko'rsatish"""
     books = db.get_all_books()
     
@@ -228,32 +273,32 @@ async def admin_books_callback(callback: CallbackQuery):
         await callback.message.edit_text("📚 Hozircha kitoblar mavjud emas.")
         return
     
-    books_text = "📚 **Kitoblar ro'yxati:**\n\n"
+    books_text = TextBuilder().bold("📚 Kitoblar ro'yxati:").add("\n\n")
     
     for book in books[:10]:  # Faqat birinchi 10 ta kitobni ko'rsatish
-        title = escape_markdown(book['title'])
-        author = escape_markdown(book['author'] or "Noma'lum")
+        author = book['author'] or "Noma'lum"
         file_size = format_file_size(book['file_size'])
         
-        books_text += f"📖 **{title}**\n"
-        books_text += f"👤 Muallif: {author}\n"
+        books_text.add("📖 ").bold(book['title']).add("\n")
+        books_text.add(f"👤 Muallif: {author}\n")
         if book.get('is_multi_part'):
             doc_parts = len(db.get_book_files(book['id'], 'document'))
             audio_parts = len(db.get_book_files(book['id'], 'audio'))
-            books_text += f"📁 Turi: 🧩 Qismli (📄 {doc_parts} / 🎧 {audio_parts})\n"
+            books_text.add(f"📁 Turi: 🧩 Qismli (📄 {doc_parts} / 🎧 {audio_parts})\n")
         else:
-            books_text += f"📁 Turi: {book['file_type']}\n"
-            books_text += f"💾 Hajmi: {file_size}\n"
-            books_text += f"🆔 ID: `{book['id']}`\n\n"
+            books_text.add(f"📁 Turi: {book['file_type']}\n")
+            books_text.add(f"💾 Hajmi: {file_size}\n")
+            books_text.add("🆔 ID: ").code(str(book['id'])).add("\n\n")
     
     if len(books) > 10:
-        books_text += f"... va yana {len(books) - 10} ta kitob"
+        books_text.add(f"... va yana {len(books) - 10} ta kitob")
         
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="🔙 Orqaga", callback_data="admin_back")]
     ])
         
-    await callback.message.edit_text(books_text, parse_mode="Markdown", reply_markup=keyboard)
+    text, entities = books_text.build()
+    await callback.message.edit_text(text, entities=entities, reply_markup=keyboard)
 
 @router.callback_query(F.data == "admin_add_book")
 async def admin_add_book_callback(callback: CallbackQuery, state: FSMContext):
@@ -339,37 +384,36 @@ async def admin_back_callback(callback: CallbackQuery, state: FSMContext):
         [InlineKeyboardButton(text="🗑 Kitob o'chirish", callback_data="admin_delete_book")],
         [InlineKeyboardButton(text="📢 Kanal qo'shish", callback_data="admin_add_channel")],
         [InlineKeyboardButton(text="📋 Kanallar ro'yxati", callback_data="admin_channels")],
-        [InlineKeyboardButton(text="📢 Reklama tarqatish", callback_data="admin_broadcast")]
+        [InlineKeyboardButton(text="📢 Reklama tarqatish", callback_data="admin_broadcast")],
+        [InlineKeyboardButton(text="🛡 Reklama qoidalari", callback_data="admin_ad_rules")]
     ])
     await callback.message.edit_text("👨‍💼 Admin panel:", reply_markup=keyboard)
 
-def _format_admin_book_entry(book, index: int) -> str:
-    title = escape_markdown(book['title'])
-    author = escape_markdown(book['author'] or "Noma'lum")
-    text = f"{index}. **{title}**"
+def _format_admin_book_entry(text: TextBuilder, book, index: int, db: Database):
+    author = book['author'] or "Noma'lum"
+    text.add(f"{index}. ").bold(book['title'])
     if book.get('is_multi_part'):
         doc_parts = len(db.get_book_files(book['id'], 'document'))
         audio_parts = len(db.get_book_files(book['id'], 'audio'))
-        text += " 🧩\n"
-        text += f"   📄 {doc_parts} ta | 🎧 {audio_parts} ta\n"
+        text.add(" 🧩\n")
+        text.add(f"   📄 {doc_parts} ta | 🎧 {audio_parts} ta\n")
     else:
-        text += "\n"
-        text += f"   📁 {book['file_type']} | {format_file_size(book['file_size'])}\n"
-    text += f"   👤 {author}\n"
-    text += f"   🆔 `{book['id']}`\n"
-    return text
+        text.add("\n")
+        text.add(f"   📁 {book['file_type']} | {format_file_size(book['file_size'])}\n")
+    text.add(f"   👤 {author}\n")
+    text.add("   🆔 ").code(str(book['id'])).add("\n")
 
-async def _show_admin_delete_list(callback: CallbackQuery, books: list, page: int = 0):
+async def _show_admin_delete_list(callback: CallbackQuery, books: list, db: Database, page: int = 0):
     items_per_page = 10
     total_pages = (len(books) + items_per_page - 1) // items_per_page
     page = max(0, min(page, total_pages - 1 if total_pages else 0))
     start_idx = page * items_per_page
     page_books = books[start_idx:start_idx + items_per_page]
     
-    text = "🗑 **O'chirish kerak bo'lgan kitobni tanlang:**\n\n"
+    text = TextBuilder().bold("🗑 O'chirish kerak bo'lgan kitobni tanlang:").add("\n\n")
     for i, book in enumerate(page_books, 1):
-        text += _format_admin_book_entry(book, start_idx + i)
-        text += "\n"
+        _format_admin_book_entry(text, book, start_idx + i, db)
+        text.add("\n")
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[])
     row = []
@@ -393,10 +437,11 @@ async def _show_admin_delete_list(callback: CallbackQuery, books: list, page: in
         nav_row.append(InlineKeyboardButton(text="▶️", callback_data=f"admin_delete_page_{page+1}"))
     keyboard.inline_keyboard.append(nav_row)
     
-    await callback.message.edit_text(text, parse_mode="Markdown", reply_markup=keyboard)
+    text, entities = text.build()
+    await callback.message.edit_text(text, entities=entities, reply_markup=keyboard)
 
 @router.callback_query(F.data == "admin_delete_book")
-async def admin_delete_book_callback(callback: CallbackQuery):
+async def admin_delete_book_callback(callback: CallbackQuery, db: Database):
     """Kitob o'chirish"""
     books = db.get_all_books()
     
@@ -406,10 +451,10 @@ async def admin_delete_book_callback(callback: CallbackQuery):
         ))
         return
     
-    await _show_admin_delete_list(callback, books, page=0)
+    await _show_admin_delete_list(callback, books, db, page=0)
 
 @router.callback_query(F.data.startswith("admin_delete_page_"))
-async def admin_delete_page_callback(callback: CallbackQuery):
+async def admin_delete_page_callback(callback: CallbackQuery, db: Database):
     """Kitob o'chirish sahifalarini almashtirish"""
     try:
         page = int(callback.data.split("_")[-1])
@@ -422,10 +467,10 @@ async def admin_delete_page_callback(callback: CallbackQuery):
             inline_keyboard=[[InlineKeyboardButton(text="🔙 Orqaga", callback_data="admin_back")]]
         ))
         return
-    await _show_admin_delete_list(callback, books, page=page)
+    await _show_admin_delete_list(callback, books, db, page=page)
 
 @router.callback_query(F.data.startswith("delete_book_"))
-async def delete_book_callback(callback: CallbackQuery):
+async def delete_book_callback(callback: CallbackQuery, db: Database):
     """Kitobni o'chirish"""
     parts = callback.data.split("_")
     try:
@@ -436,6 +481,9 @@ async def delete_book_callback(callback: CallbackQuery):
         return
     
     if db.delete_book(book_id):
+        render_cache.invalidate(book_id)
+        inline_cache.clear()
+        book_lists.book_deleted(book_id)
         await callback.answer("✅ Kitob o'chirildi!")
     else:
         await callback.answer("❌ Kitob o'chirishda xatolik.", show_alert=True)
@@ -451,7 +499,7 @@ async def delete_book_callback(callback: CallbackQuery):
     total_pages = (len(books) + 9) // 10
     if page >= total_pages:
         page = max(0, total_pages - 1)
-    await _show_admin_delete_list(callback, books, page=page)
+    await _show_admin_delete_list(callback, books, db, page=page)
 
 @router.callback_query(F.data == "admin_add_channel")
 async def admin_add_channel_callback(callback: CallbackQuery, state: FSMContext):
@@ -470,7 +518,7 @@ async def admin_add_channel_callback(callback: CallbackQuery, state: FSMContext)
     await state.set_state(ChannelStates.waiting_for_channel)
 
 @router.callback_query(F.data == "admin_channels")
-async def admin_channels_callback(callback: CallbackQuery):
+async def admin_channels_callback(callback: CallbackQuery, db: Database):
     """Kanallar ro'yxatini ko'rsatish"""
     channels = db.get_required_channels()
     
@@ -496,7 +544,7 @@ async def admin_channels_callback(callback: CallbackQuery):
     await callback.message.edit_text("📢 Majburiy obuna kanallaridan birini o'chirish uchun tanlang:", reply_markup=keyboard)
 
 @router.callback_query(F.data.startswith("delete_channel_"))
-async def delete_channel_callback(callback: CallbackQuery):
+async def delete_channel_callback(callback: CallbackQuery, db: Database):
     """Tanlangan kanalni o'chirish (faolsizlantirish)"""
     try:
         rc_id = int(callback.data.split("_")[2])
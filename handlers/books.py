@@ -8,77 +8,65 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.filters import StateFilter
 from aiogram.exceptions import TelegramRetryAfter
 from database.db import Database
-from utils.helpers import get_file_type, clean_filename, extract_book_info, validate_file_size, escape_markdown, format_file_size, is_admin
+from utils.formatting import TextBuilder
+from utils.helpers import get_file_type, clean_filename, validate_file_size, format_file_size, is_admin
 from utils.subscription import is_subscribed_to_all, get_subscription_message_async
+from utils import ad_rules
+from utils.delivery import queue as delivery_queue
+from utils.ingest import pipeline as ingest_pipeline
+from utils.render_cache import cache as render_cache
+from utils.deep_links import share_button
+from utils.popularity import counters as popularity
 import config
-import asyncio
-import re
+import logging
 
+logger = logging.getLogger(__name__)
 router = Router()
 # Guruhlarda ham ishlashi uchun filter olib tashlandi
-db = Database()
 
-async def safe_reply_or_send(message: Message, text: str, reply_markup=None, parse_mode=None):
+def _no_rights_text(book: dict | None = None) -> TextBuilder:
+    """Guruhda hujjat yuborish huquqi yo'qligi haqida xabar (kitob nomi va muallifi bilan)"""
+    text = (
+        TextBuilder()
+        .add("❌ Botda guruhda hujjat yuborish huquqi yo'q.\n\n")
+        .bold("📋 Yechim:")
+        .add("\n1. Botni guruhga admin qiling\n"
+             "2. Botga 'Post messages' va 'Send messages' huquqlarini bering\n"
+             "3. Yoki botga shaxsiy xabar yuboring: /start")
+    )
+    if book:
+        text.add("\n\n📖 ").bold("Kitob:").add(f" {book['title']}\n👤 ")
+        text.bold("Muallif:").add(f" {book['author'] or 'Noma\'lum'}")
+    return text
+
+async def safe_reply_or_send(message: Message, text: str, reply_markup=None, parse_mode=None, entities=None):
     """Guruhlarda xavfsiz javob berish funksiyasi (reply qiladi)"""
     try:
-        print(f"DEBUG: safe_reply_or_send - chat_type={message.chat.type}, chat_id={message.chat.id}, text_length={len(text)}")
+        logger.debug("safe_reply_or_send: chat_type=%s, text_length=%d", message.chat.type, len(text))
         if message.chat.type in ["group", "supergroup"]:
             # Guruhlarda reply qilib javob beramiz
             try:
-                await message.reply(text, reply_markup=reply_markup, parse_mode=parse_mode)
-                print(f"DEBUG: Xabar guruhga reply qilib muvaffaqiyatli yuborildi")
+                await message.reply(text, reply_markup=reply_markup, parse_mode=parse_mode, entities=entities)
+                logger.debug("Xabar guruhga reply qilib yuborildi")
             except Exception as reply_error:
                 # Agar reply ishlamasa, oddiy send_message ishlatamiz
-                print(f"DEBUG: Reply ishlamadi, oddiy yuborishga o'tilmoqda: {reply_error}")
+                logger.debug("Reply ishlamadi, oddiy yuborishga o'tilmoqda: %s", reply_error)
                 await message.bot.send_message(
                     chat_id=message.chat.id,
                     text=text,
                     reply_markup=reply_markup,
-                    parse_mode=parse_mode
+                    parse_mode=parse_mode,
+                    entities=entities
                 )
-                print(f"DEBUG: Xabar guruhga oddiy usulda muvaffaqiyatli yuborildi")
+                logger.debug("Xabar guruhga oddiy usulda yuborildi")
         else:
-            await message.answer(text, reply_markup=reply_markup, parse_mode=parse_mode)
-            print(f"DEBUG: Xabar shaxsiy chatga muvaffaqiyatli yuborildi")
+            await message.answer(text, reply_markup=reply_markup, parse_mode=parse_mode, entities=entities)
+            logger.debug("Xabar shaxsiy chatga yuborildi")
     except Exception as e:
-        print(f"DEBUG: safe_reply_or_send xatolik: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.warning("safe_reply_or_send xatolik: %s", e)
         # Xatolikni qaytaramiz, chunki funksiya exception qaytarishi kerak
         raise
 
-async def retry_with_delay(func, max_retries=3, delay=5):
-    """Flood control xatoliklarini hal qilish uchun retry funksiyasi"""
-    for attempt in range(max_retries):
-        try:
-            return await func()
-        except TelegramRetryAfter as e:
-            wait_time = e.retry_after
-            if attempt < max_retries - 1:
-                await asyncio.sleep(wait_time)
-                continue
-            else:
-                raise
-        except Exception as e:
-            error_str = str(e)
-            # Flood control xatoligini aniqlash
-            if "Flood control" in error_str or "Too Many Requests" in error_str or "retry after" in error_str:
-                # Retry after soniyalarini olish
-                match = re.search(r'retry after (\d+)', error_str, re.IGNORECASE)
-                if match:
-                    wait_time = int(match.group(1))
-                else:
-                    wait_time = delay
-                
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(wait_time + 1)  # Qo'shimcha 1 soniya kutamiz
-                    continue
-                else:
-                    raise
-            else:
-                raise
-    return None
-
 class BookStates(StatesGroup):
     waiting_for_title = State()
     waiting_for_author = State()
@@ -112,7 +100,7 @@ async def is_group_admin(bot, chat_id: int, user_id: int) -> bool:
     except Exception:
         return False
 
-async def is_user_allowed_to_post(bot, chat_id: int, user_id: int) -> bool:
+async def is_user_allowed_to_post(bot, chat_id: int, user_id: int, db: Database) -> bool:
     """Foydalanuvchiga reklama yuborishga ruxsat bor-yo'qligini tekshirish"""
     # Admin va botning o'zi har doim ruxsat etiladi
     if is_admin(user_id) or user_id == bot.id:
@@ -143,35 +131,11 @@ async def is_user_allowed_to_post(bot, chat_id: int, user_id: int) -> bool:
     return False
 
 def contains_advertisement(text: str) -> bool:
-    if not text:
-        return False
-    text_lower = text.lower()
-    patterns = [
-        r"https?://",
-        r"\bt\.me/",
-        r"\bt\.me/c/\d+/\d+",
-        r"joinchat/",
-        r"\+[a-zA-Z0-9_-]{10,}",
-        r"\.(com|uz|ru|org|net|info|io|me)\b",
-        r"@[a-zA-Z0-9_]{5,}",
-        r"\b\d{2,3}[-\s]??\d{2,3}[-\s]??\d{2}[-\s]?\d{2}\b",
-        r"\b\d{7,}\b",
-        r"\b\d+%\b",
-        r"[₩¥$€£]",
-    ]
-    if any(re.search(p, text_lower) for p in patterns):
-        return True
-    keywords = [
-        "reklama", "aksiya", "chegirma", "arzon", "sotuv", "bonus",
-        "kurs", "dars", "jonli dars", "videodars", "kanalimizda",
-        "murojaat uchun", "bog'lanish uchun", "obuna", "promo",
-        "skidka", "akciya", "rasprodaja", "скидка", "акция",
-        "реклама", "подпишитесь", "subscribe", "join our channel"
-    ]
-    return any(k in text_lower for k in keywords)
+    """Qat'iy reklama tekshiruvi (umumiy qoidalar + qat'iy qoidalar)"""
+    return ad_rules.contains_advertisement(text, strict=True)
 
 @router.message(StateFilter(None), F.text)
-async def search_books(message: Message, state: FSMContext):
+async def search_books(message: Message, state: FSMContext, db: Database):
     """Kitob qidirish"""
     chat = message.chat
     user = message.from_user
@@ -231,37 +195,30 @@ async def search_books(message: Message, state: FSMContext):
         return
     
     try:
-        print(f"DEBUG: Qidirish boshlandi - query='{query}', chat_id={message.chat.id}, chat_type={message.chat.type}")
+        logger.debug("Qidirish boshlandi: query=%r", query)
         books = db.search_books(query)
-        print(f"DEBUG: Qidirish '{query}' uchun {len(books)} ta natija topildi")
+        logger.debug("Qidirish %r uchun %d ta natija topildi", query, len(books))
+        popularity.query(query, len(books))
         
         if not books:
             text = f"🔍 '{query}' so'zi bo'yicha kitoblar topilmadi.\n\nBoshqa kalit so'zlar bilan qidirib ko'ring."
-            print(f"DEBUG: Natija topilmadi, xabar yuborilmoqda")
             await safe_reply_or_send(message, text)
-            print(f"DEBUG: Xabar yuborildi (natija topilmadi)")
             return
         
         if len(books) == 1:
             # Agar bitta kitob topilsa, to'g'ridan-to'g'ri yuborish
-            print(f"DEBUG: Bitta kitob topildi, yuborilmoqda")
             book = books[0]
             await send_book(message, book)
-            print(f"DEBUG: Kitob yuborildi")
         else:
             # Agar bir nechta kitob topilsa, ro'yxat ko'rsatish
-            print(f"DEBUG: {len(books)} ta kitob topildi, ro'yxat ko'rsatilmoqda")
             await show_search_results(message, books, query, page=0, state=state)
-            print(f"DEBUG: Ro'yxat ko'rsatildi")
     
     except Exception as e:
-        print(f"DEBUG: Qidirishda xatolik: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Qidirishda xatolik: query=%r", query)
         try:
             await safe_reply_or_send(message, f"❌ Qidirishda xatolik yuz berdi: {str(e)}")
         except Exception as e2:
-            print(f"DEBUG: Xatolik xabarini yuborishda ham xatolik: {e2}")
+            logger.warning("Xatolik xabarini yuborishda ham xatolik: %s", e2)
 
 
 async def send_book(message: Message, book: dict):
@@ -277,6 +234,9 @@ async def send_book(message: Message, book: dict):
             reply_to_message_id=reply_to_id  # Guruhlarda reply qilamiz
         )
         return
+    render = render_cache.get(book)
+    # Kitob havolasini ulashish tugmasi (havolani ochgan foydalanuvchi kitobni qidiruvsiz oladi)
+    share_markup = InlineKeyboardMarkup(inline_keyboard=[[share_button((await message.bot.me()).username, book)]])
     try:
         # Agar saqlash xabari ma'lum bo'lsa, uni nusxalashga harakat qilamiz
         if book.get('storage_message_id') and (book.get('storage_chat_id') or config.STORAGE_CHANNEL_ID):
@@ -286,19 +246,16 @@ async def send_book(message: Message, book: dict):
                     chat_id=message.chat.id,
                     from_chat_id=from_chat,
                     message_id=book['storage_message_id'],
-                    caption=f"📖 **{escape_markdown(book['title'])}**\n\n"
-                            f"👤 Muallif: {escape_markdown(book['author'] or 'Noma\'lum')}\n"
-                            f"📁 Turi: {book['file_type']}\n"
-                            f"💾 Hajmi: {format_file_size(book['file_size'])}\n"
-                            f"📅 Yuklangan: {book['upload_date'][:10]}"
-                            f"\n\n@Xudoyorxon0325\\_bot",
-                    parse_mode="Markdown",
+                    caption=render['caption'],
+                    caption_entities=render['caption_entities'],
+                    reply_markup=share_markup,
                     reply_to_message_id=reply_to_id  # Guruhlarda reply qilamiz
                 )
+                popularity.book_sent(book['id'])
                 return  # Muvaffaqiyatli yuborildi
             except Exception as copy_error:
                 # Agar copy_message ishlamasa, file_id orqali yuboramiz
-                print(f"DEBUG: copy_message xatolik, file_id orqali yuborilmoqda: {copy_error}")
+                logger.debug("copy_message xatolik, file_id orqali yuborilmoqda: %s", copy_error)
                 pass  # Fallback ga o'tamiz
         
         # Fallback: file_id orqali yuborish
@@ -307,56 +264,35 @@ async def send_book(message: Message, book: dict):
                 await message.bot.send_document(
                     chat_id=message.chat.id,
                     document=book['file_id'],
-                    caption=f"📖 **{escape_markdown(book['title'])}**\n\n"
-                            f"👤 Muallif: {escape_markdown(book['author'] or 'Noma\'lum')}\n"
-                            f"📁 Turi: {book['file_type']}\n"
-                            f"💾 Hajmi: {format_file_size(book['file_size'])}\n"
-                            f"📅 Yuklangan: {book['upload_date'][:10]}"
-                            f"\n\n@Xudoyorxon0325\\_bot",
-                    parse_mode="Markdown",
+                    caption=render['fallback_caption'],
+                    caption_entities=render['caption_entities'],
+                    reply_markup=share_markup,
                     reply_to_message_id=reply_to_id  # Guruhlarda reply qilamiz
                 )
             elif book['file_type'] == 'audio':
                 await message.bot.send_audio(
                     chat_id=message.chat.id,
                     audio=book['file_id'],
-                    caption=f"🎵 **{escape_markdown(book['title'])}**\n\n"
-                            f"👤 Muallif: {escape_markdown(book['author'] or 'Noma\'lum')}\n"
-                            f"📁 Turi: {book['file_type']}\n"
-                            f"💾 Hajmi: {format_file_size(book['file_size'])}\n"
-                            f"📅 Yuklangan: {book['upload_date'][:10]}"
-                            f"\n\n@Xudoyorxon0325\\_bot",
-                    parse_mode="Markdown",
+                    caption=render['fallback_caption'],
+                    caption_entities=render['caption_entities'],
+                    reply_markup=share_markup,
                     reply_to_message_id=reply_to_id  # Guruhlarda reply qilamiz
                 )
+            popularity.book_sent(book['id'])
         except Exception as send_error:
             error_str = str(send_error).lower()
             if "not enough rights" in error_str or "can't send" in error_str or "permission" in error_str:
                 # Botda huquq yo'q, shaxsiy chatga yuborishni taklif qilamiz
-                error_msg = (
-                    "❌ Botda guruhda hujjat yuborish huquqi yo'q.\n\n"
-                    "📋 **Yechim:**\n"
-                    "1. Botni guruhga admin qiling\n"
-                    "2. Botga 'Post messages' va 'Send messages' huquqlarini bering\n"
-                    "3. Yoki botga shaxsiy xabar yuboring: /start\n\n"
-                    f"📖 **Kitob:** {escape_markdown(book['title'])}\n"
-                    f"👤 **Muallif:** {escape_markdown(book['author'] or 'Noma\'lum')}"
-                )
-                await safe_reply_or_send(message, error_msg, parse_mode="Markdown")
+                error_text, error_entities = _no_rights_text(book).build()
+                await safe_reply_or_send(message, error_text, entities=error_entities)
             else:
                 # Boshqa xatolik
                 await safe_reply_or_send(message, f"❌ Kitob yuborishda xatolik: {str(send_error)}")
     except Exception as e:
         error_str = str(e).lower()
         if "not enough rights" in error_str or "can't send" in error_str or "permission" in error_str:
-            error_msg = (
-                "❌ Botda guruhda hujjat yuborish huquqi yo'q.\n\n"
-                "📋 **Yechim:**\n"
-                "1. Botni guruhga admin qiling\n"
-                "2. Botga 'Post messages' va 'Send messages' huquqlarini bering\n"
-                "3. Yoki botga shaxsiy xabar yuboring: /start"
-            )
-            await safe_reply_or_send(message, error_msg, parse_mode="Markdown")
+            error_text, error_entities = _no_rights_text().build()
+            await safe_reply_or_send(message, error_text, entities=error_entities)
         else:
             await safe_reply_or_send(message, f"❌ Kitob yuborishda xatolik yuz berdi: {str(e)}")
 
@@ -369,21 +305,22 @@ async def update_search_results(callback: CallbackQuery, books: list, query: str
     page_books = books[start_idx:end_idx]
     total_pages = (len(books) + items_per_page - 1) // items_per_page
     
-    results_text = f"🔍 Qidiruv natijalari:\n\n"
+    results = TextBuilder().add("🔍 Qidiruv natijalari:\n\n")
     
     for i, book in enumerate(page_books, 1):
         global_idx = start_idx + i
-        title = escape_markdown(book['title'])
-        author = escape_markdown(book['author'] or "Noma'lum")
+        title = book['title']
+        author = book['author'] or "Noma'lum"
         
         if len(title) > 75:
             title = title[:72] + "..."
         
         suffix = " 🧩" if book.get('is_multi_part') else ""
-        results_text += f"{global_idx}. **{title}**{suffix}\n"
+        results.add(f"{global_idx}. ").bold(title).add(f"{suffix}\n")
         if author != "Noma'lum":
-            results_text += f"   {author}\n"
-        results_text += "\n"
+            results.add(f"   {author}\n")
+        results.add("\n")
+    results_text, results_entities = results.build()
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[])
     
@@ -422,12 +359,12 @@ async def update_search_results(callback: CallbackQuery, books: list, query: str
     else:
         keyboard.inline_keyboard.append([InlineKeyboardButton(text="❌ Yopish", callback_data="close_search")])
     
-    await callback.message.edit_text(results_text, parse_mode="Markdown", reply_markup=keyboard)
+    await callback.message.edit_text(results_text, entities=results_entities, reply_markup=keyboard)
 
 async def show_search_results(message: Message, books: list, query: str, page: int = 0, state: FSMContext = None):
     """Qidirish natijalarini ko'rsatish (rasmdagidek format)"""
     try:
-        print(f"DEBUG: show_search_results chaqirildi - books={len(books)}, page={page}")
+        logger.debug("show_search_results: books=%d, page=%d", len(books), page)
         # Har bir sahifada 10 ta kitob
         items_per_page = 10
         start_idx = page * items_per_page
@@ -436,20 +373,20 @@ async def show_search_results(message: Message, books: list, query: str, page: i
         total_pages = (len(books) + items_per_page - 1) // items_per_page
         
         # Sarlavha
-        results_text = f"🔍 Qidiruv natijalari:\n\n"
+        results = TextBuilder().add("🔍 Qidiruv natijalari:\n\n")
         
-        # Kitoblar ro'yxati
+        # Kitoblar ro'yxati (nomlar MessageEntity orqali qalin qilinadi, escape kerak emas)
         for i, book in enumerate(page_books, 1):
             global_idx = start_idx + i
-            title = escape_markdown(book['title'])
-            author = escape_markdown(book['author'] or "Noma'lum")
+            title = book['title']
+            author = book['author'] or "Noma'lum"
             
             # Kitob nomini to'liq ko'rsatish (75 belgigacha)
             if len(title) > 75:
                 title = title[:72] + "..."
             
             suffix = " 🧩" if book.get('is_multi_part') else ""
-            results_text += f"{global_idx}. **{title}**{suffix} {author}\n"
+            results.add(f"{global_idx}. ").bold(title).add(f"{suffix} {author}\n")
             # if author != "Noma'lum":
             #     results_text += f"   {author}\n"
         
@@ -507,20 +444,17 @@ async def show_search_results(message: Message, books: list, query: str, page: i
                 InlineKeyboardButton(text="❌ Yopish", callback_data="close_search")
             ])
         
-        print(f"DEBUG: Xabar yuborilmoqda - chat_id={message.chat.id}, text_length={len(results_text)}")
-        await safe_reply_or_send(message, results_text, reply_markup=keyboard, parse_mode="Markdown")
-        print(f"DEBUG: Xabar muvaffaqiyatli yuborildi")
+        results_text, results_entities = results.build()
+        await safe_reply_or_send(message, results_text, reply_markup=keyboard, entities=results_entities)
     except Exception as e:
-        print(f"DEBUG: show_search_results xatolik: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("show_search_results xatolik")
         try:
             await safe_reply_or_send(message, f"❌ Natijalarni ko'rsatishda xatolik yuz berdi: {str(e)}")
         except Exception as e2:
-            print(f"DEBUG: Xatolik xabarini yuborishda ham xatolik: {e2}")
+            logger.warning("Xatolik xabarini yuborishda ham xatolik: %s", e2)
 
 @router.callback_query(F.data.startswith("search_page_"))
-async def search_page_callback(callback: CallbackQuery, state: FSMContext):
+async def search_page_callback(callback: CallbackQuery, state: FSMContext, db: Database):
     """Sahifalash callback"""
     # Format: search_page_{page}
     # Query ni state dan olamiz yoki callback data dan
@@ -557,7 +491,7 @@ async def close_search_callback(callback: CallbackQuery):
     await callback.answer("✅ Yopildi")
 
 @router.callback_query(F.data.startswith("send_book_"))
-async def send_book_callback(callback: CallbackQuery):
+async def send_book_callback(callback: CallbackQuery, db: Database):
     """Callback orqali kitob yuborish"""
     book_id = int(callback.data.split("_")[2])
     book = db.get_book_by_id(book_id)
@@ -576,6 +510,8 @@ async def send_book_callback(callback: CallbackQuery):
         await callback.answer("🔽 Fayl turini tanlang")
         return
     
+    render = render_cache.get(book)
+    share_markup = InlineKeyboardMarkup(inline_keyboard=[[share_button((await callback.bot.me()).username, book)]])
     try:
         # Avval nusxalashga harakat qilamiz
         if book.get('storage_message_id') and (book.get('storage_chat_id') or config.STORAGE_CHANNEL_ID):
@@ -585,20 +521,17 @@ async def send_book_callback(callback: CallbackQuery):
                     chat_id=callback.message.chat.id,
                     from_chat_id=from_chat,
                     message_id=book['storage_message_id'],
-                    caption=f"📖 **{escape_markdown(book['title'])}**\n\n"
-                            f"👤 Muallif: {escape_markdown(book['author'] or 'Noma\'lum')}\n"
-                            f"📁 Turi: {book['file_type']}\n"
-                            f"💾 Hajmi: {format_file_size(book['file_size'])}\n"
-                            f"📅 Yuklangan: {book['upload_date'][:10]}"
-                            f"\n\n@Xudoyorxon0325\\_bot",
-                    parse_mode="Markdown",
+                    caption=render['caption'],
+                    caption_entities=render['caption_entities'],
+                    reply_markup=share_markup,
                     reply_to_message_id=None  # Guruhlarda ham reply qilmaymiz
                 )
+                popularity.book_sent(book['id'])
                 await callback.answer("✅ Kitob yuborildi!")
                 return  # Muvaffaqiyatli yuborildi
             except Exception as copy_error:
                 # Agar copy_message ishlamasa, file_id orqali yuboramiz
-                print(f"DEBUG: copy_message xatolik, file_id orqali yuborilmoqda: {copy_error}")
+                logger.debug("copy_message xatolik, file_id orqali yuborilmoqda: %s", copy_error)
                 pass  # Fallback ga o'tamiz
         
         # Fallback file_id orqali
@@ -607,28 +540,21 @@ async def send_book_callback(callback: CallbackQuery):
                 await callback.bot.send_document(
                     chat_id=callback.message.chat.id,
                     document=book['file_id'],
-                    caption=f"📖 **{escape_markdown(book['title'])}**\n\n"
-                           f"👤 Muallif: {escape_markdown(book['author'] or 'Noma\'lum')}\n"
-                           f"📁 Turi: {book['file_type']}\n"
-                           f"💾 Hajmi: {format_file_size(book['file_size'])}\n"
-                           f"📅 Yuklangan: {book['upload_date'][:10]}"
-                           f"\n\n@Xudoyorxon0325\\_bot",
-                    parse_mode="Markdown",
+                    caption=render['fallback_caption'],
+                    caption_entities=render['caption_entities'],
+                    reply_markup=share_markup,
                     reply_to_message_id=None  # Guruhlarda ham reply qilmaymiz
                 )
             elif book['file_type'] == 'audio':
                 await callback.bot.send_audio(
                     chat_id=callback.message.chat.id,
                     audio=book['file_id'],
-                    caption=f"🎵 **{escape_markdown(book['title'])}**\n\n"
-                           f"👤 Muallif: {escape_markdown(book['author'] or 'Noma\'lum')}\n"
-                           f"📁 Turi: {book['file_type']}\n"
-                           f"💾 Hajmi: {format_file_size(book['file_size'])}\n"
-                           f"📅 Yuklangan: {book['upload_date'][:10]}"
-                           f"\n\n@Xudoyorxon0325\\_bot",
-                    parse_mode="Markdown",
+                    caption=render['fallback_caption'],
+                    caption_entities=render['caption_entities'],
+                    reply_markup=share_markup,
                     reply_to_message_id=None  # Guruhlarda ham reply qilmaymiz
                 )
+            popularity.book_sent(book['id'])
             
             await callback.answer("✅ Kitob yuborildi!")
         except Exception as send_error:
@@ -661,7 +587,7 @@ async def send_book_callback(callback: CallbackQuery):
             await callback.answer(f"❌ Xatolik: {str(e)}", show_alert=True)
 
 @router.message(F.document | F.audio)
-async def handle_file_upload(message: Message, state: FSMContext):
+async def handle_file_upload(message: Message, state: FSMContext, db: Database):
     """Fayl yuklash"""
     # Admin buyruqlari faqat shaxsiy chatda ishlaydi
     if message.chat.type != "private":
@@ -688,60 +614,39 @@ async def handle_file_upload(message: Message, state: FSMContext):
         await message.answer(f"❌ Fayl hajmi juda katta! Maksimal hajm: {config.MAX_FILE_SIZE} MB")
         return
     
+    # Avtomatik yuklash rejimi: fayl konveyerga qo'yiladi, natija bitta progress xabarida ko'rsatiladi
+    if current_state == BookStates.auto_upload_mode:
+        ingest_pipeline.submit(message, filename, file_type)
+        return
+    
+    # Takroriy fayl: omborga qayta yuborilmaydi, mavjud yozuv ko'rsatiladi
+    existing = db.find_file_by_unique_id(file.file_unique_id)
+    if existing:
+        await answer_duplicate_file(message, state, existing)
+        return
+    
     status_msg = None
     storage_chat_id = str(config.STORAGE_CHANNEL_ID)
     try:
         # Foydalanuvchiga yuklash boshlanganini xabar qilish
         status_msg = await message.answer("📤 Fayl yuklanmoqda...")
         
-        # Faylni saqlash kanaliga yuklash (retry mexanizmi bilan)
+        # Faylni saqlash kanaliga yuklash (flood control ni OutboundScheduler hal qiladi)
         sent_message = None
         if file_type == 'document':
-            async def send_doc():
-                return await message.bot.send_document(
-                    chat_id=config.STORAGE_CHANNEL_ID,
-                    document=file.file_id,
-                    caption=f"📚 {filename}"
-                )
-            
-            # Retry mexanizmi bilan yuklash
-            try:
-                sent_message = await send_doc()
-            except Exception as e:
-                error_str = str(e)
-                if "Flood control" in error_str or "Too Many Requests" in error_str or "retry after" in error_str:
-                    match = re.search(r'retry after (\d+)', error_str, re.IGNORECASE)
-                    wait_time = int(match.group(1)) if match else 5
-                    await status_msg.edit_text(f"⏳ Telegram limitiga duch keldik. {wait_time} soniyadan keyin qayta urinilmoqda...")
-                    await asyncio.sleep(wait_time + 1)
-                    sent_message = await send_doc()
-                else:
-                    raise
-            
+            sent_message = await message.bot.send_document(
+                chat_id=config.STORAGE_CHANNEL_ID,
+                document=file.file_id,
+                caption=f"📚 {filename}"
+            )
             file_id = sent_message.document.file_id
             storage_message_id = sent_message.message_id
         elif file_type == 'audio':
-            async def send_aud():
-                return await message.bot.send_audio(
-                    chat_id=config.STORAGE_CHANNEL_ID,
-                    audio=file.file_id,
-                    caption=f"🎵 {filename}"
-                )
-            
-            # Retry mexanizmi bilan yuklash
-            try:
-                sent_message = await send_aud()
-            except Exception as e:
-                error_str = str(e)
-                if "Flood control" in error_str or "Too Many Requests" in error_str or "retry after" in error_str:
-                    match = re.search(r'retry after (\d+)', error_str, re.IGNORECASE)
-                    wait_time = int(match.group(1)) if match else 5
-                    await status_msg.edit_text(f"⏳ Telegram limitiga duch keldik. {wait_time} soniyadan keyin qayta urinilmoqda...")
-                    await asyncio.sleep(wait_time + 1)
-                    sent_message = await send_aud()
-                else:
-                    raise
-            
+            sent_message = await message.bot.send_audio(
+                chat_id=config.STORAGE_CHANNEL_ID,
+                audio=file.file_id,
+                caption=f"🎵 {filename}"
+            )
             file_id = sent_message.audio.file_id
             storage_message_id = sent_message.message_id
         
@@ -757,52 +662,26 @@ async def handle_file_upload(message: Message, state: FSMContext):
                 file_type=file_type,
                 file_size=file.file_size,
                 storage_message_id=storage_message_id,
-                storage_chat_id=storage_chat_id
+                storage_chat_id=storage_chat_id,
+                file_unique_id=file.file_unique_id,
+                db=db
             )
             return
         
-        # Avtomatik yuklash rejimi tekshirish
-        if current_state == BookStates.auto_upload_mode:
-            # Avtomatik ravishda kitob ma'lumotlarini aniqlash
-            title, author = extract_book_info(filename)
-            
-            # Kitobni ma'lumotlar bazasiga qo'shish
-            success = db.add_book(
-                title=title,
-                author=author,
-                file_id=file_id,
-                file_type=file_type,
-                file_size=file.file_size,
-                uploader_id=message.from_user.id,
-                description=f"Avtomatik yuklangan: {filename}",
-                storage_message_id=storage_message_id,
-                storage_chat_id=storage_chat_id
-            )
-            
-            if success:
-                await message.answer(f"✅ **Avtomatik qo'shildi!**\n\n"
-                                   f"📖 **{title}**\n"
-                                   f"👤 Muallif: {author}\n"
-                                   f"📁 Turi: {file_type}\n"
-                                   f"💾 Hajmi: {format_file_size(file.file_size)}\n\n"
-                                   f"Yana fayl yuklang yoki /stop buyrug'ini yuboring.")
-            else:
-                await message.answer(f"❌ Kitob qo'shishda xatolik!")
+        # Oddiy yuklash rejimi
+        await state.update_data(
+            file_id=file_id,
+            file_unique_id=file.file_unique_id,
+            file_type=file_type,
+            file_size=file.file_size,
+            filename=filename,
+            storage_message_id=storage_message_id,
+            storage_chat_id=storage_chat_id
+        )
         
-        else:
-            # Oddiy yuklash rejimi
-            await state.update_data(
-                file_id=file_id,
-                file_type=file_type,
-                file_size=file.file_size,
-                filename=filename,
-                storage_message_id=storage_message_id,
-                storage_chat_id=storage_chat_id
-            )
-            
-            # Kitob nomini so'rash
-            await message.answer("📚 Kitob nomini kiriting:")
-            await state.set_state(BookStates.waiting_for_title)
+        # Kitob nomini so'rash
+        await message.answer("📚 Kitob nomini kiriting:")
+        await state.set_state(BookStates.waiting_for_title)
         
     except Exception as e:
         # Status xabarini o'chirish (agar mavjud bo'lsa)
@@ -812,22 +691,32 @@ async def handle_file_upload(message: Message, state: FSMContext):
             except:
                 pass
         
-        error_str = str(e)
-        if "Flood control" in error_str or "Too Many Requests" in error_str or "retry after" in error_str:
-            # Retry after soniyalarini olish
-            match = re.search(r'retry after (\d+)', error_str, re.IGNORECASE)
-            if match:
-                wait_time = int(match.group(1))
-                await message.answer(f"⚠️ Telegram limitiga duch keldik.\n\n"
-                                   f"⏳ {wait_time} soniyadan keyin qayta urinib ko'ring.\n\n"
-                                   f"Bu holat ko'p fayl yuklanganda yuzaga keladi. Biroz sabr qiling.")
-            else:
-                await message.answer(f"⚠️ Telegram limitiga duch keldik.\n\n"
-                                   f"Bir necha soniyadan keyin qayta urinib ko'ring.\n\n"
-                                   f"Bu holat ko'p fayl yuklanganda yuzaga keladi.")
+        if isinstance(e, TelegramRetryAfter):
+            # Rejalashtiruvchi bir necha marta qayta urinib ko'rgan, baribir limit
+            await message.answer(f"⚠️ Telegram limitiga duch keldik.\n\n"
+                               f"⏳ {e.retry_after} soniyadan keyin qayta urinib ko'ring.\n\n"
+                               f"Bu holat ko'p fayl yuklanganda yuzaga keladi. Biroz sabr qiling.")
         else:
             await message.answer(f"❌ Fayl yuklashda xatolik: {str(e)}")
 
+async def answer_duplicate_file(message: Message, state: FSMContext, existing: dict):
+    """Bazada bor fayl qayta yuklanganda mavjud kitobni ko'rsatish"""
+    data = await state.get_data()
+    if existing['book_id'] == data.get('book_id'):
+        await message.answer("♻️ Bu fayl shu kitobga allaqachon qo'shilgan.")
+        return
+    part = " (qismli kitob)" if existing['is_multi_part'] else ""
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="📖 Kitobni ochish", callback_data=f"send_book_{existing['book_id']}")]
+    ])
+    await message.answer(
+        f"♻️ Bu fayl bazada allaqachon bor{part}, qayta saqlanmadi.\n\n"
+        f"📖 {existing['title']}\n"
+        f"👤 Muallif: {existing['author'] or 'Noma\'lum'}\n"
+        f"🆔 ID: {existing['book_id']}",
+        reply_markup=keyboard
+    )
+
 @router.message(BookStates.waiting_for_title)
 async def process_title(message: Message, state: FSMContext):
     """Kitob nomini qabul qilish"""
@@ -851,7 +740,7 @@ async def process_author(message: Message, state: FSMContext):
     await state.set_state(BookStates.waiting_for_description)
 
 @router.message(BookStates.waiting_for_description)
-async def process_description(message: Message, state: FSMContext):
+async def process_description(message: Message, state: FSMContext, db: Database):
     """Tavsifni qabul qilish va kitobni saqlash"""
     description = message.text.strip() if message.text else ""
     
@@ -867,7 +756,8 @@ async def process_description(message: Message, state: FSMContext):
         uploader_id=message.from_user.id,
         description=description,
         storage_message_id=data.get('storage_message_id'),
-        storage_chat_id=data.get('storage_chat_id')
+        storage_chat_id=data.get('storage_chat_id'),
+        file_unique_id=data.get('file_unique_id')
     )
     
     if success:
@@ -889,7 +779,9 @@ async def process_multi_part_uploaded_file(
     file_type: str,
     file_size: int,
     storage_message_id: int | None,
-    storage_chat_id: str | None
+    storage_chat_id: str | None,
+    db: Database,
+    file_unique_id: str | None = None
 ):
     """Qismli kitob uchun ketma-ket fayllarni saqlash"""
     data = await state.get_data()
@@ -912,7 +804,8 @@ async def process_multi_part_uploaded_file(
             description=description,
             storage_message_id=storage_message_id,
             storage_chat_id=storage_chat_id,
-            is_multi_part=True
+            is_multi_part=True,
+            file_unique_id=file_unique_id
         )
         if not book_id:
             await message.answer("❌ Kitobni yaratishda xatolik yuz berdi.")
@@ -925,23 +818,25 @@ async def process_multi_part_uploaded_file(
             file_type=file_type,
             file_size=file_size,
             storage_message_id=storage_message_id,
-            storage_chat_id=storage_chat_id
+            storage_chat_id=storage_chat_id,
+            file_unique_id=file_unique_id
         )
         if not saved:
             await message.answer("❌ Faylni saqlashda xatolik yuz berdi.")
             return
-    doc_parts = db.get_book_files(book_id, 'document')
-    audio_parts = db.get_book_files(book_id, 'audio')
+    # Qismlar soni o'zgardi: tanlash tugmalari qayta tayyorlanadi
+    render_cache.invalidate(book_id)
+    counts = db.get_book_file_counts(book_id)
     part_label = "E-kitob" if file_type == 'document' else "Audio"
     await message.answer(
         f"✅ {part_label} qismi qo'shildi!\n\n"
-        f"📄 E-kitob qismlari: {len(doc_parts)} ta\n"
-        f"🎧 Audio qismlari: {len(audio_parts)} ta\n\n"
+        f"📄 E-kitob qismlari: {counts.get('document', 0)} ta\n"
+        f"🎧 Audio qismlari: {counts.get('audio', 0)} ta\n\n"
         "Yana fayl yuborishingiz yoki \"Yakunlash\" tugmasini bosishingiz mumkin."
     )
 
 @router.callback_query(F.data == "finish_multi_part_book")
-async def finish_multi_part_book_callback(callback: CallbackQuery, state: FSMContext):
+async def finish_multi_part_book_callback(callback: CallbackQuery, state: FSMContext, db: Database):
     """Qismli kitobni yakunlash"""
     data = await state.get_data()
     book_id = data.get('book_id')
@@ -953,50 +848,40 @@ async def finish_multi_part_book_callback(callback: CallbackQuery, state: FSMCon
         await callback.answer("Kitob topilmadi.", show_alert=True)
         await state.clear()
         return
-    doc_count = len(db.get_book_files(book_id, 'document'))
-    audio_count = len(db.get_book_files(book_id, 'audio'))
+    render_cache.invalidate(book_id)
+    counts = db.get_book_file_counts(book_id)
+    doc_count = counts.get('document', 0)
+    audio_count = counts.get('audio', 0)
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="🔙 Admin panel", callback_data="admin_back")]
     ])
-    await callback.message.edit_text(
-        f"✅ Qismli kitob saqlandi!\n\n"
-        f"📖 {escape_markdown(book['title'])}\n"
-        f"📄 E-kitob qismlari: {doc_count} ta\n"
-        f"🎧 Audio qismlari: {audio_count} ta",
-        parse_mode="Markdown",
-        reply_markup=keyboard
+    text, entities = (
+        TextBuilder()
+        .add("✅ Qismli kitob saqlandi!\n\n📖 ")
+        .bold(book['title'])
+        .add(f"\n📄 E-kitob qismlari: {doc_count} ta\n🎧 Audio qismlari: {audio_count} ta")
+        .build()
     )
+    await callback.message.edit_text(text, entities=entities, reply_markup=keyboard)
     await state.clear()
 
 async def send_multi_part_choice(bot, chat_id: int, book: dict, reply_to_message_id: int | None = None):
     """Foydalanuvchidan qism turini tanlashni so'rash"""
-    doc_count = len(db.get_book_files(book['id'], 'document'))
-    audio_count = len(db.get_book_files(book['id'], 'audio'))
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(
-            text=f"📄 E-kitob ({doc_count})",
-            callback_data=f"send_parts_document_{book['id']}"
-        )],
-        [InlineKeyboardButton(
-            text=f"🎧 Audio ({audio_count})",
-            callback_data=f"send_parts_audio_{book['id']}"
-        )],
-        [InlineKeyboardButton(text="❌ Yopish", callback_data="close_search")]
-    ])
+    render = render_cache.get(book)
+    # Keshdagi tugmalar o'zgartirilmaydi: ulashish tugmasi "Yopish" dan oldin qo'shiladi
+    rows = render['choice_markup'].inline_keyboard
+    markup = InlineKeyboardMarkup(inline_keyboard=[*rows[:-1], [share_button((await bot.me()).username, book)], rows[-1]])
     await bot.send_message(
         chat_id=chat_id,
-        text=(
-            f"🧩 *{escape_markdown(book['title'])}*\n"
-            "Fayl turini tanlang:"
-        ),
-        parse_mode="Markdown",
-        reply_markup=keyboard,
+        text=render['choice_text'],
+        entities=render['choice_entities'],
+        reply_markup=markup,
         reply_to_message_id=reply_to_message_id  # Guruhlarda reply qilamiz
     )
 
 @router.callback_query(F.data.startswith("send_parts_"))
-async def send_book_parts_callback(callback: CallbackQuery):
-    """Qismli kitobning ma'lum turdagi fayllarini yuborish"""
+async def send_book_parts_callback(callback: CallbackQuery, db: Database):
+    """Qismli kitobning ma'lum turdagi fayllarini yuborish (fon navbati orqali)"""
     try:
         _, _, part_type, book_id_str = callback.data.split("_", 3)
     except ValueError:
@@ -1016,154 +901,24 @@ async def send_book_parts_callback(callback: CallbackQuery):
     if not files:
         await callback.answer("❌ Bu formatdagi fayl mavjud emas.", show_alert=True)
         return
-    icon = "📄" if file_type == 'document' else "🎧"
-    await callback.answer()
-    
-    # Xabar yuborishni boshlash
-    status_msg = await callback.message.answer(
-        f"⏳ {icon} *{escape_markdown(book['title'])}*\n"
-        f"Fayllar yuborilmoqda: 0/{len(files)}",
-        parse_mode="Markdown"
-    )
-
-    sent_count = 0
-    for idx, file in enumerate(files, 1):
-        caption = (
-            f"📖 **{escape_markdown(book['title'])}**\n\n"
-            f"👤 Muallif: {escape_markdown(book['author'] or 'Noma\'lum')}\n"
-            f"📼 Qism {idx}/{len(files)}\n"
-            f"📁 Turi: {book['file_type']}\n"
-            f"💾 Hajmi: {format_file_size(book['file_size'] or 0)}\n"
-            f"📅 Yuklangan: {book['upload_date'][:10]}"
-            f"\n\n@Xudoyorxon0325\\_bot"
-
-        )
-        from_chat = file.get('storage_chat_id') or book.get('storage_chat_id') or config.STORAGE_CHANNEL_ID
-        storage_message_id = file.get('storage_message_id')
-        
-        # Har bir fayl uchun retry logikasi
-        max_retries = 5
-        retry_count = 0
-        
-        while retry_count < max_retries:
-            try:
-                if storage_message_id and from_chat:
-                    try:
-                        await callback.bot.copy_message(
-                            chat_id=callback.message.chat.id,
-                            from_chat_id=from_chat,
-                            message_id=storage_message_id,
-                            caption=caption,
-                            parse_mode="Markdown"
-                        )
-                    except Exception as copy_error:
-                        # Agar copy_message ishlamasa, file_id orqali yuboramiz
-                        # print(f"DEBUG: copy_message xatolik, file_id orqali yuborilmoqda: {copy_error}")
-                        if file_type == 'document':
-                            await callback.bot.send_document(
-                                chat_id=callback.message.chat.id,
-                                document=file['file_id'],
-                                caption=caption,
-                                parse_mode="Markdown"
-                            )
-                        else:
-                            await callback.bot.send_audio(
-                                chat_id=callback.message.chat.id,
-                                audio=file['file_id'],
-                                caption=caption,
-                                parse_mode="Markdown"
-                            )
-                else:
-                    if file_type == 'document':
-                        await callback.bot.send_document(
-                            chat_id=callback.message.chat.id,
-                            document=file['file_id'],
-                            caption=caption,
-                            parse_mode="Markdown"
-                        )
-                    else:
-                        await callback.bot.send_audio(
-                            chat_id=callback.message.chat.id,
-                            audio=file['file_id'],
-                            caption=caption,
-                            parse_mode="Markdown"
-                        )
-                
-                # Muvaffaqiyatli yuborildi
-                sent_count += 1
-                
-                # Har 5 ta fayldan keyin statusni yangilaymiz
-                if sent_count % 5 == 0:
-                    try:
-                        await status_msg.edit_text(
-                            f"⏳ {icon} *{escape_markdown(book['title'])}*\n"
-                            f"Fayllar yuborilmoqda: {sent_count}/{len(files)}",
-                            parse_mode="Markdown"
-                        )
-                    except:
-                        pass
-                
-                # Muvaffaqiyatli yuborilgandan keyin tsikldan chiqamiz
-                # Biroz kutish flood control oldini olish uchun
-                await asyncio.sleep(0.5) 
-                break
-                
-            except TelegramRetryAfter as e:
-                wait_time = e.retry_after
-                # print(f"DEBUG: Flood control, {wait_time} soniya kutilmoqda...")
-                if retry_count == 0: # Faqat birinchi marta xabar beramiz
-                     try:
-                        await status_msg.edit_text(
-                            f"⏳ Telegram limitiga duch keldik. {wait_time} soniya kutilmoqda...\n"
-                            f"Fayllar yuborilmoqda: {sent_count}/{len(files)}"
-                        )
-                     except:
-                        pass
-                
-                await asyncio.sleep(wait_time + 1)
-                retry_count += 1
-                continue
-                
-            except Exception as e:
-                error_str = str(e).lower()
-                if "flood control" in error_str or "retry after" in error_str:
-                     match = re.search(r'retry after (\d+)', error_str, re.IGNORECASE)
-                     wait_time = int(match.group(1)) if match else 10
-                     
-                     if retry_count == 0:
-                         try:
-                            await status_msg.edit_text(
-                                f"⏳ Telegram limitiga duch keldik. {wait_time} soniya kutilmoqda...\n"
-                                f"Fayllar yuborilmoqda: {sent_count}/{len(files)}"
-                            )
-                         except:
-                            pass
-                     
-                     await asyncio.sleep(wait_time + 1)
-                     retry_count += 1
-                     continue
-                
-                if "not enough rights" in error_str or "can't send" in error_str or "permission" in error_str:
-                    await callback.message.answer("❌ Botda guruhda hujjat yuborish huquqi yo'q. Botni admin qiling!")
-                    return
-                
-                # Boshqa xatolik bo'lsa
-                print(f"ERROR processing file {idx}: {e}")
-                # Bitta fayl xato bersa ham keyingisiga o'tamiz (lekin xabar chiqaramiz)
-                await callback.message.answer(f"❌ {idx}-qismni yuborishda xatolik: {e}")
-                break
 
-    # Yakuniy xabar
-    try:
-        await status_msg.delete()
-    except:
-        pass
-        
-    await callback.message.answer(
-        f"✅ *{escape_markdown(book['title'])}*\n"
-        f"Barcha fayllar yuborildi ({sent_count}/{len(files)} ta)!",
-        parse_mode="Markdown"
+    # Yuborish fon ishchilariga topshiriladi; tugmani qayta bosish yangi vazifa yaratmaydi
+    job_id, created = await delivery_queue.submit(
+        user_id=callback.from_user.id,
+        chat_id=callback.message.chat.id,
+        book_id=book_id,
+        file_type=file_type,
+        total=len(files)
     )
+    if not created:
+        await callback.answer("⏳ Bu kitob allaqachon yuborilmoqda.")
+        return
+    if job_id is None:
+        await callback.answer("❌ Yuborishni boshlashda xatolik.", show_alert=True)
+        return
+    popularity.book_sent(book_id)
+    await callback.answer()
+
 @router.message(BookStates.multi_part_title)
 async def process_multi_part_title(message: Message, state: FSMContext):
     """Qismli kitob nomini qabul qilish"""
@@ -8,6 +8,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from database.db import Database
 from utils.helpers import is_admin
+from middlewares import set_outbound_priority, PRIORITY_BULK
 import asyncio
 import logging
 from typing import Optional, Dict
@@ -16,7 +17,6 @@ from copy import deepcopy
 logger = logging.getLogger(__name__)
 
 router = Router()
-db = Database()
 
 # Reklama yuborish holatlarini saqlash
 broadcast_tasks: Dict[int, Dict] = {}  # {admin_id: {task, status, current, total, paused, message_id}}
@@ -150,6 +150,8 @@ async def update_broadcast_status(bot: Bot, admin_id: int, status_msg_id: int, c
 
 async def broadcast_task(bot: Bot, admin_id: int, message: Message, user_ids: list, status_msg_id: int):
     """Reklama yuborish background task"""
+    # Broadcast so'rovlari interaktiv javoblardan keyin navbatga qo'yiladi (tezlikni OutboundScheduler boshqaradi)
+    set_outbound_priority(PRIORITY_BULK)
     total = len(user_ids)
     current = 0
     failed = 0
@@ -192,9 +194,6 @@ async def broadcast_task(bot: Bot, admin_id: int, message: Message, user_ids: li
                     bot, admin_id, status_msg_id, current, total,
                     paused=broadcast_tasks[admin_id].get('paused', False)
                 )
-        
-        # Flood control uchun kichik kechikish
-        await asyncio.sleep(0.05)
     
     # Yakuniy status
     if admin_id in broadcast_tasks:
@@ -249,7 +248,7 @@ async def admin_broadcast_callback(callback: CallbackQuery, state: FSMContext):
     await state.set_state(BroadcastStates.waiting_for_message)
 
 @router.message(BroadcastStates.waiting_for_message, F.chat.type == "private")
-async def process_broadcast_message(message: Message, state: FSMContext, bot: Bot):
+async def process_broadcast_message(message: Message, state: FSMContext, bot: Bot, db: Database):
     """Reklama xabarini qabul qilish va yuborishni boshlash"""
     if not is_admin(message.from_user.id):
         await message.answer("❌ Sizda admin huquqi yo'q!")
@@ -0,0 +1,120 @@
+"""
+/top va /new: eng ko'p yuklab olingan va yangi kitoblar ro'yxati
+
+Ro'yxatlar xotiradan olinadi (utils/book_lists.py), sahifalar ham ro'yxat
+o'zgarmaguncha qayta yig'ilmaydi. Kitob tugmalari qidiruvdagi bilan bir xil
+(send_book_<id>), shuning uchun yuborish va hisoblash books.py da.
+"""
+import logging
+from typing import Dict, Tuple
+from aiogram import Router, F
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.filters import Command, CommandObject
+from aiogram.exceptions import TelegramBadRequest
+from utils.formatting import TextBuilder
+from utils.subscription import is_subscribed_to_all, get_subscription_message_async
+from utils.book_lists import lists as book_lists
+from handlers.books import safe_reply_or_send
+import config
+
+logger = logging.getLogger(__name__)
+router = Router()
+
+_HEADERS = {
+    'top': "🔥 Eng ko'p yuklab olingan kitoblar:",
+    'new': "🆕 Yangi qo'shilgan kitoblar:",
+}
+
+# (ro'yxat, sahifa) -> (ro'yxat obyekti, matn, entities, tugmalar); ro'yxat yangilansa eskiradi
+_pages: Dict[Tuple[str, int], tuple] = {}
+
+
+def _render_page(name: str, page: int) -> tuple:
+    """Sahifa matni va tugmalari: (text, entities, keyboard), ro'yxat bo'sh bo'lsa None"""
+    books = book_lists.get(name)
+    if not books:
+        return None
+    page_size = config.BOOK_LISTS_PAGE_SIZE
+    total_pages = (len(books) + page_size - 1) // page_size
+    page = min(max(page, 0), total_pages - 1)
+    cached = _pages.get((name, page))
+    if cached and cached[0] is books:
+        return cached[1:]
+
+    start_idx = page * page_size
+    page_books = books[start_idx:start_idx + page_size]
+    text = TextBuilder().add(f"{_HEADERS[name]}\n\n")
+    for i, book in enumerate(page_books, start_idx + 1):
+        title = book['title'] if len(book['title']) <= 75 else book['title'][:72] + "..."
+        author = book['author'] or "Noma'lum"
+        suffix = " 🧩" if book.get('is_multi_part') else ""
+        text.add(f"{i}. ").bold(title).add(f"{suffix} {author}")
+        if name == 'top':
+            text.add(f" · 📥 {book['downloads']}")
+        elif book.get('upload_date'):
+            text.add(f" · 📅 {str(book['upload_date'])[:10]}")
+        text.add("\n")
+
+    buttons = [
+        InlineKeyboardButton(text=str(i), callback_data=f"send_book_{book['id']}")
+        for i, book in enumerate(page_books, start_idx + 1)
+    ]
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[buttons[i:i + 5] for i in range(0, len(buttons), 5)])
+    if total_pages > 1:
+        nav_buttons = []
+        if page > 0:
+            nav_buttons.append(InlineKeyboardButton(text="◀️", callback_data=f"browse_{name}_{page - 1}"))
+        nav_buttons.append(InlineKeyboardButton(text="❌", callback_data="close_search"))
+        if page < total_pages - 1:
+            nav_buttons.append(InlineKeyboardButton(text="▶️", callback_data=f"browse_{name}_{page + 1}"))
+        keyboard.inline_keyboard.append(nav_buttons)
+    else:
+        keyboard.inline_keyboard.append([InlineKeyboardButton(text="❌ Yopish", callback_data="close_search")])
+
+    rendered = (*text.build(), keyboard)
+    if len(_pages) >= 1000:
+        _pages.clear()
+    _pages[(name, page)] = (books, *rendered)
+    return rendered
+
+
+@router.message(Command("top", "new"))
+async def browse_command(message: Message, command: CommandObject):
+    """Eng ko'p yuklab olingan / yangi kitoblar"""
+    if not await is_subscribed_to_all(message.bot, message.from_user.id):
+        msg_text, keyboard = await get_subscription_message_async(message.bot)
+        await safe_reply_or_send(message, msg_text, reply_markup=keyboard)
+        return
+
+    rendered = _render_page(command.command.lower(), 0)
+    if rendered is None:
+        await safe_reply_or_send(message, "📚 Hozircha kitoblar mavjud emas.")
+        return
+    text, entities, keyboard = rendered
+    await safe_reply_or_send(message, text, reply_markup=keyboard, entities=entities)
+
+
+@router.callback_query(F.data.startswith("browse_"))
+async def browse_page_callback(callback: CallbackQuery):
+    """Ro'yxat sahifalari"""
+    try:
+        _, name, page = callback.data.split("_")
+        page = int(page)
+    except ValueError:
+        await callback.answer("❌ Noto'g'ri sahifa raqami!")
+        return
+    if name not in _HEADERS:
+        await callback.answer("❌ Noto'g'ri ma'lumot.")
+        return
+
+    rendered = _render_page(name, page)
+    if rendered is None:
+        await callback.answer("📚 Hozircha kitoblar mavjud emas.")
+        return
+    text, entities, keyboard = rendered
+    try:
+        await callback.message.edit_text(text, entities=entities, reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        # "message is not modified": tugma ikki marta bosildi
+        logger.debug("Ro'yxat sahifasi yangilanmadi: %s", e)
+    await callback.answer()
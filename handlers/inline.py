@@ -0,0 +1,136 @@
+"""
+Inline rejim: istalgan chatda "@bot so'rov" orqali kitob qidirish
+
+Natijalar saqlangan file_id lardan (cached document/audio) beriladi: fayl
+foydalanuvchi nomidan yuboriladi, bot chatga alohida javob yozmaydi. Sahifalash
+next_offset orqali, qidiruv natijalari serverda keshlanadi (utils/inline_cache.py),
+takroriy so'rovlarga esa Telegram o'zi INLINE_CACHE_TIME davomida javob beradi.
+Majburiy obuna kanallari bo'lsa, javob foydalanuvchiga bog'liq (is_personal).
+Tanlangan natijalar (BotFather da /setinlinefeedback yoqilgan bo'lsa) yuklab
+olishlar hisoblagichiga qo'shiladi.
+"""
+import logging
+import time
+from typing import Dict, Optional, Tuple
+from aiogram import Router, Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import (
+    InlineQuery, ChosenInlineResult, InlineQueryResultCachedDocument, InlineQueryResultCachedAudio,
+    InlineQueryResultArticle, InputTextMessageContent, InlineQueryResultsButton,
+    InlineKeyboardMarkup, InlineKeyboardButton
+)
+from database.db import Database
+from utils.subscription import is_subscribed_to_all
+from utils.inline_cache import cache as search_cache
+from utils.render_cache import cache as render_cache
+from utils.deep_links import book_link
+from utils.popularity import counters as popularity
+import config
+
+logger = logging.getLogger(__name__)
+router = Router()
+
+# Obunasi tasdiqlangan foydalanuvchilar: user_id -> muddati (faqat ijobiy natija eslab qolinadi)
+_subscribed: Dict[int, float] = {}
+_SUBSCRIBED_MAX = 10000
+
+
+async def _check_access(bot: Bot, user_id: int, db: Database) -> Tuple[bool, bool]:
+    """(ruxsat bor, javob shaxsiy) - kanallar bo'lmasa natijalar hamma uchun bir xil"""
+    if not db.get_required_channels():
+        return True, False
+    now = time.monotonic()
+    if _subscribed.get(user_id, 0) > now:
+        return True, True
+    if not await is_subscribed_to_all(bot, user_id):
+        return False, True
+    if len(_subscribed) >= _SUBSCRIBED_MAX:
+        for key in [key for key, expires in _subscribed.items() if expires <= now]:
+            del _subscribed[key]
+        if len(_subscribed) >= _SUBSCRIBED_MAX:
+            _subscribed.clear()
+    _subscribed[user_id] = now + config.INLINE_SUBSCRIPTION_TTL
+    return True, True
+
+
+def _book_result(book: Dict, bot_username: str):
+    """Kitob uchun inline natija (qismli kitoblar - botdagi kitob havolasi)"""
+    render = render_cache.get(book)
+    author = book.get('author') or "Noma'lum"
+    if book.get('is_multi_part'):
+        counts = render.get('file_counts') or {}
+        return InlineQueryResultArticle(
+            id=str(book['id']),
+            title=f"🧩 {book['title']}",
+            description=f"👤 {author} · 📄 {counts.get('document', 0)} · 🎧 {counts.get('audio', 0)}",
+            input_message_content=InputTextMessageContent(
+                message_text=f"🧩 {book['title']}\n👤 Muallif: {author}\n\nBarcha qismlari botda 👇"
+            ),
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(text="📥 Botda ochish", url=book_link(bot_username, book['id']))]
+            ])
+        )
+    if book['file_type'] == 'audio':
+        return InlineQueryResultCachedAudio(
+            id=str(book['id']),
+            audio_file_id=book['file_id'],
+            caption=render['fallback_caption'],
+            caption_entities=render['caption_entities']
+        )
+    return InlineQueryResultCachedDocument(
+        id=str(book['id']),
+        title=book['title'],
+        document_file_id=book['file_id'],
+        description=author,
+        caption=render['fallback_caption'],
+        caption_entities=render['caption_entities']
+    )
+
+
+async def _answer(inline_query: InlineQuery, results: list, cache_time: int, is_personal: bool,
+                  next_offset: str = "", button: Optional[InlineQueryResultsButton] = None):
+    try:
+        await inline_query.answer(
+            results, cache_time=cache_time, is_personal=is_personal, next_offset=next_offset, button=button
+        )
+    except TelegramBadRequest as e:
+        # "query is too old": foydalanuvchi allaqachon boshqa so'rov yozgan
+        logger.debug("Inline javob yuborilmadi: %s", e)
+
+
+@router.inline_query()
+async def inline_search(inline_query: InlineQuery, bot: Bot, db: Database):
+    """Inline qidiruv"""
+    allowed, personal = await _check_access(bot, inline_query.from_user.id, db)
+    if not allowed:
+        await _answer(
+            inline_query, [], config.INLINE_DENIED_CACHE_TIME, True,
+            button=InlineQueryResultsButton(text="📢 Avval kanallarga obuna bo'ling", start_parameter="subscribe")
+        )
+        return
+
+    query = inline_query.query.strip()
+    if len(query) < config.INLINE_MIN_QUERY_LENGTH:
+        await _answer(inline_query, [], config.INLINE_CACHE_TIME, personal)
+        return
+
+    books = search_cache.get(query)
+    if books is None:
+        # Faylsiz yozuvlar (file_id yo'q) inline da yuborib bo'lmaydi
+        books = [book for book in db.search_books(query) if book.get('is_multi_part') or book.get('file_id')]
+        search_cache.put(query, books)
+
+    offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+    page = books[offset:offset + config.INLINE_PAGE_SIZE]
+    bot_username = (await bot.me()).username
+    results = [_book_result(book, bot_username) for book in page]
+    next_offset = str(offset + len(page)) if offset + len(page) < len(books) else ""
+    logger.debug("Inline qidiruv %r: %d ta natija, offset=%d", query, len(books), offset)
+    await _answer(inline_query, results, config.INLINE_CACHE_TIME, personal, next_offset=next_offset)
+
+
+@router.chosen_inline_result()
+async def inline_result_chosen(chosen: ChosenInlineResult):
+    """Inline natija chatga yuborildi"""
+    if chosen.result_id.isdigit():
+        popularity.book_sent(int(chosen.result_id))
@@ -4,35 +4,140 @@ Asosiy bot fayli
 import asyncio
 import logging
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from database.db import Database, get_db, add_query_hook
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 from aiohttp import web
 
 # Handlerlarni import qilish
-from handlers import basic, books, groups, admin, broadcast
+from handlers import basic, books, groups, admin, broadcast, inline, browse
+
+# Middleware larni import qilish
+from middlewares import (
+    ThrottlingMiddleware, OutboundScheduler, LogContextMiddleware,
+    UpdateMetricsMiddleware, HandlerMetricsMiddleware, BotApiMetrics,
+    UpdateTracingMiddleware, HandlerTracingMiddleware, ApiTracingMiddleware,
+    UpdateRecorderMiddleware
+)
+
+# Fon navbatlari
+from utils.delivery import queue as delivery_queue
+from utils.ingest import pipeline as ingest_pipeline
+from utils.spam_batcher import batcher as spam_batcher
+from utils.render_cache import cache as render_cache
+from utils.inline_cache import cache as inline_cache
+from utils.popularity import counters as popularity
+from utils.book_lists import lists as book_lists
+from utils.ad_rules import engine as ad_rule_engine
+from utils.spam_fingerprint import detector as duplicate_detector
+from utils import metrics, tracing
 
 # Konfiguratsiyani import qilish
 import config
 
-# Logging sozlamalari
-logging.basicConfig(
-    level=logging.DEBUG,  # DEBUG rejimini yoqish
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from utils.logging_setup import setup_logging
+
+# Logging sozlamalari (navbat orqali yoziladi, darajalar config.LOG_LEVEL / LOG_LEVELS da)
+setup_logging()
 logger = logging.getLogger(__name__)
 
-async def main():
-    """Asosiy funksiya"""
-    # Bot va dispatcher yaratish
-    bot = Bot(token=config.BOT_TOKEN)
-    dp = Dispatcher(storage=MemoryStorage())
+async def on_startup(bot: Bot, db: Database):
+    """Dispatcher ishga tushganda: migratsiyalar va fon ishchilari"""
+    db.init_database()
+    # Qismli kitoblarni yuborish ishchilari (to'xtab qolgan vazifalar ham davom ettiriladi)
+    await delivery_queue.start(bot)
+    # Avtomatik yuklash konveyeri ishchilari
+    await ingest_pipeline.start(bot)
+    # Yuklab olishlar va qidiruv hisoblagichlarini davriy yozish
+    await popularity.start()
+    # /top va /new ro'yxatlari (xotirada, hisoblagichlardan yangilanadi)
+    await book_lists.start()
+    # Prometheus /metrics endpointi
+    await metrics.server.start()
+
+async def on_shutdown(db: Database):
+    """Dispatcher to'xtaganda: fon ishchilarini to'xtatish va bazani yopish"""
+    await metrics.server.stop()
+    # Kutilayotgan reklama xabarlari oynani kutmasdan o'chiriladi
+    await spam_batcher.stop()
+    await ingest_pipeline.stop()
+    await delivery_queue.stop()
+    await book_lists.stop()
+    await popularity.stop()
+    db.close()
+
+def create_bot(token: str = None) -> Bot:
+    """Bot va uning sessiya middleware lari (TELEGRAM_API_URL - lokal yoki test Bot API serveri)"""
+    session = None
+    if config.TELEGRAM_API_URL:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(config.TELEGRAM_API_URL))
+    bot = Bot(token=token or config.BOT_TOKEN, session=session)
+    # Barcha chiquvchi so'rovlar yagona limitlar va flood control navbatidan o'tadi
+    # Trace dagi Bot API spani limit kutishi va retry larni ham o'z ichiga oladi
+    bot.session.middleware(ApiTracingMiddleware())
+    outbound = OutboundScheduler()
+    bot.session.middleware(outbound)
+    # Har bir haqiqiy so'rov (retry lar ham) metodi va natijasi bo'yicha sanaladi
+    bot.session.middleware(BotApiMetrics())
+    metrics.component_stats.track(lambda: outbound.stats, 'outbound')
+    return bot
+
+def create_dispatcher() -> Dispatcher:
+    """Dispatcher: middleware lar, metrikalar va routerlar (jarayonda bir marta chaqiriladi)"""
+    # Yagona Database obyekti handlerlarga "db" argumenti sifatida uzatiladi (workflow data)
+    dp = Dispatcher(storage=MemoryStorage(), db=get_db())
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    # Kelgan update lar replay uchun JSONL ga yoziladi (benchmarks/replay.py)
+    if config.UPDATE_RECORD_PATH:
+        dp.update.outer_middleware(UpdateRecorderMiddleware(config.UPDATE_RECORD_PATH))
+    # Har bir update loglariga update_id, user_id, chat_id qo'shiladi
+    dp.update.outer_middleware(LogContextMiddleware())
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    # Sekin update lar spanlari bilan logga yoziladi (filtrlar, obuna, SQLite, Bot API)
+    dp.update.outer_middleware(UpdateTracingMiddleware())
+    # Dispatcher inner middleware lari barcha routerlarga tarqaladi: har bir handler vaqti
+    handler_metrics = HandlerMetricsMiddleware()
+    handler_tracing = HandlerTracingMiddleware()
+    for event_name, observer in dp.observers.items():
+        if event_name not in ('update', 'error'):
+            observer.middleware(handler_metrics)
+            observer.middleware(handler_tracing)
+    add_query_hook(metrics.observe_db_query)
+    add_query_hook(tracing.observe_db_query)
+    for name, component in (('delivery', delivery_queue), ('ingest', ingest_pipeline), ('spam', spam_batcher),
+                            ('popularity', popularity)):
+        metrics.queue_depth.track(lambda component=component: component.depth, name)
+        metrics.component_stats.track(lambda component=component: component.stats, name)
+    metrics.component_stats.track(lambda: render_cache.stats, 'render_cache')
+    metrics.component_stats.track(lambda: inline_cache.stats, 'inline_cache')
+    metrics.component_stats.track(lambda: book_lists.stats, 'book_lists')
+    # Reklama filtri: prefiltr/qoidalar bosqichlari va takroriy spam detektori
+    metrics.component_stats.track(lambda: ad_rule_engine.tier_stats, 'ad_rules')
+    metrics.component_stats.track(lambda: duplicate_detector.stats, 'duplicate_detector')
     
     # Handlerlarni ro'yxatga olish (tartib muhim!)
     dp.include_router(groups.router)  # Guruh xabarlari (Anti-spam) - ENG BIRINCHI bo'lishi shart!
     dp.include_router(basic.router)   # Buyruqlar (/start, /help)
     dp.include_router(admin.router)   # Admin
     dp.include_router(broadcast.router) # Broadcast
+    dp.include_router(inline.router)  # Inline qidiruv (@bot so'rov)
+    dp.include_router(browse.router)  # /top va /new ro'yxatlari
     dp.include_router(books.router)   # Kitob qidirish (qolgan xabarlar)
+
+    # Kitob qidirish va tugmalar uchun flood limiter (faqat books handlerlariga yetib kelgan so'rovlar)
+    throttling = ThrottlingMiddleware()
+    books.router.message.middleware(throttling)
+    books.router.callback_query.middleware(throttling)
+    return dp
+
+async def main():
+    """Asosiy funksiya"""
+    # Bot va dispatcher yaratish
+    bot = create_bot()
+    dp = create_dispatcher()
     
     # Bot ma'lumotlarini tekshirish
     try:
@@ -43,6 +148,8 @@ async def main():
         global_commands = [
             BotCommand(command="start", description="Botni ishga tushirish"),
             BotCommand(command="help", description="Yordam olish"),
+            BotCommand(command="top", description="Eng ko'p yuklab olingan kitoblar"),
+            BotCommand(command="new", description="Yangi qo'shilgan kitoblar"),
         ]
         
         await bot.set_my_commands(commands=global_commands)
@@ -0,0 +1,26 @@
+"""
+Middleware lar uchun __init__.py fayli
+"""
+from .throttling import ThrottlingMiddleware
+from .outbound import OutboundScheduler, outbound_priority, set_outbound_priority, PRIORITY_INTERACTIVE, PRIORITY_BULK
+from .log_context import LogContextMiddleware
+from .metrics import UpdateMetricsMiddleware, HandlerMetricsMiddleware, BotApiMetrics
+from .tracing import UpdateTracingMiddleware, HandlerTracingMiddleware, ApiTracingMiddleware
+from .recorder import UpdateRecorderMiddleware
+
+__all__ = [
+    'ThrottlingMiddleware',
+    'LogContextMiddleware',
+    'UpdateMetricsMiddleware',
+    'HandlerMetricsMiddleware',
+    'BotApiMetrics',
+    'UpdateTracingMiddleware',
+    'HandlerTracingMiddleware',
+    'ApiTracingMiddleware',
+    'UpdateRecorderMiddleware',
+    'OutboundScheduler',
+    'outbound_priority',
+    'set_outbound_priority',
+    'PRIORITY_INTERACTIVE',
+    'PRIORITY_BULK',
+]
@@ -0,0 +1,30 @@
+"""
+Har bir update uchun log konteksti (update_id, turi, user_id, chat_id)
+"""
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+from utils.logging_setup import bind_context, reset_context
+
+
+class LogContextMiddleware(BaseMiddleware):
+    """Dispatcher update outer middleware: handler ichidagi barcha loglarga kontekst qo'shadi"""
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        fields = {'update_id': event.update_id, 'event': event.event_type}
+        user = data.get('event_from_user')
+        if user:
+            fields['user_id'] = user.id
+        chat = data.get('event_chat')
+        if chat:
+            fields['chat_id'] = chat.id
+        token = bind_context(**fields)
+        try:
+            return await handler(event, data)
+        finally:
+            reset_context(token)
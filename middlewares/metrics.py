@@ -0,0 +1,98 @@
+"""
+Metrikalar uchun middleware lar
+
+UpdateMetricsMiddleware - Dispatcher update outer middleware (update turi bo'yicha umumiy vaqt),
+HandlerMetricsMiddleware - Dispatcher event observerlariga inner middleware (har bir handler vaqti),
+BotApiMetrics - bot sessiyasi request middleware (Bot API metodi va natijasi bo'yicha).
+"""
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod, Response
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject, Update
+from utils import metrics
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Har bir update ni qayta ishlash vaqti (event turi bo'yicha)"""
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            metrics.update_seconds.observe(time.perf_counter() - started, event.event_type)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Handler vaqti: router (modul) va funksiya nomi bo'yicha"""
+
+    def __init__(self):
+        # HandlerObject -> (router, handler) labellari
+        self._labels: Dict[int, tuple] = {}
+
+    def _handler_labels(self, data: Dict[str, Any]) -> tuple:
+        handler_object = data.get('handler')
+        if handler_object is None:
+            return ('unknown', 'unknown')
+        labels = self._labels.get(id(handler_object))
+        if labels is None:
+            callback = handler_object.callback
+            labels = (
+                getattr(callback, '__module__', None) or 'unknown',
+                getattr(callback, '__qualname__', None) or type(callback).__name__
+            )
+            self._labels[id(handler_object)] = labels
+        return labels
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        labels = self._handler_labels(data)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            metrics.handler_errors.inc(*labels)
+            raise
+        finally:
+            metrics.handler_seconds.observe(time.perf_counter() - started, *labels)
+
+
+class BotApiMetrics(BaseRequestMiddleware):
+    """Har bir haqiqiy HTTP so'rov (OutboundScheduler dan keyin ulanadi, retry lar alohida sanaladi)"""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: "Bot",
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        api_method = method.__api_method__
+        result = 'ok'
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except TelegramRetryAfter:
+            result = 'retry_after'
+            raise
+        except Exception as e:
+            result = type(e).__name__
+            raise
+        finally:
+            metrics.api_seconds.observe(time.perf_counter() - started, api_method)
+            metrics.api_requests.inc(api_method, result)
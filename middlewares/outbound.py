@@ -0,0 +1,195 @@
+"""
+Barcha chiquvchi Bot API so'rovlari uchun markaziy rejalashtiruvchi
+
+Bot sessiyasiga middleware sifatida ulanadi: umumiy (global), har bir chat va
+guruhlar uchun token bucket limitlari, ustuvorlik (interaktiv javoblar
+broadcastdan oldin) va retry_after ni hisobga olib qayta yuborish.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod, Response
+from aiogram.methods.base import TelegramType
+import config
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+logger = logging.getLogger(__name__)
+
+# Ustuvorlik darajalari: interaktiv javoblar va ommaviy yuborish (broadcast)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+_priority: ContextVar[int] = ContextVar('outbound_priority', default=PRIORITY_INTERACTIVE)
+
+# Chatga yangi xabar chiqaradigan metodlar (chat limitlariga kiradi)
+_SEND_PREFIXES = ('send', 'copy', 'forward')
+# Limitlarga umuman kirmaydigan metodlar
+_EXEMPT_METHODS = {'sendChatAction'}
+
+
+@contextmanager
+def outbound_priority(priority: int):
+    """Blok ichidagi (va undan yaratilgan tasklardagi) so'rovlar ustuvorligini belgilash"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def set_outbound_priority(priority: int):
+    """Joriy task uchun ustuvorlikni belgilash (masalan, broadcast task boshida)"""
+    _priority.set(priority)
+
+
+class _Bucket:
+    """Rezervatsiyali token bucket: token qarzga olinadi, kutish vaqti qaytariladi"""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, now: float) -> float:
+        """Bitta token olish; token hali yig'ilmagan bo'lsa, kutish kerak bo'lgan vaqt"""
+        self.refill(now)
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    def wait_time(self, now: float, level: float) -> float:
+        """Tokenlar soni level ga yetguncha qolgan vaqt"""
+        self.refill(now)
+        return max(0.0, (level - self.tokens) / self.rate)
+
+    def penalize(self, now: float, seconds: float):
+        """retry_after: keyingi so'rovlar kamida shu vaqt kutadi"""
+        self.refill(now)
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+    def is_idle(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class OutboundScheduler(BaseRequestMiddleware):
+    """Bot sessiyasi uchun request middleware (bot.session.middleware(...))"""
+
+    def __init__(self):
+        self.global_bucket = _Bucket(config.OUTBOUND_GLOBAL_RATE, config.OUTBOUND_GLOBAL_BURST, time.monotonic())
+        self._chats: "OrderedDict[object, _Bucket]" = OrderedDict()
+        self.stats = {'requests': 0, 'delayed': 0, 'retry_after': 0, 'requeued': 0}
+
+    @staticmethod
+    def _chat_kind(chat_id) -> str:
+        """'channel' (ombor kanali va @username), 'group' (boshqa manfiy ID) yoki 'private'"""
+        if str(chat_id) == str(config.STORAGE_CHANNEL_ID):
+            return 'channel'
+        if isinstance(chat_id, str):
+            if chat_id.startswith('@'):
+                return 'channel'
+            try:
+                chat_id = int(chat_id)
+            except ValueError:
+                return 'group'
+        return 'group' if chat_id < 0 else 'private'
+
+    def _chat_bucket(self, chat_id, now: float) -> _Bucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            # Guruhlar daqiqasiga ~20 xabar; kanallar (ombor) va shaxsiy chatlar o'z limitida
+            kind = self._chat_kind(chat_id)
+            if kind == 'channel':
+                bucket = _Bucket(config.OUTBOUND_CHANNEL_RATE, config.OUTBOUND_CHANNEL_BURST, now)
+            elif kind == 'group':
+                bucket = _Bucket(config.OUTBOUND_GROUP_RATE, config.OUTBOUND_GROUP_BURST, now)
+            else:
+                bucket = _Bucket(config.OUTBOUND_PRIVATE_RATE, config.OUTBOUND_PRIVATE_BURST, now)
+            self._chats[chat_id] = bucket
+            # Eng eski, to'liq to'lgan bucketlarni xotiradan chiqaramiz
+            while len(self._chats) > config.OUTBOUND_MAX_BUCKETS:
+                old_id, old_bucket = next(iter(self._chats.items()))
+                if not old_bucket.is_idle(now) and len(self._chats) <= 2 * config.OUTBOUND_MAX_BUCKETS:
+                    break
+                del self._chats[old_id]
+        else:
+            self._chats.move_to_end(chat_id)
+        return bucket
+
+    @staticmethod
+    def _is_chat_limited(api_method: str) -> bool:
+        return api_method.startswith(_SEND_PREFIXES)
+
+    async def _acquire(self, method: TelegramMethod, chat_id, priority: int):
+        """Token olinguncha kutish (chat limiti, so'ng global limit)"""
+        delay = 0.0
+        if chat_id is not None and self._is_chat_limited(method.__api_method__):
+            delay = self._chat_bucket(chat_id, time.monotonic()).reserve(time.monotonic())
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        if priority == PRIORITY_INTERACTIVE:
+            global_delay = self.global_bucket.reserve(time.monotonic())
+            if global_delay > 0:
+                await asyncio.sleep(global_delay)
+            delay += global_delay
+        else:
+            # Ommaviy so'rovlar interaktivlar uchun zaxira qoldirib, navbatsiz token olmaydi
+            level = 1 + config.OUTBOUND_BULK_RESERVE
+            while True:
+                wait = self.global_bucket.wait_time(time.monotonic(), level)
+                if wait <= 0:
+                    self.global_bucket.tokens -= 1
+                    break
+                delay += wait
+                await asyncio.sleep(wait)
+        if delay > 0:
+            self.stats['delayed'] += 1
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: "Bot",
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        api_method = method.__api_method__
+        # getUpdates, get* va answer* so'rovlari limitlanmaydi
+        if api_method in _EXEMPT_METHODS or api_method.startswith(('get', 'answer')):
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, 'chat_id', None)
+        priority = _priority.get()
+        self.stats['requests'] += 1
+        attempt = 0
+        while True:
+            await self._acquire(method, chat_id, priority)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.stats['retry_after'] += 1
+                now = time.monotonic()
+                # Telegram aytgan vaqtgacha shu chatga (chat bo'lmasa, hammaga) yubormaymiz
+                if chat_id is None:
+                    self.global_bucket.penalize(now, e.retry_after)
+                elif self._is_chat_limited(api_method):
+                    self._chat_bucket(chat_id, now).penalize(now, e.retry_after)
+                attempt += 1
+                if attempt > config.OUTBOUND_MAX_RETRIES:
+                    raise
+                self.stats['requeued'] += 1
+                logger.warning(f"{api_method}: flood control, {e.retry_after} soniyadan keyin qayta yuboriladi (chat={chat_id})")
+                if chat_id is not None and not self._is_chat_limited(api_method):
+                    await asyncio.sleep(e.retry_after)
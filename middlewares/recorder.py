@@ -0,0 +1,44 @@
+"""
+Kelgan update larni JSONL faylga yozish (benchmarks/replay.py bilan qayta o'ynatish uchun)
+
+Har bir qator: {"ts": unix vaqt, "update": Bot API dagi ko'rinishi}.
+"""
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TextIO
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateRecorderMiddleware(BaseMiddleware):
+    """Dispatcher update outer middleware: update handlerga berilishidan oldin yoziladi"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file: Optional[TextIO] = None
+
+    def _write(self, line: str):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Qator buferi: jarayon to'satdan to'xtasa ham yozilganlari saqlanadi
+            self._file = open(self.path, 'a', encoding='utf-8', buffering=1)
+        self._file.write(line)
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        try:
+            record = {'ts': round(time.time(), 3), 'update': event.model_dump(mode='json', by_alias=True, exclude_none=True)}
+            self._write(json.dumps(record, ensure_ascii=False) + '\n')
+        except (OSError, ValueError) as e:
+            logger.warning(f"Update ni yozishda xatolik: {e}")
+        return await handler(event, data)
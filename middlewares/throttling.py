@@ -0,0 +1,131 @@
+"""
+Foydalanuvchi va chat bo'yicha so'rovlarni cheklash (token bucket)
+"""
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Message, CallbackQuery
+from utils.helpers import is_admin
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucketStore:
+    """
+    Xotirada saqlanadigan token bucketlar: key -> [tokens, updated_at, notified_at].
+    To'liq to'lgan (ya'ni ishlatilmayotgan) bucketlar TTL bo'yicha o'chiriladi.
+    """
+
+    def __init__(self, ttl: float, max_keys: int):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[tuple, list]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _evict(self, now: float):
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if now - bucket[1] <= self.ttl and len(self._buckets) <= self.max_keys:
+                break
+            del self._buckets[key]
+
+    def take(self, key: tuple, rate: float, burst: int, now: float) -> bool:
+        """Bitta token olish. Token bo'lmasa False qaytaradi."""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [float(burst), now, 0.0]
+            self._buckets[key] = bucket
+        else:
+            bucket[0] = min(float(burst), bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+        self._evict(now)
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return True
+        return False
+
+    def refund(self, key: tuple, burst: int):
+        """Olingan tokenni qaytarish (ikkinchi bucket rad etganda)"""
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket[0] = min(float(burst), bucket[0] + 1)
+
+    def should_notify(self, key: tuple, interval: float, now: float) -> bool:
+        """"Juda ko'p so'rov" xabarini har interval ichida faqat bir marta yuborish"""
+        bucket = self._buckets.get(key)
+        if bucket is None or now - bucket[2] < interval:
+            return False
+        bucket[2] = now
+        return True
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Qidiruv va guruh xabarlari uchun flood limiter (shaxsiy chat va guruhlar uchun alohida limitlar)"""
+
+    def __init__(self):
+        # Bo'sh bucket burst / rate soniyada to'ladi, undan keyin uni saqlash shart emas
+        ttl = max(
+            config.THROTTLE_PRIVATE_BURST / config.THROTTLE_PRIVATE_RATE,
+            config.THROTTLE_GROUP_USER_BURST / config.THROTTLE_GROUP_USER_RATE,
+            config.THROTTLE_GROUP_CHAT_BURST / config.THROTTLE_GROUP_CHAT_RATE,
+            config.THROTTLE_NOTICE_INTERVAL,
+        )
+        self.store = TokenBucketStore(ttl=ttl, max_keys=config.THROTTLE_MAX_KEYS)
+        self.dropped = 0
+
+    def _limits(self, chat_type: str) -> tuple:
+        if chat_type == "private":
+            return config.THROTTLE_PRIVATE_RATE, config.THROTTLE_PRIVATE_BURST, config.THROTTLE_PRIVATE_MODE
+        return config.THROTTLE_GROUP_USER_RATE, config.THROTTLE_GROUP_USER_BURST, config.THROTTLE_GROUP_MODE
+
+    def _allow(self, user_id: int, chat_id: int, chat_type: str, now: float) -> tuple:
+        """(ruxsat, xabar berish kerakmi) qaytaradi"""
+        rate, burst, mode = self._limits(chat_type)
+        user_key = ('private' if chat_type == "private" else 'group', user_id)
+        if not self.store.take(user_key, rate, burst, now):
+            return False, mode == "reply" and self.store.should_notify(user_key, config.THROTTLE_NOTICE_INTERVAL, now)
+        if chat_type != "private":
+            chat_key = ('chat', chat_id)
+            if not self.store.take(chat_key, config.THROTTLE_GROUP_CHAT_RATE, config.THROTTLE_GROUP_CHAT_BURST, now):
+                self.store.refund(user_key, burst)
+                return False, mode == "reply" and self.store.should_notify(chat_key, config.THROTTLE_NOTICE_INTERVAL, now)
+        return True, False
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if isinstance(event, Message):
+            chat = event.chat
+        elif isinstance(event, CallbackQuery) and event.message:
+            chat = event.message.chat
+        else:
+            return await handler(event, data)
+
+        user = event.from_user
+        # Adminlar cheklanmaydi (masalan, ko'p fayl yuklashda)
+        if not user or is_admin(user.id):
+            return await handler(event, data)
+
+        allowed, notify = self._allow(user.id, chat.id, chat.type, time.monotonic())
+        if allowed:
+            return await handler(event, data)
+
+        self.dropped += 1
+        # Arzon javob: callback ga qisqa alert, xabarga bitta ogohlantirish
+        try:
+            if isinstance(event, CallbackQuery):
+                await event.answer("⏳ Juda ko'p so'rov. Biroz kuting.")
+            elif notify:
+                await event.reply("⏳ Juda ko'p so'rov yuborildi. Iltimos, biroz kuting.")
+        except Exception as e:
+            logger.warning(f"Flood ogohlantirishini yuborishda xatolik: {e}")
+        return None
@@ -0,0 +1,69 @@
+"""
+Sekin update larni kuzatish uchun middleware lar (utils/tracing.py)
+
+UpdateTracingMiddleware - Dispatcher update outer middleware (trace ni ochadi/yopadi, cProfile),
+HandlerTracingMiddleware - Dispatcher event observerlariga inner middleware (handler spani),
+ApiTracingMiddleware - bot sessiyasi request middleware (Bot API spani, limit kutishlari va retry lar bilan).
+"""
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod, Response
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject, Update
+from utils import tracing
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+
+class UpdateTracingMiddleware(BaseMiddleware):
+    """Har bir update uchun trace; sekinlari logga, tanlanganlari profilga yoziladi"""
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        trace = tracing.Trace(event.update_id, event.event_type)
+        token = tracing.activate(trace)
+        profiler = tracing.start_profile()
+        try:
+            return await handler(event, data)
+        finally:
+            tracing.deactivate(token)
+            tracing.finish(trace, profiler)
+
+
+class HandlerTracingMiddleware(BaseMiddleware):
+    """Ishlagan handler spani (undan oldingi vaqt - routerlar va filtrlar)"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get('handler')
+        callback = getattr(handler_object, 'callback', None)
+        name = f"handler {getattr(callback, '__module__', '?')}.{getattr(callback, '__qualname__', '?')}"
+        with tracing.span(name):
+            return await handler(event, data)
+
+
+class ApiTracingMiddleware(BaseRequestMiddleware):
+    """OutboundScheduler dan oldin ulanadi: span limit kutishi va retry larni ham o'z ichiga oladi"""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: "Bot",
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            tracing.record(f"api {method.__api_method__}", started, time.perf_counter() - started)
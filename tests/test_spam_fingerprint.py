@@ -0,0 +1,61 @@
+"""
+Takroriy spam detektori: guruhlararo belgilash faqat bitta yuboruvchi bo'yicha
+"""
+import asyncio
+from types import SimpleNamespace
+
+from utils.spam_fingerprint import DuplicateDetector, message_fingerprints
+
+NEWS = "Bugun poytaxtda yangi kutubxona ochildi, unda o'n ming nusxa kitob bor"
+
+
+def _message(chat_id: int, user_id: int, text: str = NEWS):
+    return SimpleNamespace(
+        from_user=SimpleNamespace(id=user_id, is_bot=False),
+        chat=SimpleNamespace(id=chat_id),
+        text=text, caption=None, entities=None, caption_entities=None, forward_from_chat=None,
+        photo=None, video=None, animation=None, document=None, audio=None, video_note=None,
+        bot=None,
+    )
+
+
+def test_same_text_from_different_users_is_not_flagged():
+    detector = DuplicateDetector(window=600, min_chats=3)
+    fingerprints = message_fingerprints(_message(-1, 1))
+    assert fingerprints
+
+    for chat_id, user_id in ((-1, 1), (-2, 2), (-3, 3), (-4, 4)):
+        assert not detector.observe(fingerprints, chat_id, user_id)
+    assert not detector.is_flagged(fingerprints)
+    assert detector.stats['cross_chat_flags'] == 0
+
+
+def test_same_text_from_one_user_in_many_groups_is_flagged():
+    detector = DuplicateDetector(window=600, min_chats=3)
+    fingerprints = message_fingerprints(_message(-1, 7))
+
+    assert not detector.observe(fingerprints, -1, 7)
+    assert not detector.observe(fingerprints, -2, 7)
+    assert detector.observe(fingerprints, -3, 7)
+    # Belgilangan xabar nusxasi boshqa foydalanuvchidan ham o'chiriladi
+    assert detector.observe(fingerprints, -4, 8)
+
+
+def test_spam_filter_keeps_benign_text_shared_by_different_users(monkeypatch):
+    import handlers.groups as groups
+
+    async def allow(*args):
+        return True
+
+    async def deny(*args):
+        return False
+
+    monkeypatch.setattr(groups, 'duplicate_detector', DuplicateDetector(window=600, min_chats=3))
+    monkeypatch.setattr(groups, 'is_group_admin', deny)
+    monkeypatch.setattr(groups, 'can_bot_delete_messages', allow)
+    spam_filter = groups.SpamFilter()
+
+    async def run():
+        return [await spam_filter(_message(-chat, chat)) for chat in (1, 2, 3)]
+
+    assert asyncio.run(run()) == [False, False, False]
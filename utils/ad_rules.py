@@ -0,0 +1,515 @@
+"""
+Reklama aniqlash qoidalari (groups.py va books.py uchun umumiy)
+
+Qoidalar SQLite dagi ad_rules jadvalida saqlanadi va admin panel orqali
+tahrirlanadi. Dvigatel ularni bitta umumiy regexga kompilyatsiya qiladi,
+har bir qoida uchun ishlash soni (hits) va o'rtacha narxini (cost) hisoblaydi.
+"""
+import re
+import time
+import logging
+from collections import defaultdict
+from itertools import product
+from typing import Dict, List, Optional, Set
+from database.db import Database, get_db
+import config
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+logger = logging.getLogger(__name__)
+
+# Qoida turlari:
+#   regex   - tozalangan kichik harfli matnda qidiriladi
+#   keyword - oddiy so'z/ibora (kichik harfli matnda)
+#   exact   - tozalangan (registr saqlangan) matnga to'liq mos kelishi kerak
+#   spaced  - barcha bo'shliqlar olib tashlangan matnda qidiriladi
+#   emoji   - matn emojiga to'la bo'lsa va pattern topilsa
+RULE_KINDS = ('regex', 'keyword', 'exact', 'spaced', 'emoji')
+
+# Qoida doirasi: 'group' - guruhlardagi anti-spam, 'strict' - qo'shimcha qat'iy qoidalar
+RULE_SCOPES = ('group', 'strict')
+
+_ZERO_WIDTH_RE = re.compile(r'[\u200b\u200c\u200d\u2060\ufeff]')
+_WHITESPACE_RE = re.compile(r'\s+')
+_EMOJI_RE = re.compile(
+    "["
+    "\U0001F600-\U0001F64F"  # emoticons
+    "\U0001F300-\U0001F5FF"  # symbols & pictographs
+    "\U0001F680-\U0001F6FF"  # transport & map
+    "\U0001F1E0-\U0001F1FF"  # flags
+    "\U00002702-\U000027B0"  # dingbats
+    "\U000024C2-\U0001F251"  # enclosed characters
+    "\U0001F900-\U0001F9FF"  # supplemental symbols
+    "\U0001FA00-\U0001FA6F"  # chess symbols
+    "\U0001FA70-\U0001FAFF"  # symbols and pictographs extended-A
+    "\U00002600-\U000026FF"  # miscellaneous symbols
+    "\U00002700-\U000027BF"  # dingbats
+    "]+",
+    flags=re.UNICODE
+)
+
+# Oddiy yozishmada kam uchraydigan belgilar (raqam, @, havola va emoji belgilar).
+# Bunday belgi bo'lmasa, shu belgilarni talab qiladigan qoidalar tekshirilmaydi
+_GATE_CHARS = "0123456789@/:+%_[]₩¥$€£"
+_GATE_RE = re.compile("[" + re.escape(_GATE_CHARS) + _EMOJI_RE.pattern[1:-2] + "]")
+
+# Literallarni kombinatsiya qilishda to'plam hajmi chegarasi
+_MAX_ANCHOR_SET = 64
+
+
+def _rule(name: str, pattern: str, kind: str = 'regex', requires: str | None = None, scope: str = 'group') -> Dict:
+    return {'name': name, 'kind': kind, 'pattern': pattern, 'requires': requires, 'scope': scope}
+
+
+# Standart qoidalar (birinchi ishga tushirishda bazaga yoziladi)
+DEFAULT_AD_RULES: List[Dict] = [
+    # 1. & 15. Ochiq linkli va tashqi sayt reklamalari
+    _rule("Havola: http(s)://", r"https?://"),
+    _rule("Havola: t.me/", r"t\.me/"),
+    _rule("Havola: telegram.me/", r"telegram\.me/"),
+    _rule("Havola: t.me", r"\bt\.me\b"),
+    _rule("Havola: joinchat", r"joinchat"),
+    _rule("Havola: domen", r"\.(com|uz|ru|org|net|info|io|me|co|tk|ml|ga|cf|site|online|store|shop|xyz|click|link|club|live|life|world|space|tech|website|email)\b"),
+    _rule("Havola: qisqartirgich", r"bit\.ly|goo\.gl|tinyurl\.com|clck\.ru"),
+    # Username (@username)
+    _rule("Username", r"@[a-zA-Z0-9_]{4,}"),
+    # 3. So'z bilan yozilgan link (aldov)
+    _rule("Yashirin havola: t me", r"t\s*me"),
+    _rule("Yashirin havola: telegram me", r"telegram\s*me"),
+    _rule("Yashirin havola: t[dot]me", r"t\s*\[\s*dot\s*\]\s*me"),
+    _rule("Yashirin havola: telegram nuqta me", r"telegram\s*nuqta\s*me"),
+    _rule("Yashirin havola: t . me", r"t\s*\.\s*me"),
+    _rule("Yashirin havola: dot me", r"dot\s*me"),
+    _rule("Yashirin havola: nuqta me", r"nuqta\s*me"),
+    # 4. Emoji orqali yashirilgan reklama
+    _rule("Emoji + kanal/link", r"kanal|link|kirish|obuna|pul|click", kind='emoji'),
+    # 7. & 16. "Oddiy gap" va "Reklama emas" aldovi (kanal/link so'zi bilan birga)
+    _rule("Semantik: reklama emas", r"reklama\s*emas", requires=r"kanal|link|guruh|bot|sayt"),
+    _rule("Semantik: faqat maslahat", r"faqat\s*maslahat", requires=r"kanal|link|guruh|bot|sayt"),
+    _rule("Semantik: tavsiya qilaman", r"tavsiya\s*qilaman", requires=r"kanal|link|guruh|bot|sayt"),
+    _rule("Semantik: kanal topdim", r"kanal\s*topdim", requires=r"kanal|link|guruh|bot|sayt"),
+    _rule("Semantik: zo'r kanal", r"zo'?r\s*kanal", requires=r"kanal|link|guruh|bot|sayt"),
+    _rule("Semantik: hamma kiryapti", r"hamma\s*kiryapti", requires=r"kanal|link|guruh|bot|sayt"),
+    _rule("Semantik: pul ishlayapti", r"pul\s*ishlayapti", requires=r"kanal|link|guruh|bot|sayt"),
+    _rule("Semantik: men topdim", r"men\s*topdim", requires=r"kanal|link|guruh|bot|sayt"),
+    _rule("Semantik: sinab ko'ring", r"sinab\s*ko'?ring", requires=r"kanal|link|guruh|bot|sayt"),
+    _rule("Semantik: o'tib oling", r"o'?tib\s*oling", requires=r"kanal|link|guruh|bot|sayt"),
+    _rule("Semantik: kirib ko'ring", r"kirib\s*ko'?ring", requires=r"kanal|link|guruh|bot|sayt"),
+    # 8. Savol shaklidagi reklama
+    _rule("Savol: pul ishlamoqchimisiz", r"pul\s*ishla(moqchi|shni)\s*misiz", requires=r"kanal|bot|link"),
+    _rule("Savol: kanal bilasizmi", r"kanal\s*bilasizmi", requires=r"kanal|bot|link"),
+    _rule("Savol: kimda bor", r"kimda\s*bor", requires=r"kanal|bot|link"),
+    _rule("Savol: qayerdan topsa bo'ladi", r"qayerdan\s*topsa\s*bo'?ladi", requires=r"kanal|bot|link"),
+    # 11. Faqat kanal nomi (masalan: ABC_KANAL)
+    _rule("Kanal nomi: @NOM", r"@[A-Z0-9_]+", kind='exact'),
+    _rule("Kanal nomi: NOM_KANAL", r"[A-Z0-9_]{5,}_(CHANNEL|KANAL|TV|OFFICIAL)", kind='exact'),
+    # 12. "Admin ruxsat berdi" aldovi
+    _rule("Admin ruxsat berdi", r"admin", requires=r"^(?=.*(?:ruxsat|kelishil)).*(?:kanal|reklama)"),
+    # 13. Giveaway / konkurs
+    _rule("Giveaway / konkurs", r"yutib ol|sovrin|konkurs|giveaway|obuna bo'ling|qatnashing|shartlar|g'olib",
+          requires=r"kanal|obuna"),
+    # 14. Bot reklamalari
+    _rule("Bot reklamasi", r"bot", requires=r"start|foydalan|kiring"),
+    _rule("Bot username", r"@[a-zA-Z0-9_]+bot\b"),
+    # 10. Umumiy reklama iboralari
+    *[_rule(f"Kalit so'z: {k}", k, kind='keyword') for k in [
+        "reklama", "sotiladi", "aksiya", "chegirma", "arzon", "sifatli",
+        "dostavka", "yetkazib berish", "xizmati", "click here", "buy now",
+        "limited offer", "exclusive", "crypto", "bitcoin", "invest",
+        "daromad", "biznes", "online ish", "uydan ish"
+    ]],
+    # 9. Bo'shliqlar bilan ajratilgan havola (t . m e / a b c)
+    _rule("Bo'shliqli havola: t.me/", r"t\.me/", kind='spaced'),
+    _rule("Bo'shliqli havola: telegram.me", r"telegram\.me", kind='spaced'),
+
+    # Qat'iy rejim (books.py dagi eski tekshiruvdan)
+    _rule("Qat'iy: invite kodi", r"\+[a-zA-Z0-9_-]{10,}", scope='strict'),
+    _rule("Qat'iy: telefon raqami", r"\b\d{2,3}[-\s]??\d{2,3}[-\s]??\d{2}[-\s]?\d{2}\b", scope='strict'),
+    _rule("Qat'iy: uzun raqam", r"\b\d{7,}\b", scope='strict'),
+    _rule("Qat'iy: foiz", r"\b\d+%\b", scope='strict'),
+    _rule("Qat'iy: valyuta belgisi", r"[₩¥$€£]", scope='strict'),
+    *[_rule(f"Qat'iy kalit so'z: {k}", k, kind='keyword', scope='strict') for k in [
+        "sotuv", "bonus", "kurs", "dars", "kanalimizda",
+        "murojaat uchun", "bog'lanish uchun", "obuna", "promo",
+        "skidka", "akciya", "rasprodaja", "скидка", "акция",
+        "реклама", "подпишитесь", "subscribe", "join our channel"
+    ]],
+]
+
+
+def count_emojis(text: str) -> int:
+    """Matndagi emoji sonini hisoblash"""
+    if not text:
+        return 0
+    return sum(len(e) for e in _EMOJI_RE.findall(text))
+
+
+def normalize_text(text: str) -> tuple[str, str]:
+    """Zero-width belgilar va ortiqcha bo'shliqlarni tozalash: (clean_text, text_lower)"""
+    clean_text = _ZERO_WIDTH_RE.sub('', text)
+    clean_text = _WHITESPACE_RE.sub(' ', clean_text).strip()
+    return clean_text, clean_text.lower()
+
+
+def compile_rule_pattern(kind: str, pattern: str) -> re.Pattern:
+    """Qoida patternini kompilyatsiya qilish (noto'g'ri bo'lsa re.error)"""
+    if kind == 'keyword':
+        return re.compile(re.escape(pattern.lower()))
+    return re.compile(pattern)
+
+
+def _is_combinable(rule: Dict) -> bool:
+    """Qoidani umumiy regexga qo'shish mumkinmi (nomli guruh/backref bo'lmasa)"""
+    if rule['kind'] not in ('regex', 'keyword') or rule.get('requires'):
+        return False
+    if rule['kind'] == 'keyword':
+        return True
+    pattern = rule['pattern']
+    # Nomli guruhlar, backref va global flaglar umumiy regexni buzadi
+    if '(?P' in pattern or re.search(r'\\\d', pattern) or re.search(r'\(\?[aiLmsux]+\)', pattern):
+        return False
+    try:
+        return not re.compile(pattern).groupindex
+    except re.error:
+        return False
+
+
+def _class_chars(items) -> Optional[Set[str]]:
+    """[...] belgi sinfidagi belgilar (kichik va inkorsiz bo'lsa), aks holda None"""
+    chars = set()
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            chars.add(chr(av))
+        elif op is sre_parse.RANGE and av[1] - av[0] < 16:
+            chars.update(chr(c) for c in range(av[0], av[1] + 1))
+        elif op is sre_parse.CATEGORY and av is sre_parse.CATEGORY_DIGIT:
+            chars.update("0123456789")
+        else:
+            return None
+    return chars
+
+
+def _exact_strings(items) -> Optional[Set[str]]:
+    """Pattern bo'lagi moslashi mumkin bo'lgan barcha satrlar (cheklangan literal bo'lsa), aks holda None"""
+    result = {''}
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            options = {chr(av)}
+        elif op is sre_parse.IN:
+            options = _class_chars(av)
+        elif op is sre_parse.BRANCH:
+            options = set()
+            for alternative in av[1]:
+                alt = _exact_strings(alternative)
+                if alt is None:
+                    return None
+                options |= alt
+        elif op is sre_parse.SUBPATTERN:
+            options = _exact_strings(av[-1])
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[1] <= 1:
+            options = _exact_strings(av[2])
+            if options is not None and av[0] == 0:
+                options = options | {''}
+        elif op is sre_parse.AT:
+            continue
+        else:
+            return None
+        if options is None or len(result) * len(options) > _MAX_ANCHOR_SET:
+            return None
+        result = {a + b for a, b in product(result, options)}
+    return result
+
+
+def _anchor_weight(anchor: str) -> int:
+    """Anchor qanchalik kam uchraydi: uzunroq va "gate" belgili anchorlar afzal"""
+    return sum(3 if ch in _GATE_CHARS else 1 for ch in anchor)
+
+
+def _required_literals(items) -> Optional[Set[str]]:
+    """
+    Har qanday moslikda (yoki lookahead orqali matnda) albatta uchraydigan
+    satrlar to'plami: ulardan kamida bittasi matnda bo'lishi shart. Topilmasa None.
+    """
+    candidates = []
+    run: Set[str] = {''}
+
+    def flush():
+        nonlocal run
+        if '' not in run:
+            candidates.append(run)
+        run = {''}
+
+    for op, av in items:
+        exact = _exact_strings([(op, av)])
+        if exact is not None and len(run) * len(exact) <= _MAX_ANCHOR_SET:
+            run = {a + b for a, b in product(run, exact)}
+            continue
+        flush()
+        if exact is not None:
+            run = exact
+            continue
+        if op is sre_parse.SUBPATTERN or op is sre_parse.ATOMIC_GROUP:
+            sub = _required_literals(av[-1] if op is sre_parse.SUBPATTERN else av)
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, sre_parse.POSSESSIVE_REPEAT):
+            sub = _required_literals(av[2]) if av[0] >= 1 else None
+        elif op is sre_parse.BRANCH:
+            sub = set()
+            for alternative in av[1]:
+                alt = _required_literals(alternative)
+                if alt is None:
+                    sub = None
+                    break
+                sub |= alt
+        elif op is sre_parse.ASSERT:
+            # Ijobiy lookahead/lookbehind ichidagi matn ham matnda bo'lishi shart
+            sub = _required_literals(av[1])
+        else:
+            sub = None
+        if sub:
+            candidates.append(sub)
+    flush()
+    if not candidates:
+        return None
+    return max(candidates, key=lambda c: (min(_anchor_weight(a) for a in c), -len(c)))
+
+
+def rule_anchors(kind: str, pattern: re.Pattern) -> Optional[Set[str]]:
+    """
+    Qoida ishlashi uchun kichik harfli matnda bo'lishi shart bo'lgan satrlar.
+    None - qoidani arzon usulda rad etib bo'lmaydi (har doim to'liq tekshiruv).
+    """
+    try:
+        anchors = _required_literals(sre_parse.parse(pattern.pattern, pattern.flags))
+    except Exception:
+        return None
+    if not anchors:
+        return None
+    anchors = {a.lower() for a in anchors}
+    if kind == 'spaced':
+        # Bo'shliqsiz matnda qidiriladi: asl matnda faqat alohida belgilar kafolatlangan
+        anchors = {max(a, key=lambda ch: (ch in _GATE_CHARS, not ch.isalpha())) for a in anchors}
+    if any(not a or a.isspace() for a in anchors):
+        return None
+    return anchors
+
+
+class _Prefilter:
+    """
+    Arzon oldindan tekshiruv: bitta O(n) belgi sinfi skani va literal anchorlar.
+    Hech bir qoidaning anchori topilmasa, matn reklama emasligi aniq.
+    """
+
+    def __init__(self, anchors: Optional[Set[str]]):
+        self.enabled = anchors is not None
+        anchors = anchors or set()
+        plain = sorted((a for a in anchors if not _GATE_RE.search(a)), key=len, reverse=True)
+        everything = sorted(anchors, key=len, reverse=True)
+        self.plain_re = re.compile('|'.join(map(re.escape, plain))) if plain else None
+        self.all_re = re.compile('|'.join(map(re.escape, everything))) if everything else None
+
+    def may_match(self, text_lower: str) -> bool:
+        """False bo'lsa hech qaysi qoida ishlamaydi"""
+        if not self.enabled:
+            return True
+        anchors_re = self.all_re if _GATE_RE.search(text_lower) else self.plain_re
+        return anchors_re is not None and anchors_re.search(text_lower) is not None
+
+
+class _Matcher:
+    """Bitta doira (scope) uchun kompilyatsiya qilingan qoidalar"""
+
+    def __init__(self, rules: List[Dict]):
+        self.combined: Optional[re.Pattern] = None
+        self.single: List[tuple] = []  # (rule_id, kind, pattern, requires)
+        self.uses_spaced = False
+        self.uses_emoji = False
+
+        parts = []
+        anchors: Optional[Set[str]] = set()
+        for rule in rules:
+            try:
+                pattern = compile_rule_pattern(rule['kind'], rule['pattern'])
+                requires = re.compile(rule['requires']) if rule.get('requires') else None
+            except re.error as e:
+                logger.warning(f"Reklama qoidasi #{rule['id']} kompilyatsiya qilinmadi: {e}")
+                continue
+            rule_anchor_set = rule_anchors(rule['kind'], pattern)
+            if rule_anchor_set is None:
+                anchors = None
+            elif anchors is not None:
+                anchors |= rule_anchor_set
+            if _is_combinable(rule):
+                parts.append(f"(?P<r{rule['id']}>{pattern.pattern})")
+            else:
+                self.single.append((rule['id'], rule['kind'], pattern, requires))
+                self.uses_spaced = self.uses_spaced or rule['kind'] == 'spaced'
+                self.uses_emoji = self.uses_emoji or rule['kind'] == 'emoji'
+        if parts:
+            self.combined = re.compile('|'.join(parts))
+        self.prefilter = _Prefilter(anchors)
+
+    def match(self, clean_text: str, text_lower: str) -> Optional[int]:
+        """Birinchi ishlagan qoida ID sini qaytarish"""
+        if self.combined:
+            m = self.combined.search(text_lower)
+            if m:
+                return int(m.lastgroup[1:])
+
+        spaced_text = _WHITESPACE_RE.sub('', text_lower) if self.uses_spaced else ''
+        emoji_heavy = False
+        if self.uses_emoji:
+            emoji_count = count_emojis(clean_text)
+            text_len = len(clean_text.replace(' ', ''))
+            emoji_heavy = text_len > 0 and (emoji_count / text_len > 0.4 or emoji_count > 8)
+
+        for rule_id, kind, pattern, requires in self.single:
+            if _rule_matches(kind, pattern, requires, clean_text, text_lower, spaced_text, emoji_heavy):
+                return rule_id
+        return None
+
+
+def _rule_matches(kind: str, pattern: re.Pattern, requires: Optional[re.Pattern],
+                  clean_text: str, text_lower: str, spaced_text: str, emoji_heavy: bool) -> bool:
+    if kind == 'exact':
+        matched = pattern.fullmatch(clean_text) is not None
+    elif kind == 'spaced':
+        matched = pattern.search(spaced_text) is not None
+    elif kind == 'emoji':
+        matched = emoji_heavy and pattern.search(text_lower) is not None
+    else:
+        matched = pattern.search(text_lower) is not None
+    if matched and requires is not None:
+        matched = requires.search(text_lower) is not None
+    return matched
+
+
+class AdRuleEngine:
+    """Ma'lumotlar bazasidagi qoidalar asosida reklama aniqlovchi (hot-reload bilan)"""
+
+    def __init__(self, db: Optional[Database] = None):
+        self._db = db
+        self.rules: Dict[int, Dict] = {}
+        self._matchers: Optional[Dict[str, _Matcher]] = None
+        self._compiled: Dict[int, tuple] = {}
+        self._signature = None
+        self._last_refresh = 0.0
+        self._evaluations = 0
+        self._pending_hits: Dict[int, int] = defaultdict(int)
+        self._pending_cost: Dict[int, int] = defaultdict(int)
+        self._pending_samples: Dict[int, int] = defaultdict(int)
+        # Bosqichlar: empty - bo'sh matn, cleared - oldindan tekshiruvda tozalandi,
+        # full - to'liq qoidalar tekshiruvi, matched - reklama topildi
+        self.tier_stats = {'empty': 0, 'cleared': 0, 'full': 0, 'matched': 0}
+
+    @property
+    def db(self) -> Database:
+        if self._db is None:
+            self._db = get_db()
+        return self._db
+
+    def load(self):
+        """Qoidalarni bazadan o'qish va kompilyatsiya qilish"""
+        self.db.seed_ad_rules(DEFAULT_AD_RULES)
+        rules = self.db.get_ad_rules(include_disabled=False)
+        self.rules = {rule['id']: rule for rule in rules}
+        group_rules = [r for r in rules if r['scope'] == 'group']
+        self._matchers = {
+            'group': _Matcher(group_rules),
+            'strict': _Matcher(rules),
+        }
+        self._compiled = {}
+        for rule in rules:
+            try:
+                self._compiled[rule['id']] = (
+                    rule['kind'],
+                    compile_rule_pattern(rule['kind'], rule['pattern']),
+                    re.compile(rule['requires']) if rule.get('requires') else None,
+                )
+            except re.error:
+                continue
+        self._signature = self.db.get_ad_rules_signature()
+        self._last_refresh = time.monotonic()
+        logger.info(f"Reklama qoidalari yuklandi: {len(rules)} ta faol qoida")
+
+    def reload(self):
+        """Statistikani saqlab, qoidalarni qayta yuklash (admin tahriridan keyin)"""
+        self.flush_stats()
+        self.load()
+
+    def refresh_if_due(self):
+        """Belgilangan vaqt o'tgan bo'lsa statistikani saqlash va o'zgarishlarni tekshirish"""
+        if time.monotonic() - self._last_refresh < config.AD_RULES_RELOAD_INTERVAL:
+            return
+        self._last_refresh = time.monotonic()
+        try:
+            self.flush_stats()
+            if self.db.get_ad_rules_signature() != self._signature:
+                self.load()
+        except Exception as e:
+            logger.error(f"Reklama qoidalarini yangilashda xatolik: {e}")
+
+    def flush_stats(self):
+        """Xotiradagi hisoblagichlarni bazaga yozish"""
+        rule_ids = set(self._pending_hits) | set(self._pending_samples)
+        if not rule_ids:
+            return
+        stats = [
+            (self._pending_hits.get(rule_id, 0), self._pending_cost.get(rule_id, 0),
+             self._pending_samples.get(rule_id, 0), rule_id)
+            for rule_id in rule_ids
+        ]
+        self._pending_hits.clear()
+        self._pending_cost.clear()
+        self._pending_samples.clear()
+        self.db.add_ad_rule_stats(stats)
+
+    def match(self, text: str, strict: bool = False) -> Optional[int]:
+        """Matn reklama bo'lsa ishlagan qoida ID sini, aks holda None qaytarish"""
+        if not text:
+            self.tier_stats['empty'] += 1
+            return None
+        if self._matchers is None:
+            self.load()
+        else:
+            self.refresh_if_due()
+
+        clean_text, text_lower = normalize_text(text)
+        self._evaluations += 1
+        if config.AD_RULES_PROFILE_EVERY and self._evaluations % config.AD_RULES_PROFILE_EVERY == 0:
+            self._profile(clean_text, text_lower, strict)
+
+        matcher = self._matchers['strict' if strict else 'group']
+        if not matcher.prefilter.may_match(text_lower):
+            self.tier_stats['cleared'] += 1
+            return None
+        self.tier_stats['full'] += 1
+        rule_id = matcher.match(clean_text, text_lower)
+        if rule_id is not None:
+            self.tier_stats['matched'] += 1
+            self._pending_hits[rule_id] += 1
+        return rule_id
+
+    def _profile(self, clean_text: str, text_lower: str, strict: bool):
+        """Har bir qoidani alohida o'lchash (narxi yuqori va kam ishlaydigan qoidalarni topish uchun)"""
+        spaced_text = _WHITESPACE_RE.sub('', text_lower)
+        emoji_count = count_emojis(clean_text)
+        text_len = len(clean_text.replace(' ', ''))
+        emoji_heavy = text_len > 0 and (emoji_count / text_len > 0.4 or emoji_count > 8)
+        for rule_id, (kind, pattern, requires) in self._compiled.items():
+            if not strict and self.rules[rule_id]['scope'] != 'group':
+                continue
+            started = time.perf_counter_ns()
+            _rule_matches(kind, pattern, requires, clean_text, text_lower, spaced_text, emoji_heavy)
+            self._pending_cost[rule_id] += time.perf_counter_ns() - started
+            self._pending_samples[rule_id] += 1
+
+
+engine = AdRuleEngine()
+
+
+def contains_advertisement(text: str, strict: bool = False) -> bool:
+    """Matnda reklama borligini tekshirish (strict=True bo'lsa qat'iy qoidalar ham qo'llanadi)"""
+    return engine.match(text, strict=strict) is not None
@@ -0,0 +1,122 @@
+"""
+/top va /new uchun tayyor (materialized) kitob ro'yxatlari
+
+Ro'yxatlar ishga tushishda bir marta indeks bo'yicha yuklanadi, keyin faqat
+qisman yangilanadi: /top - hisoblagichlar bazaga yozilganda kelgan
+yuklab olishlar bo'yicha (ro'yxatda yo'q kitoblar ID bo'yicha o'qiladi),
+/new - har BOOK_LISTS_REFRESH_INTERVAL soniyada "id > oxirgi ID" so'rovi
+bilan. Ko'rish xotiradan beriladi, jadval o'qilmaydi. Kitob o'chirilsa
+ro'yxatlar keyingi murojaatda qayta yuklanadi.
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional
+from database.db import Database, get_db
+from utils.popularity import counters as popularity
+import config
+
+logger = logging.getLogger(__name__)
+
+LIST_NAMES = ('top', 'new')
+
+
+def _top_key(book: Dict):
+    return (-book['downloads'], book['id'])
+
+
+def _new_key(book: Dict):
+    return (book['upload_date'] or '', book['id'])
+
+
+class BookLists:
+    """'top' (yuklab olishlar bo'yicha) va 'new' (qo'shilgan sana bo'yicha) ro'yxatlari"""
+
+    def __init__(self, db: Optional[Database] = None, size: Optional[int] = None):
+        self._db = db
+        self.size = size or config.BOOK_LISTS_SIZE
+        self._lists: Dict[str, List[Dict]] = {name: [] for name in LIST_NAMES}
+        self._last_id = 0
+        self._loaded = False
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {'loads': 0, 'top_updates': 0, 'new_books': 0, 'views': 0}
+
+    @property
+    def db(self) -> Database:
+        if self._db is None:
+            self._db = get_db()
+        return self._db
+
+    def load(self):
+        """Ro'yxatlarni bazadan to'liq yuklash"""
+        self._last_id = self.db.get_last_book_id()
+        self._lists['top'] = self.db.get_top_books(self.size)
+        self._lists['new'] = self.db.get_new_books(self.size)
+        self._loaded = True
+        self.stats['loads'] += 1
+
+    def get(self, name: str) -> List[Dict]:
+        """Ro'yxat (kitoblarning qisqa ma'lumotlari, tartiblangan)"""
+        if not self._loaded:
+            self.load()
+        self.stats['views'] += 1
+        return self._lists[name]
+
+    def apply_downloads(self, downloads: Dict[int, int]):
+        """Bazaga yozilgan yuklab olishlarni /top ro'yxatiga qo'shish"""
+        if not self._loaded:
+            return
+        top = {book['id']: dict(book) for book in self._lists['top']}
+        missing = []
+        for book_id, count in downloads.items():
+            if book_id in top:
+                top[book_id]['downloads'] += count
+            else:
+                missing.append(book_id)
+        # Ro'yxatdan tashqaridagi kitoblarning jami soni bazada (yozish allaqachon bo'lgan)
+        for book in self.db.get_books_by_ids(missing) if missing else []:
+            top[book['id']] = book
+        self._lists['top'] = sorted(top.values(), key=_top_key)[:self.size]
+        self.stats['top_updates'] += 1
+
+    def refresh_new(self):
+        """Oxirgi tekshiruvdan keyin qo'shilgan kitoblarni ro'yxatlarga qo'shish"""
+        if not self._loaded:
+            self.load()
+            return
+        added = self.db.get_books_after(self._last_id)
+        if not added:
+            return
+        self._last_id = added[-1]['id']
+        self._lists['new'] = sorted(self._lists['new'] + added, key=_new_key, reverse=True)[:self.size]
+        if len(self._lists['top']) < self.size:
+            self._lists['top'] = sorted(self._lists['top'] + added, key=_top_key)[:self.size]
+        self.stats['new_books'] += len(added)
+
+    def book_deleted(self, book_id: int):
+        """Kitob o'chirildi: bo'shagan o'rinlar uchun ro'yxatlar qayta yuklanadi"""
+        if any(book['id'] == book_id for name in LIST_NAMES for book in self._lists[name]):
+            self._loaded = False
+
+    async def start(self):
+        """Ro'yxatlarni yuklash va yangi kitoblarni davriy tekshirish"""
+        self.load()
+        popularity.add_listener(self.apply_downloads)
+        self._task = asyncio.create_task(self._run(), name="book-lists-refresh")
+
+    async def stop(self):
+        popularity.remove_listener(self.apply_downloads)
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(config.BOOK_LISTS_REFRESH_INTERVAL)
+            try:
+                self.refresh_new()
+            except Exception as e:
+                logger.error(f"Kitob ro'yxatlarini yangilashda xatolik: {e}")
+
+
+lists = BookLists()
@@ -0,0 +1,65 @@
+"""
+Kitoblar uchun deep link lar: t.me/<bot>?start=b<kod>
+
+Kod - kitob ID si va uning HMAC imzosi (base64url, ID 16 mln gacha bo'lsa 13 belgi).
+Imzo ID larni ketma-ket terib chiqishga (enumeration) yo'l qo'ymaydi. Kalit -
+DEEP_LINK_SECRET, o'rnatilmagan bo'lsa BOT_TOKEN dan olinadi (token almashsa
+eski havolalar ishlamay qoladi).
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+from typing import Optional
+from urllib.parse import quote
+from aiogram.types import InlineKeyboardButton
+import config
+
+BOOK_PREFIX = 'b'
+_TAG_SIZE = 6
+_MAX_ID_BYTES = 8
+
+
+def _secret() -> bytes:
+    if config.DEEP_LINK_SECRET:
+        return config.DEEP_LINK_SECRET.encode()
+    return hashlib.sha256(f"deep-link:{config.BOT_TOKEN}".encode()).digest()
+
+
+def _tag(id_bytes: bytes) -> bytes:
+    return hmac.new(_secret(), BOOK_PREFIX.encode() + id_bytes, hashlib.sha256).digest()[:_TAG_SIZE]
+
+
+def encode_book(book_id: int) -> str:
+    """Kitob ID si -> start payload (b + base64url)"""
+    id_bytes = book_id.to_bytes(max(1, (book_id.bit_length() + 7) // 8), 'big')
+    code = base64.urlsafe_b64encode(id_bytes + _tag(id_bytes)).rstrip(b'=').decode()
+    return f"{BOOK_PREFIX}{code}"
+
+
+def decode_book(payload: Optional[str]) -> Optional[int]:
+    """start payload -> kitob ID si (imzo noto'g'ri bo'lsa None)"""
+    if not payload or not payload.startswith(BOOK_PREFIX):
+        return None
+    code = payload[len(BOOK_PREFIX):]
+    try:
+        raw = base64.urlsafe_b64decode(code + '=' * (-len(code) % 4))
+    except (binascii.Error, ValueError):
+        return None
+    id_bytes, tag = raw[:-_TAG_SIZE], raw[-_TAG_SIZE:]
+    if not 1 <= len(id_bytes) <= _MAX_ID_BYTES or not hmac.compare_digest(tag, _tag(id_bytes)):
+        return None
+    return int.from_bytes(id_bytes, 'big')
+
+
+def book_link(bot_username: str, book_id: int) -> str:
+    return f"https://t.me/{bot_username}?start={encode_book(book_id)}"
+
+
+def share_button(bot_username: str, book: dict) -> InlineKeyboardButton:
+    """Telegram ning "ulashish" oynasini ochadigan tugma (kitob havolasi bilan)"""
+    link = book_link(bot_username, book['id'])
+    return InlineKeyboardButton(
+        text="🔗 Ulashish",
+        url=f"https://t.me/share/url?url={quote(link, safe='')}&text={quote(book['title'], safe='')}"
+    )
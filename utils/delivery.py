@@ -0,0 +1,273 @@
+"""
+Qismli kitoblarni yuborish navbati
+
+Yuborish vazifalari delivery_jobs jadvalida saqlanadi va fon ishchilari
+(worker pool) tomonidan bajariladi. Har bir albom/qismdan keyin progress
+yoziladi, shuning uchun bot qayta ishga tushganda vazifa to'xtagan joyidan
+davom etadi. Foydalanuvchiga bitta status xabari ko'rsatiladi va u
+DELIVERY_STATUS_INTERVAL soniyada ko'pi bilan bir marta yangilanadi.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import List, Optional
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import InputMediaDocument, InputMediaAudio
+from database.db import Database, get_db
+from utils.formatting import TextBuilder
+from utils.render_cache import cache as render_cache
+from utils.telegram_methods import CopyMessages, COPY_MESSAGES_LIMIT
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def _part_storage_chat(book: dict, file: dict):
+    """Qism saqlangan kanal (fayl, kitob yoki config dan)"""
+    return file.get('storage_chat_id') or book.get('storage_chat_id') or config.STORAGE_CHANNEL_ID
+
+def _plan_part_batches(book: dict, files: list, start: int = 0) -> list:
+    """
+    Qismlarni yuborish uchun guruhlash: [(tur, [(idx, file), ...]), ...]
+    tur: 'album' (sendMediaGroup), 'copy' (copyMessages) yoki 'single'.
+    start - allaqachon yuborilgan qismlar soni (davom ettirish uchun)
+    """
+    parts = list(enumerate(files, 1))[start:]
+    mode = config.MULTI_PART_DELIVERY_MODE
+    batches = []
+    if mode == 'copy':
+        # Bir kanaldagi ketma-ket (o'suvchi ID li) xabarlar bitta copyMessages bilan nusxalanadi
+        run = []
+        for idx, file in parts:
+            message_id = file.get('storage_message_id')
+            if run and (
+                not message_id
+                or _part_storage_chat(book, file) != _part_storage_chat(book, run[-1][1])
+                or message_id <= run[-1][1]['storage_message_id']
+                or len(run) >= COPY_MESSAGES_LIMIT
+            ):
+                batches.append(('copy' if len(run) > 1 else 'single', run))
+                run = []
+            if message_id and _part_storage_chat(book, file):
+                run.append((idx, file))
+            else:
+                batches.append(('single', [(idx, file)]))
+        if run:
+            batches.append(('copy' if len(run) > 1 else 'single', run))
+    elif mode == 'album':
+        size = max(2, min(10, config.MEDIA_GROUP_SIZE))
+        for i in range(0, len(parts), size):
+            chunk = parts[i:i + size]
+            batches.append(('album' if len(chunk) > 1 else 'single', chunk))
+    else:
+        batches = [('single', [part]) for part in parts]
+    return batches
+
+async def _send_part_single(bot, chat_id: int, book: dict, file: dict, file_type: str, caption: str, caption_entities: list):
+    """Bitta qismni yuborish (ombor kanalidan nusxa, bo'lmasa file_id orqali)"""
+    from_chat = _part_storage_chat(book, file)
+    storage_message_id = file.get('storage_message_id')
+    if storage_message_id and from_chat:
+        try:
+            await bot.copy_message(
+                chat_id=chat_id,
+                from_chat_id=from_chat,
+                message_id=storage_message_id,
+                caption=caption,
+                caption_entities=caption_entities
+            )
+            return
+        except TelegramRetryAfter:
+            raise
+        except Exception:
+            # Agar copy_message ishlamasa, file_id orqali yuboramiz
+            pass
+    if file_type == 'document':
+        await bot.send_document(chat_id=chat_id, document=file['file_id'], caption=caption, caption_entities=caption_entities)
+    else:
+        await bot.send_audio(chat_id=chat_id, audio=file['file_id'], caption=caption, caption_entities=caption_entities)
+
+async def _send_part_batch(bot, chat_id: int, book: dict, kind: str, batch: list, file_type: str, total: int):
+    """Qismlar guruhini bitta so'rov bilan yuborish"""
+    if kind == 'album':
+        media_type = InputMediaDocument if file_type == 'document' else InputMediaAudio
+        media = []
+        for idx, file in batch:
+            caption, entities = render_cache.part_caption(book, idx, total)
+            media.append(media_type(media=file['file_id'], caption=caption, caption_entities=entities))
+        await bot.send_media_group(chat_id=chat_id, media=media)
+    elif kind == 'copy':
+        await bot(CopyMessages(
+            chat_id=chat_id,
+            from_chat_id=_part_storage_chat(book, batch[0][1]),
+            message_ids=[file['storage_message_id'] for _, file in batch]
+        ))
+    else:
+        idx, file = batch[0]
+        await _send_part_single(bot, chat_id, book, file, file_type, *render_cache.part_caption(book, idx, total))
+
+
+class DeliveryQueue:
+    """Doimiy (SQLite) yuborish navbati va ishchilar to'plami"""
+
+    def __init__(self, db: Optional[Database] = None):
+        self._db = db
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+        self._bot: Optional[Bot] = None
+        self.stats = {'submitted': 0, 'deduplicated': 0, 'resumed': 0, 'done': 0, 'failed': 0}
+
+    @property
+    def db(self) -> Database:
+        if self._db is None:
+            self._db = get_db()
+        return self._db
+
+    @property
+    def depth(self) -> int:
+        """Navbatda kutayotgan vazifalar soni"""
+        return self._queue.qsize()
+
+    async def start(self, bot: Bot):
+        """Ishchilarni ishga tushirish va tugallanmagan vazifalarni navbatga qaytarish"""
+        self._bot = bot
+        for job in self.db.get_unfinished_delivery_jobs():
+            self._queue.put_nowait(job['id'])
+            self.stats['resumed'] += 1
+        if self.stats['resumed']:
+            logger.info(f"Tugallanmagan {self.stats['resumed']} ta yuborish vazifasi davom ettiriladi")
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"delivery-worker-{i}")
+            for i in range(max(1, config.DELIVERY_WORKERS))
+        ]
+
+    async def stop(self):
+        """Ishchilarni to'xtatish (bajarilayotgan vazifalar keyingi ishga tushishda davom etadi)"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, user_id: int, chat_id: int, book_id: int, file_type: str, total: int) -> tuple:
+        """Vazifa qo'shish: (job_id, created). Takroriy bosishda created=False."""
+        job_id, created = self.db.create_delivery_job(user_id, chat_id, book_id, file_type, total)
+        if created:
+            self.stats['submitted'] += 1
+            self._queue.put_nowait(job_id)
+        else:
+            self.stats['deduplicated'] += 1
+        return job_id, created
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Yuborish vazifasi #{job_id} xatolik bilan tugadi: {e}")
+                self.db.update_delivery_job(job_id, status='failed', error=str(e))
+                self.stats['failed'] += 1
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: int):
+        """Bitta vazifani bajarish (yoki to'xtagan joyidan davom ettirish)"""
+        bot = self._bot
+        job = self.db.get_delivery_job(job_id)
+        if not job or job['status'] not in ('pending', 'running'):
+            return
+        book = self.db.get_book_by_id(job['book_id'])
+        files = self.db.get_book_files(job['book_id'], job['file_type']) if book else []
+        if not book or not files:
+            self.db.update_delivery_job(job_id, status='failed', error="Kitob yoki fayllar topilmadi")
+            self.stats['failed'] += 1
+            return
+
+        chat_id = job['chat_id']
+        file_type = job['file_type']
+        total = len(files)
+        sent_count = min(job['sent_count'], total)
+        self.db.update_delivery_job(job_id, status='running', total=total)
+
+        icon = "📄" if file_type == 'document' else "🎧"
+        title = render_cache.get(book)['title']
+
+        def status_text(count: int) -> tuple:
+            return TextBuilder().add(f"⏳ {icon} ").bold(title).add(f"\nFayllar yuborilmoqda: {count}/{total}").build()
+
+        status_message_id = job['status_message_id']
+        if not status_message_id:
+            try:
+                text, entities = status_text(sent_count)
+                status_msg = await bot.send_message(chat_id, text, entities=entities)
+                status_message_id = status_msg.message_id
+                self.db.update_delivery_job(job_id, status_message_id=status_message_id)
+            except Exception as e:
+                logger.warning(f"Status xabarini yuborishda xatolik: {e}")
+        last_status_at = time.monotonic()
+        reported_count = sent_count
+        failed_count = 0
+
+        # Navbat: (tur, qismlar). Albom xato bersa, qismlar alohida yuboriladi.
+        # Tezlik va flood control ni OutboundScheduler boshqaradi
+        pending = deque(_plan_part_batches(book, files, sent_count))
+        while pending:
+            kind, batch = pending.popleft()
+            try:
+                await _send_part_batch(bot, chat_id, book, kind, batch, file_type, total)
+            except Exception as e:
+                error_str = str(e).lower()
+                if "not enough rights" in error_str or "can't send" in error_str or "permission" in error_str:
+                    await bot.send_message(chat_id, "❌ Botda guruhda hujjat yuborish huquqi yo'q. Botni admin qiling!")
+                    self.db.update_delivery_job(job_id, status='failed', error=str(e))
+                    self.stats['failed'] += 1
+                    return
+
+                if kind != 'single' and not isinstance(e, TelegramRetryAfter):
+                    # Albom/nusxa ishlamasa, shu qismlarni bittadan yuboramiz
+                    logger.warning(f"{kind} yuborishda xatolik ({batch[0][0]}-{batch[-1][0]}): {e}")
+                    pending.extendleft(('single', [part]) for part in reversed(batch))
+                    continue
+
+                # Xato bersa ham keyingisiga o'tamiz (lekin xabar chiqaramiz)
+                failed_count += 1
+                logger.error(f"{batch[0][0]}-qismni yuborishda xatolik: {e}")
+                await bot.send_message(chat_id, f"❌ {batch[0][0]}-qismni yuborishda xatolik: {e}")
+
+            # Progress har bir guruhdan keyin saqlanadi (restartdan keyin shu joydan davom etadi)
+            sent_count = batch[-1][0]
+            self.db.update_delivery_job(job_id, sent_count=sent_count)
+
+            now = time.monotonic()
+            if (status_message_id and pending and sent_count != reported_count
+                    and now - last_status_at >= config.DELIVERY_STATUS_INTERVAL):
+                last_status_at = now
+                reported_count = sent_count
+                text, entities = status_text(sent_count)
+                try:
+                    await bot.edit_message_text(
+                        text, chat_id=chat_id, message_id=status_message_id, entities=entities
+                    )
+                except Exception:
+                    pass
+
+        # Yakuniy xabar
+        if status_message_id:
+            try:
+                await bot.delete_message(chat_id, status_message_id)
+            except Exception:
+                pass
+        self.db.update_delivery_job(job_id, status='done')
+        self.stats['done'] += 1
+        text, entities = (
+            TextBuilder().add("✅ ").bold(title)
+            .add(f"\nBarcha fayllar yuborildi ({total - failed_count}/{total} ta)!").build()
+        )
+        await bot.send_message(chat_id, text, entities=entities)
+
+
+queue = DeliveryQueue()
@@ -0,0 +1,54 @@
+"""
+Xabar matnini formatlash
+
+Matn MessageEntity lar bilan birga yig'iladi (parse_mode kerak emas, shuning
+uchun kitob nomidagi _ * [ ` kabi belgilar xabarni buzmaydi). Markdown bilan
+yuboriladigan matnlar uchun bitta str.translate jadvali bilan escape qilinadi.
+"""
+from typing import List, Optional, Tuple
+from aiogram.types import MessageEntity
+
+# Eski Markdown (parse_mode="Markdown") da faqat shu belgilar maxsus
+_MARKDOWN_TABLE = str.maketrans({char: f"\\{char}" for char in "_*`["})
+
+
+def escape_md(text: str) -> str:
+    """parse_mode="Markdown" uchun escape (entity ichida emas, oddiy matnda)"""
+    return text.translate(_MARKDOWN_TABLE)
+
+
+def utf16_len(text: str) -> int:
+    """Telegram entity offsetlari UTF-16 birliklarida hisoblanadi"""
+    if text.isascii():
+        return len(text)
+    return len(text.encode('utf-16-le')) // 2
+
+
+class TextBuilder:
+    """Matnni bo'laklab yig'ish: har bir bo'lak uchun entity offsetlari shu yerning o'zida hisoblanadi"""
+
+    __slots__ = ('_parts', '_entities', '_offset')
+
+    def __init__(self):
+        self._parts: List[str] = []
+        self._entities: List[MessageEntity] = []
+        self._offset = 0
+
+    def add(self, text: str, entity_type: Optional[str] = None) -> "TextBuilder":
+        if not text:
+            return self
+        length = utf16_len(text)
+        if entity_type:
+            self._entities.append(MessageEntity(type=entity_type, offset=self._offset, length=length))
+        self._parts.append(text)
+        self._offset += length
+        return self
+
+    def bold(self, text: str) -> "TextBuilder":
+        return self.add(text, 'bold')
+
+    def code(self, text: str) -> "TextBuilder":
+        return self.add(text, 'code')
+
+    def build(self) -> Tuple[str, List[MessageEntity]]:
+        return "".join(self._parts), list(self._entities)
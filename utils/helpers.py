@@ -4,6 +4,7 @@ Yordamchi funksiyalar
 import os
 import re
 from typing import Optional, Tuple
+from utils.formatting import escape_md
 import config
 
 def get_file_type(filename: str) -> Optional[str]:
@@ -90,8 +91,5 @@ def validate_file_size(file_size: int) -> bool:
     return file_size <= max_size_bytes
 
 def escape_markdown(text: str) -> str:
-    """Markdown belgilarini escape qilish"""
-    escape_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']
-    for char in escape_chars:
-        text = text.replace(char, f'\\{char}')
-    return text
+    """Markdown belgilarini escape qilish (handlerlar parse_mode="Markdown" ishlatadi)"""
+    return escape_md(text)
@@ -0,0 +1,301 @@
+"""
+Avtomatik yuklash rejimi uchun konveyer (pipeline)
+
+Admin yuborgan fayllar navbatga qo'yiladi va INGEST_BATCH_SIZE tadan
+guruhlanadi. Ishchilar to'plami (INGEST_WORKERS) guruhni ombor kanaliga
+nusxalaydi (tezlikni OutboundScheduler cheklaydi) va kitoblarni bazaga bitta
+tranzaksiyada yozadi. Admin har bir chat uchun bitta progress xabarini ko'radi,
+u har bir guruhdan keyin yangilanadi.
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional
+from aiogram import Bot
+from aiogram.types import Message
+from database.db import Database, get_db
+from middlewares.outbound import set_outbound_priority, PRIORITY_BULK
+from utils.helpers import extract_book_info
+from utils.telegram_methods import CopyMessages, COPY_MESSAGES_LIMIT
+import config
+
+logger = logging.getLogger(__name__)
+
+_MAX_REPORTED_ERRORS = 5
+
+
+class _Session:
+    """Bitta admin chatidagi yuklash holati"""
+
+    def __init__(self, chat_id: int, uploader_id: int):
+        self.chat_id = chat_id
+        self.uploader_id = uploader_id
+        self.pending: List[Dict] = []
+        self.in_flight = 0
+        self.received = 0
+        self.stored = 0
+        self.failed = 0
+        self.duplicates = 0
+        # Shu sessiyada qabul qilingan fayllar (bir xil fayl ikki marta forward qilinsa)
+        self.seen: set = set()
+        self.errors: List[str] = []
+        self.status_message_id: Optional[int] = None
+        self.flush_task: Optional[asyncio.Task] = None
+        self.lock = asyncio.Lock()
+
+    @property
+    def is_idle(self) -> bool:
+        return not self.pending and not self.in_flight and self.flush_task is None
+
+
+class IngestPipeline:
+    """Fayllarni guruhlab ombor kanaliga saqlash va bazaga yozish"""
+
+    def __init__(self, db: Optional[Database] = None):
+        self._db = db
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+        self._sessions: Dict[int, _Session] = {}
+        self._bot: Optional[Bot] = None
+        # Navbatdagi (ishchi hali olmagan) guruhlardagi fayllar soni
+        self._queued_files = 0
+        self.stats = {'received': 0, 'stored': 0, 'failed': 0, 'duplicates': 0, 'batches': 0, 'copy_fallbacks': 0}
+
+    @property
+    def db(self) -> Database:
+        if self._db is None:
+            self._db = get_db()
+        return self._db
+
+    @property
+    def depth(self) -> int:
+        """Hali saqlanmagan fayllar: guruhga yig'ilayotganlar va ishchini kutayotgan guruhlardagilar"""
+        return sum(len(session.pending) for session in self._sessions.values()) + self._queued_files
+
+    async def start(self, bot: Bot):
+        self._bot = bot
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"ingest-worker-{i}")
+            for i in range(max(1, config.INGEST_WORKERS))
+        ]
+
+    async def stop(self):
+        """Ishchilarni to'xtatish (navbatdagi fayllar bazaga yozilmaydi, ularni qayta yuborish kerak)"""
+        for session in self._sessions.values():
+            if session.flush_task:
+                session.flush_task.cancel()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, message: Message, filename: str, file_type: str):
+        """Faylni navbatga qo'yish (handler darhol qaytadi)"""
+        file = message.document or message.audio
+        session = self._sessions.get(message.chat.id)
+        if session is None:
+            session = _Session(message.chat.id, message.from_user.id)
+            self._sessions[message.chat.id] = session
+        session.pending.append({
+            'message_id': message.message_id,
+            'file_id': file.file_id,
+            'file_unique_id': file.file_unique_id,
+            'file_size': file.file_size,
+            'filename': filename,
+            'file_type': file_type,
+        })
+        session.received += 1
+        self.stats['received'] += 1
+
+        if len(session.pending) >= self._batch_size():
+            self._enqueue_batch(session)
+        elif session.flush_task is None:
+            # Forward qilingan arxiv fayllari ketma-ket keladi: qisqa oyna ichida yig'amiz
+            session.flush_task = asyncio.create_task(self._flush_later(session))
+
+    @staticmethod
+    def _batch_size() -> int:
+        return max(1, min(config.INGEST_BATCH_SIZE, COPY_MESSAGES_LIMIT))
+
+    async def _flush_later(self, session: _Session):
+        try:
+            await asyncio.sleep(config.INGEST_BATCH_WINDOW)
+        finally:
+            session.flush_task = None
+        while session.pending:
+            self._enqueue_batch(session)
+
+    def _enqueue_batch(self, session: _Session):
+        size = self._batch_size()
+        batch, session.pending = session.pending[:size], session.pending[size:]
+        session.in_flight += 1
+        self._queued_files += len(batch)
+        self._queue.put_nowait((session, batch))
+
+    async def _worker(self):
+        # Ombor kanaliga yuborish interaktiv javoblardan keyin turadi
+        set_outbound_priority(PRIORITY_BULK)
+        while True:
+            session, batch = await self._queue.get()
+            self._queued_files -= len(batch)
+            try:
+                await self._process(session, batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Avtomatik yuklash guruhida xatolik ({len(batch)} ta fayl): {e}")
+                session.failed += len(batch)
+                session.errors.append(str(e))
+                self.stats['failed'] += len(batch)
+            finally:
+                session.in_flight -= 1
+                self._queue.task_done()
+            try:
+                await self._report(session)
+            except Exception as e:
+                logger.warning(f"Yuklash progress xabarini yangilashda xatolik: {e}")
+
+    async def _process(self, session: _Session, batch: List[Dict]):
+        """Guruhni omborga saqlash va bazaga bitta tranzaksiyada yozish"""
+        self.stats['batches'] += 1
+        # Bazada bor fayllar omborga qayta yuborilmaydi (API so'rovisiz o'tkazib yuboriladi).
+        # session.seen ga faqat bazaga yozilgan fayllar qo'shiladi: saqlanmagan fayl qayta yuborilsa, yana urinib ko'riladi
+        fresh = []
+        batch_ids = set()
+        for item in batch:
+            file_unique_id = item['file_unique_id']
+            if (file_unique_id in session.seen or file_unique_id in batch_ids
+                    or self.db.find_file_by_unique_id(file_unique_id)):
+                session.duplicates += 1
+                self.stats['duplicates'] += 1
+                continue
+            batch_ids.add(file_unique_id)
+            fresh.append(item)
+        if not fresh:
+            return
+        batch = fresh
+        stored = await self._store(session, batch)
+        storage_chat_id = str(config.STORAGE_CHANNEL_ID)
+        rows = []
+        for item in stored:
+            title, author = extract_book_info(item['filename'])
+            rows.append({
+                'title': title,
+                'author': author,
+                'file_id': item['file_id'],
+                'file_unique_id': item['file_unique_id'],
+                'file_type': item['file_type'],
+                'file_size': item['file_size'],
+                'uploader_id': session.uploader_id,
+                'description': f"Avtomatik yuklangan: {item['filename']}",
+                'storage_message_id': item['storage_message_id'],
+                'storage_chat_id': storage_chat_id,
+            })
+        book_ids = self.db.add_books_bulk(rows)
+        saved = 0
+        for item, book_id in zip(stored, book_ids):
+            if book_id is not None:
+                saved += 1
+                session.seen.add(item['file_unique_id'])
+            elif self.db.find_file_by_unique_id(item['file_unique_id']):
+                # Shu orada boshqa yo'l bilan qo'shilgan (unique index): ombordagi nusxa keraksiz
+                session.duplicates += 1
+                self.stats['duplicates'] += 1
+                session.errors.append(f"{item['filename']}: bazada bor, o'tkazib yuborildi")
+                await self._delete_storage_copy(item)
+            else:
+                session.failed += 1
+                self.stats['failed'] += 1
+                session.errors.append(f"{item['filename']}: bazaga yozib bo'lmadi")
+        session.stored += saved
+        session.failed += len(batch) - len(stored)
+        self.stats['stored'] += saved
+        self.stats['failed'] += len(batch) - len(stored)
+
+    async def _delete_storage_copy(self, item: Dict):
+        try:
+            await self._bot.delete_message(config.STORAGE_CHANNEL_ID, item['storage_message_id'])
+        except Exception as e:
+            logger.warning(f"Ombordagi ortiqcha nusxani o'chirishda xatolik: {e}")
+
+    async def _store(self, session: _Session, batch: List[Dict]) -> List[Dict]:
+        """Fayllarni ombor kanaliga saqlash; muvaffaqiyatli saqlanganlar qaytariladi"""
+        bot = self._bot
+        if config.INGEST_STORAGE_MODE == 'copy' and len(batch) > 1:
+            # copyMessages: butun guruh uchun bitta so'rov (ID lar o'sish tartibida bo'lishi shart)
+            batch.sort(key=lambda item: item['message_id'])
+            try:
+                copied = await bot(CopyMessages(
+                    chat_id=config.STORAGE_CHANNEL_ID,
+                    from_chat_id=session.chat_id,
+                    message_ids=[item['message_id'] for item in batch]
+                ))
+                if len(copied) == len(batch):
+                    for item, message_id in zip(batch, copied):
+                        item['storage_message_id'] = message_id.message_id
+                    return batch
+                # Ba'zi xabarlar nusxalanmagan: qaysi biri ekanini bilmaymiz, bittadan yuboramiz
+                logger.warning(f"copyMessages {len(batch)} tadan {len(copied)} tasini nusxaladi")
+            except Exception as e:
+                logger.warning(f"copyMessages ishlamadi, fayllar bittadan saqlanadi: {e}")
+            self.stats['copy_fallbacks'] += 1
+
+        stored = []
+        for item in batch:
+            try:
+                if item['file_type'] == 'document':
+                    sent = await bot.send_document(
+                        chat_id=config.STORAGE_CHANNEL_ID,
+                        document=item['file_id'],
+                        caption=f"📚 {item['filename']}"
+                    )
+                    item['file_id'] = sent.document.file_id
+                else:
+                    sent = await bot.send_audio(
+                        chat_id=config.STORAGE_CHANNEL_ID,
+                        audio=item['file_id'],
+                        caption=f"🎵 {item['filename']}"
+                    )
+                    item['file_id'] = sent.audio.file_id
+                item['storage_message_id'] = sent.message_id
+                stored.append(item)
+            except Exception as e:
+                logger.error(f"{item['filename']} ni omborga saqlashda xatolik: {e}")
+                session.errors.append(f"{item['filename']}: {e}")
+        return stored
+
+    def _status_text(self, session: _Session) -> str:
+        text = (
+            f"📥 Avtomatik yuklash\n\n"
+            f"📨 Qabul qilindi: {session.received} ta\n"
+            f"✅ Saqlandi: {session.stored} ta\n"
+            f"❌ Xatolik: {session.failed} ta"
+        )
+        if session.duplicates:
+            text += f"\n♻️ Bazada bor (o'tkazib yuborildi): {session.duplicates} ta"
+        if session.errors:
+            text += "\n\n" + "\n".join(f"• {error}" for error in session.errors[-_MAX_REPORTED_ERRORS:])
+        if session.is_idle:
+            text += "\n\nYana fayl yuklang yoki /stop buyrug'ini yuboring."
+        else:
+            text += "\n\n⏳ Davom etmoqda..."
+        return text
+
+    async def _report(self, session: _Session):
+        """Guruhdan keyin bitta umumiy progress xabarini yuborish yoki yangilash"""
+        async with session.lock:
+            text = self._status_text(session)
+            if session.status_message_id:
+                try:
+                    await self._bot.edit_message_text(text, chat_id=session.chat_id, message_id=session.status_message_id)
+                except Exception as e:
+                    if "message is not modified" not in str(e):
+                        raise
+            else:
+                status_msg = await self._bot.send_message(session.chat_id, text)
+                session.status_message_id = status_msg.message_id
+            if session.is_idle and self._sessions.get(session.chat_id) is session:
+                # Keyingi fayllar uchun yangi hisob va yangi progress xabari
+                del self._sessions[session.chat_id]
+
+
+pipeline = IngestPipeline()
@@ -0,0 +1,51 @@
+"""
+Inline qidiruv natijalari keshi (so'rov -> topilgan kitoblar)
+
+Foydalanuvchi natijalarni varaqlaganda (next_offset) va bir xil so'rovni
+turli foydalanuvchilar yozganda qidiruv qayta bajarilmaydi. Yozuvlar
+INLINE_SEARCH_CACHE_TTL soniyadan keyin eskiradi, kitob o'chirilsa
+clear() chaqiriladi.
+"""
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import config
+
+
+class InlineSearchCache:
+    """query -> (muddati, kitoblar) (LRU + TTL)"""
+
+    def __init__(self, max_size: int | None = None, ttl: float | None = None):
+        self.max_size = max_size or config.INLINE_SEARCH_CACHE_SIZE
+        self.ttl = config.INLINE_SEARCH_CACHE_TTL if ttl is None else ttl
+        self._items: "OrderedDict[str, Tuple[float, List[Dict]]]" = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, query: str) -> Optional[List[Dict]]:
+        item = self._items.get(query)
+        if item is None:
+            self.stats['misses'] += 1
+            return None
+        expires, books = item
+        if expires <= time.monotonic():
+            del self._items[query]
+            self.stats['expired'] += 1
+            self.stats['misses'] += 1
+            return None
+        self._items.move_to_end(query)
+        self.stats['hits'] += 1
+        return books
+
+    def put(self, query: str, books: List[Dict]):
+        self._items[query] = (time.monotonic() + self.ttl, books)
+        self._items.move_to_end(query)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+cache = InlineSearchCache()
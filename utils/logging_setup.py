@@ -0,0 +1,123 @@
+"""
+Log tizimi
+
+Yozuvlar navbatga (QueueHandler) qo'yiladi, formatlash va stdout ga yozish
+alohida oqimda (QueueListener) bajariladi - event loop kutib qolmaydi. Har bir
+yozuvga joriy update konteksti (update_id, user_id, chat_id ...) biriktiriladi,
+modullar uchun alohida darajalar beriladi va ko'p takrorlanadigan DEBUG
+yozuvlari sampling qilinadi.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from contextvars import ContextVar, Token
+from typing import Dict, Optional
+import config
+
+_context: ContextVar[Dict] = ContextVar('log_context', default={})
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def bind_context(**fields) -> Token:
+    """Joriy task (va undan yaratilgan tasklar) loglariga maydonlar qo'shish"""
+    return _context.set({**_context.get(), **fields})
+
+
+def reset_context(token: Token):
+    _context.reset(token)
+
+
+class _ContextQueueHandler(logging.handlers.QueueHandler):
+    """Yozuvni formatlamasdan navbatga qo'yadi (formatlash listener oqimida)"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.ctx = _context.get()
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """DEBUG yozuvlari: har bir xabar shablonidan birinchisi va keyin har N-chisi o'tadi"""
+
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = max(1, every)
+        self._counts: Dict[tuple, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.every == 1:
+            return True
+        key = (record.name, record.msg)
+        count = self._counts.get(key, 0)
+        if not count and len(self._counts) >= 10000:
+            # f-string bilan yozilgan xabarlar har safar yangi shablon bo'ladi: xotira cheklanadi
+            self._counts.clear()
+        self._counts[key] = count + 1
+        return count % self.every == 0
+
+
+class TextFormatter(logging.Formatter):
+    """Oddiy matn + [kalit=qiymat] ko'rinishidagi kontekst"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        ctx = getattr(record, 'ctx', None)
+        if ctx:
+            text += " [" + " ".join(f"{key}={value}" for key, value in ctx.items()) + "]"
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """Har bir yozuv - bitta JSON qator (log yig'uvchi tizimlar uchun)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        data.update(getattr(record, 'ctx', None) or {})
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def setup_logging():
+    """Root loggerni navbatli handler bilan sozlash (bir marta chaqiriladi)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    if config.LOG_FORMAT == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = TextFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _ContextQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(config.LOG_DEBUG_SAMPLE_EVERY))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(config.LOG_LEVEL)
+    for name, level in config.LOG_LEVELS.items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Navbatdagi yozuvlarni yozib, listener oqimini to'xtatish"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
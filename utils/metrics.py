@@ -0,0 +1,215 @@
+"""
+Prometheus matn formatidagi metrikalar
+
+Handler kechikishlari, Bot API so'rovlari, SQLite so'rovlari va navbatlar
+hajmi xotirada yig'iladi (yozish - dict dagi sonni oshirish, lock kerak emas)
+va /metrics HTTP endpointida (aiohttp) beriladi.
+"""
+import logging
+from bisect import bisect_left
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from aiohttp import web
+import config
+
+logger = logging.getLogger(__name__)
+
+# Soniyalarda: SQLite so'rovlaridan (ms) Bot API retry laridan (s) gacha
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Sample = Tuple[str, str, float]
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> Iterator[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Faqat o'sadigan hisoblagich"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterator[Sample]:
+        for labels, value in list(self._values.items()):
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Gauge(_Metric):
+    """Joriy qiymat: set() bilan yoki scrape paytida chaqiriladigan funksiya (track) orqali"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._callbacks: Dict[tuple, Callable] = {}
+
+    def set(self, value: float, *labels):
+        self._values[labels] = value
+
+    def track(self, callback: Callable, *labels):
+        """callback() son qaytaradi; dict qaytarsa, kalitlari oxirgi label qiymatlari bo'ladi"""
+        self._callbacks[labels] = callback
+
+    def samples(self) -> Iterator[Sample]:
+        for labels, value in list(self._values.items()):
+            yield self.name, _format_labels(self.labelnames, labels), value
+        for labels, callback in list(self._callbacks.items()):
+            try:
+                value = callback()
+            except Exception as e:
+                logger.warning(f"{self.name}{labels} qiymatini olishda xatolik: {e}")
+                continue
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    if isinstance(item, (int, float)):
+                        yield self.name, _format_labels(self.labelnames, labels + (key,)), item
+            else:
+                yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Histogram(_Metric):
+    """Kechikishlar taqsimoti (bucketlar kumulyativ ko'rinishda beriladi)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [bucketlar bo'yicha sonlar (+Inf bilan), yig'indi]
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def samples(self) -> Iterator[Sample]:
+        for labels, (counts, total) in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                yield f"{self.name}_bucket", _format_labels(self.labelnames, labels, le), cumulative
+            yield f"{self.name}_sum", _format_labels(self.labelnames, labels), total
+            yield f"{self.name}_count", _format_labels(self.labelnames, labels), cumulative
+
+
+class Registry:
+    """Metrikalar ro'yxati va matn formatiga o'tkazish"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        lines.append('')
+        return '\n'.join(lines)
+
+
+registry = Registry()
+
+update_seconds = registry.register(Histogram(
+    'bot_update_seconds', "Update ni qayta ishlash vaqti (filtrlar va handler bilan)", ('event',)))
+handler_seconds = registry.register(Histogram(
+    'bot_handler_seconds', "Handler bajarilish vaqti", ('router', 'handler')))
+handler_errors = registry.register(Counter(
+    'bot_handler_errors_total', "Handlerdan chiqib ketgan xatoliklar", ('router', 'handler')))
+api_requests = registry.register(Counter(
+    'bot_api_requests_total', "Bot API so'rovlari (result: ok, retry_after yoki xatolik turi)", ('method', 'result')))
+api_seconds = registry.register(Histogram(
+    'bot_api_request_seconds', "Bot API so'rovi vaqti (har bir urinish alohida)", ('method',)))
+db_query_seconds = registry.register(Histogram(
+    'db_query_seconds', "SQLite so'rovlari vaqti (statement turi bo'yicha)", ('statement',)))
+queue_depth = registry.register(Gauge(
+    'bot_queue_depth', "Fon navbatlarida kutayotgan vazifalar", ('queue',)))
+component_stats = registry.register(Gauge(
+    'bot_component_stats', "Komponentlarning ichki hisoblagichlari (stats)", ('component', 'stat')))
+
+
+def observe_db_query(statement: str, seconds: float):
+    """database.add_query_hook uchun"""
+    db_query_seconds.observe(seconds, statement)
+
+
+async def _metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(
+        body=registry.render().encode('utf-8'),
+        headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+    )
+
+
+class MetricsServer:
+    """/metrics endpointi uchun kichik aiohttp server"""
+
+    def __init__(self):
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self, host: str = None, port: int = None):
+        host = host or config.METRICS_HOST
+        port = config.METRICS_PORT if port is None else port
+        if not port or self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get('/metrics', _metrics_handler)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, host, port).start()
+        except OSError as e:
+            logger.error(f"Metrics server ishga tushmadi ({host}:{port}): {e}")
+            await runner.cleanup()
+            return
+        self._runner = runner
+        logger.info(f"Metrikalar: http://{host}:{port}/metrics")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+server = MetricsServer()
+
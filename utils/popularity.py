@@ -0,0 +1,127 @@
+"""
+Kitoblarni yuklab olishlar va qidiruv so'rovlari hisoblagichlari
+
+Yuborish yo'lida faqat xotiradagi lug'at oshiriladi: bazaga yozilmaydi, lock
+ham kerak emas (hamma handler lar bitta event loop da). Fon taski har
+POPULARITY_FLUSH_INTERVAL soniyada yig'ilganlarni bitta tranzaksiyada
+(executemany) bazaga qo'shadi, bot to'xtaganda qolgani yoziladi. Yozib
+bo'lmasa hisoblar yo'qolmaydi - keyingi safar qayta urinib ko'riladi.
+Yozilgan yuklab olishlar tinglovchilarga ham beriladi (/top ro'yxati shu
+orqali yangilanadi, utils/book_lists.py).
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+from database.db import Database, get_db
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """So'rovni statistika kaliti ko'rinishiga keltirish (katta-kichik harf va bo'shliqlarsiz)"""
+    return ' '.join(query.casefold().split())[:config.POPULARITY_QUERY_MAX_LENGTH]
+
+
+class PopularityCounters:
+    """book_id -> yuklab olishlar, so'rov -> [soni, oxirgi natijalar soni]"""
+
+    def __init__(self, db: Optional[Database] = None):
+        self._db = db
+        self._downloads: Dict[int, int] = defaultdict(int)
+        self._queries: Dict[str, List[int]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._listeners: List[Callable[[Dict[int, int]], None]] = []
+        self.stats = {'downloads': 0, 'queries': 0, 'flushes': 0, 'rows': 0, 'errors': 0}
+
+    @property
+    def db(self) -> Database:
+        if self._db is None:
+            self._db = get_db()
+        return self._db
+
+    @property
+    def depth(self) -> int:
+        """Bazaga yozilishi kutilayotgan yozuvlar soni"""
+        return len(self._downloads) + len(self._queries)
+
+    def add_listener(self, listener: Callable[[Dict[int, int]], None]):
+        """Har bir muvaffaqiyatli yozishdan keyin {book_id: qo'shilgan soni} bilan chaqiriladi"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[Dict[int, int]], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def book_sent(self, book_id: int, count: int = 1):
+        """Kitob foydalanuvchiga yuborildi"""
+        self._downloads[book_id] += count
+        self.stats['downloads'] += count
+
+    def query(self, query: str, results: int):
+        """Qidiruv so'rovi va topilgan kitoblar soni"""
+        key = normalize_query(query)
+        if not key:
+            return
+        entry = self._queries.get(key)
+        if entry is None:
+            self._queries[key] = [1, results]
+        else:
+            entry[0] += 1
+            entry[1] = results
+        self.stats['queries'] += 1
+
+    def flush(self) -> int:
+        """Xotiradagi hisoblagichlarni bazaga yozish, yozilgan qatorlar sonini qaytarish"""
+        if not self._downloads and not self._queries:
+            return 0
+        downloads, self._downloads = self._downloads, defaultdict(int)
+        queries, self._queries = self._queries, {}
+        ok = self.db.add_popularity_counts(
+            [(count, book_id) for book_id, count in downloads.items()],
+            [(query, count, results) for query, (count, results) in queries.items()]
+        )
+        if not ok:
+            # Keyingi urinishgacha kelgan hisoblar bilan birlashtirish
+            self.stats['errors'] += 1
+            for book_id, count in downloads.items():
+                self._downloads[book_id] += count
+            for query, (count, results) in queries.items():
+                entry = self._queries.setdefault(query, [0, results])
+                entry[0] += count
+            return 0
+        rows = len(downloads) + len(queries)
+        self.stats['flushes'] += 1
+        self.stats['rows'] += rows
+        if downloads:
+            for listener in self._listeners:
+                try:
+                    listener(downloads)
+                except Exception as e:
+                    logger.error(f"Hisoblagich tinglovchisida xatolik: {e}")
+        return rows
+
+    async def start(self):
+        """Davriy yozish taskini ishga tushirish"""
+        self._task = asyncio.create_task(self._run(), name="popularity-flush")
+
+    async def stop(self):
+        """Taskni to'xtatish va qolgan hisoblarni yozish"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(config.POPULARITY_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Hisoblagichlarni yozishda xatolik: {e}")
+
+
+counters = PopularityCounters()
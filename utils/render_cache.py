@@ -0,0 +1,119 @@
+"""
+Kitob xabarlari uchun tayyor (pre-render qilingan) izoh va tugmalar keshi
+
+Izohlar (caption), qismli kitob tanlash xabari va uning tugmalari har bir
+kitob uchun bir marta tayyorlanadi. Kitob ma'lumotlari o'zgarsa (kalit
+mos kelmasa) yoki invalidate() chaqirilsa, qayta tayyorlanadi.
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, MessageEntity
+from database.db import Database, get_db
+from utils.formatting import TextBuilder
+from utils.helpers import format_file_size
+import config
+
+BOT_SIGNATURE = "\n\n@Xudoyorxon0325_bot"
+
+
+def _book_key(book: Dict) -> tuple:
+    """Izohga ta'sir qiladigan maydonlar (o'zgarsa kesh eskirgan hisoblanadi)"""
+    return (
+        book['title'], book.get('author'), book.get('file_type'), book.get('file_size'),
+        book.get('upload_date'), bool(book.get('is_multi_part'))
+    )
+
+
+class BookRenderCache:
+    """book_id -> tayyor izohlar va tugmalar (LRU)"""
+
+    def __init__(self, max_size: int | None = None, db: Optional[Database] = None):
+        self.max_size = max_size or config.RENDER_CACHE_SIZE
+        self._db = db
+        self._items: "OrderedDict[int, Dict]" = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    @property
+    def db(self) -> Database:
+        if self._db is None:
+            self._db = get_db()
+        return self._db
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def invalidate(self, book_id: int):
+        """Kitob o'zgarganda (o'chirilganda, qism qo'shilganda) keshni tozalash"""
+        if self._items.pop(book_id, None) is not None:
+            self.stats['invalidations'] += 1
+
+    def clear(self):
+        self._items.clear()
+
+    def get(self, book: Dict) -> Dict:
+        """Kitob uchun tayyor ma'lumotlar (kerak bo'lsa shu yerning o'zida tayyorlanadi)"""
+        key = _book_key(book)
+        render = self._items.get(book['id'])
+        if render is not None and render['key'] == key:
+            self._items.move_to_end(book['id'])
+            self.stats['hits'] += 1
+            return render
+        self.stats['misses'] += 1
+        render = self._render(book, key)
+        self._items[book['id']] = render
+        self._items.move_to_end(book['id'])
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+        return render
+
+    def _render(self, book: Dict, key: tuple) -> Dict:
+        title = book['title']
+        author = book.get('author') or 'Noma\'lum'
+        details = (
+            f"📁 Turi: {book['file_type']}\n"
+            f"💾 Hajmi: {format_file_size(book['file_size'] or 0)}\n"
+            f"📅 Yuklangan: {(book.get('upload_date') or '')[:10]}"
+        )
+        # Izohlar parse_mode siz, MessageEntity bilan yuboriladi
+        part_head, head_entities = TextBuilder().add("📖 ").bold(title).add(f"\n\n👤 Muallif: {author}\n").build()
+        part_tail = f"{details}{BOT_SIGNATURE}"
+        caption = part_head + part_tail
+        render = {
+            'key': key,
+            'title': title,
+            'caption': caption,
+            'caption_entities': head_entities,
+            # file_id orqali yuborishda audio uchun boshqa belgi (ikkalasi ham 2 ta UTF-16 birlik)
+            'fallback_caption': caption if book['file_type'] != 'audio' else f"🎵{caption[1:]}",
+            # Qismlar izohi: boshi + "Qism i/n" + oxiri
+            'part_head': part_head,
+            'part_tail': part_tail,
+            'choice_text': None,
+            'choice_entities': None,
+            'choice_markup': None,
+        }
+        if book.get('is_multi_part'):
+            counts = self.db.get_book_file_counts(book['id'])
+            render['file_counts'] = counts
+            render['choice_text'], render['choice_entities'] = (
+                TextBuilder().add("🧩 ").bold(title).add("\nFayl turini tanlang:").build()
+            )
+            render['choice_markup'] = InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(
+                    text=f"📄 E-kitob ({counts.get('document', 0)})",
+                    callback_data=f"send_parts_document_{book['id']}"
+                )],
+                [InlineKeyboardButton(
+                    text=f"🎧 Audio ({counts.get('audio', 0)})",
+                    callback_data=f"send_parts_audio_{book['id']}"
+                )],
+                [InlineKeyboardButton(text="❌ Yopish", callback_data="close_search")]
+            ])
+        return render
+
+    def part_caption(self, book: Dict, idx: int, total: int) -> Tuple[str, List[MessageEntity]]:
+        """Qismli kitob faylining izohi va entitylari"""
+        render = self.get(book)
+        return f"{render['part_head']}📼 Qism {idx}/{total}\n{render['part_tail']}", render['caption_entities']
+
+cache = BookRenderCache()
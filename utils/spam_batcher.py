@@ -0,0 +1,216 @@
+"""
+Reklama xabarlarini guruh bo'yicha yig'ib, ommaviy o'chirish
+
+Har bir guruh uchun belgilangan xabarlar qisqa oyna davomida yig'iladi,
+so'ng bitta deleteMessages so'rovi bilan o'chiriladi va bitta umumiy
+ogohlantirish yuboriladi (yoki oldingisi tahrirlanadi). Bot to'xtaganda
+kutilayotgan xabarlar oynani kutmasdan o'chiriladi (stop()).
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+from aiogram import Bot
+from aiogram.types import Message
+from utils.telegram_methods import DeleteMessages, DELETE_MESSAGES_LIMIT
+import config
+
+logger = logging.getLogger(__name__)
+
+# Legacy Markdown havolasi ichida ishlatib bo'lmaydigan belgilar
+_MENTION_STRIP = str.maketrans('', '', '_*[]`')
+
+
+class _ChatBatch:
+    """Bitta guruhdagi kutilayotgan amallar va oxirgi ogohlantirish"""
+
+    __slots__ = ('message_ids', 'users', 'task', 'warning_id', 'warning_at', 'warning_count', 'warning_users', 'cleanup_task')
+
+    def __init__(self):
+        self.message_ids: List[int] = []
+        self.users: Dict[int, str] = {}
+        self.task: Optional[asyncio.Task] = None
+        self.warning_id: Optional[int] = None
+        self.warning_at = 0.0
+        self.warning_count = 0
+        self.warning_users: Dict[int, str] = {}
+        self.cleanup_task: Optional[asyncio.Task] = None
+
+
+class SpamBatcher:
+    """Guruhlar bo'yicha spam o'chirish va ogohlantirishlarni birlashtiruvchi"""
+
+    def __init__(self):
+        self._chats: Dict[int, _ChatBatch] = {}
+        # stop() chaqirilganda oynalar kutilmaydi
+        self._stopping = asyncio.Event()
+        # deleteMessages qo'llab-quvvatlanmasa, yakka o'chirishga o'tamiz
+        self._bulk_supported = True
+        self.stats = {'flagged': 0, 'flushes': 0, 'api_calls': 0, 'warnings_sent': 0, 'warnings_edited': 0}
+
+    @property
+    def depth(self) -> int:
+        """O'chirilishini kutayotgan xabarlar soni"""
+        return sum(len(batch.message_ids) for batch in self._chats.values())
+
+    def add(self, message: Message):
+        """Reklama xabarini navbatga qo'shish"""
+        batch = self._chats.get(message.chat.id)
+        if batch is None:
+            batch = self._chats[message.chat.id] = _ChatBatch()
+        batch.message_ids.append(message.message_id)
+        if message.from_user:
+            batch.users[message.from_user.id] = message.from_user.full_name
+        self.stats['flagged'] += 1
+        if batch.task is None:
+            batch.task = asyncio.create_task(self._flush_later(message.bot, message.chat.id))
+
+    async def stop(self):
+        """Kutilayotgan barcha xabarlarni darhol o'chirish va fon tasklarini to'xtatish"""
+        self._stopping.set()
+        # Flush davomida kelgan xabarlar uchun _flush_later yangi task yaratishi mumkin
+        while True:
+            tasks = [batch.task for batch in self._chats.values() if batch.task]
+            if not tasks:
+                break
+            await asyncio.gather(*tasks, return_exceptions=True)
+        # Ogohlantirishlarni o'chirish kutilmaydi (guruhda qoladi)
+        cleanup_tasks = [batch.cleanup_task for batch in self._chats.values() if batch.cleanup_task]
+        for task in cleanup_tasks:
+            task.cancel()
+        await asyncio.gather(*cleanup_tasks, return_exceptions=True)
+        self._chats.clear()
+        self._stopping = asyncio.Event()
+
+    async def _flush_later(self, bot: Bot, chat_id: int):
+        try:
+            await asyncio.wait_for(self._stopping.wait(), config.SPAM_BATCH_WINDOW)
+        except asyncio.TimeoutError:
+            pass
+        batch = self._chats[chat_id]
+        try:
+            await self.flush(bot, chat_id)
+        except Exception as e:
+            logger.error(f"Spamni tozalashda xatolik: {e}")
+        # Flush davomida kelgan xabarlar keyingi oynada o'chiriladi (ogohlantirishlar parallel yuborilmaydi)
+        if batch.message_ids:
+            batch.task = asyncio.create_task(self._flush_later(bot, chat_id))
+            return
+        batch.task = None
+        # Tahrirlanadigan ogohlantirish qolmagan bo'lsa, guruh holati xotirada saqlanmaydi
+        if batch.warning_id is None:
+            self._chats.pop(chat_id, None)
+
+    async def flush(self, bot: Bot, chat_id: int):
+        """Yig'ilgan xabarlarni o'chirish va umumiy ogohlantirishni yangilash"""
+        batch = self._chats.get(chat_id)
+        if batch is None or not batch.message_ids:
+            return
+        message_ids, batch.message_ids = batch.message_ids, []
+        users, batch.users = batch.users, {}
+        self.stats['flushes'] += 1
+        await self._delete(bot, chat_id, message_ids)
+        await self._warn(bot, chat_id, batch, len(message_ids), users)
+
+    async def _delete(self, bot: Bot, chat_id: int, message_ids: List[int]):
+        # Faqat o'chirilmagan qismlardagi xabarlar bittadan o'chiriladi
+        single: List[int] = []
+        for i in range(0, len(message_ids), DELETE_MESSAGES_LIMIT):
+            chunk = message_ids[i:i + DELETE_MESSAGES_LIMIT]
+            if not self._bulk_supported:
+                single.extend(chunk)
+                continue
+            try:
+                self.stats['api_calls'] += 1
+                await bot(DeleteMessages(chat_id=chat_id, message_ids=chunk))
+            except Exception as e:
+                if "not found" in str(e).lower() and "method" in str(e).lower():
+                    logger.warning("deleteMessages qo'llab-quvvatlanmaydi, yakka o'chirishga o'tildi")
+                    self._bulk_supported = False
+                else:
+                    logger.warning(f"Ommaviy o'chirishda xatolik, bu qism yakka o'chiriladi ({len(chunk)} ta): {e}")
+                single.extend(chunk)
+        for message_id in single:
+            try:
+                self.stats['api_calls'] += 1
+                await bot.delete_message(chat_id, message_id)
+            except Exception as e:
+                logger.warning(f"Xabarni o'chirishda xatolik ({chat_id}/{message_id}): {e}")
+
+    @staticmethod
+    def _warning_text(count: int, users: Dict[int, str]) -> str:
+        mentions = [
+            f"[{(name.translate(_MENTION_STRIP) or 'foydalanuvchi')}](tg://user?id={user_id})"
+            for user_id, name in list(users.items())[:config.SPAM_WARNING_MAX_MENTIONS]
+        ]
+        if len(users) > config.SPAM_WARNING_MAX_MENTIONS:
+            mentions.append(f"va yana {len(users) - config.SPAM_WARNING_MAX_MENTIONS} kishi")
+        text = f"⚠️ {', '.join(mentions)}, guruhda reklama yoki havola tashlash taqiqlangan!"
+        if count > 1:
+            text += f"\n\n🗑 O'chirilgan xabarlar: {count} ta"
+        return text
+
+    async def _warn(self, bot: Bot, chat_id: int, batch: _ChatBatch, count: int, users: Dict[int, str]):
+        now = time.monotonic()
+        # Yaqinda yuborilgan ogohlantirish bo'lsa, yangisini yubormasdan uni tahrirlaymiz
+        if batch.warning_id and now - batch.warning_at <= config.SPAM_WARNING_EDIT_WINDOW:
+            batch.warning_count += count
+            batch.warning_users.update(users)
+            try:
+                self.stats['api_calls'] += 1
+                await bot.edit_message_text(
+                    self._warning_text(batch.warning_count, batch.warning_users),
+                    chat_id=chat_id,
+                    message_id=batch.warning_id,
+                    parse_mode="Markdown"
+                )
+                self.stats['warnings_edited'] += 1
+                return
+            except Exception as e:
+                logger.warning(f"Ogohlantirishni tahrirlashda xatolik: {e}")
+
+        old_warning_id = batch.warning_id
+        try:
+            self.stats['api_calls'] += 1
+            sent = await bot.send_message(chat_id, self._warning_text(count, users), parse_mode="Markdown")
+        except Exception as e:
+            logger.error(f"Ogohlantirish yuborishda xatolik: {e}")
+            return
+        self.stats['warnings_sent'] += 1
+        batch.warning_id = sent.message_id
+        batch.warning_at = now
+        batch.warning_count = count
+        batch.warning_users = dict(users)
+
+        # Eskirgan ogohlantirishni o'chiramiz: guruhda faqat eng oxirgisi qoladi
+        if old_warning_id:
+            try:
+                self.stats['api_calls'] += 1
+                await bot.delete_message(chat_id, old_warning_id)
+            except Exception as e:
+                logger.warning(f"Eski ogohlantirishni o'chirishda xatolik: {e}")
+        if batch.cleanup_task:
+            batch.cleanup_task.cancel()
+        batch.cleanup_task = asyncio.create_task(self._cleanup_later(bot, chat_id, sent.message_id))
+
+    async def _cleanup_later(self, bot: Bot, chat_id: int, warning_id: int):
+        """Ogohlantirishni SPAM_WARNING_TTL soniyadan keyin o'chirish
+        (TTL=0 bo'lsa ogohlantirish qoladi, tahrirlash oynasidan keyin faqat holat unutiladi)"""
+        keep_warning = config.SPAM_WARNING_TTL <= 0
+        await asyncio.sleep(config.SPAM_WARNING_EDIT_WINDOW if keep_warning else config.SPAM_WARNING_TTL)
+        batch = self._chats.get(chat_id)
+        if batch is None or batch.warning_id != warning_id:
+            return
+        batch.cleanup_task = None
+        batch.warning_id = None
+        if not keep_warning:
+            try:
+                await bot.delete_message(chat_id, warning_id)
+            except Exception as e:
+                logger.warning(f"Ogohlantirishni o'chirishda xatolik: {e}")
+        # Bo'sh guruh holatini xotiradan chiqaramiz
+        if not batch.message_ids and batch.task is None:
+            self._chats.pop(chat_id, None)
+
+
+batcher = SpamBatcher()
@@ -0,0 +1,202 @@
+"""
+Takroriy spamni aniqlash (sliding window ichida fingerprint)
+
+Matn SimHash (64-bit) orqali, media esa file_unique_id orqali
+"barmoq izi"ga aylantiriladi. Hujjat va audio (kitoblar) hisobga olinmaydi:
+bir kitobni turli guruhlarga tashlash odatiy holat, spam emas.
+Reklama deb topilgan fingerprint belgilanadi
+va uning keyingi nusxalari regex tekshiruvisiz o'chiriladi. Bitta foydalanuvchi
+bir xil xabarni oyna ichida bir nechta guruhga tashlasa ham avtomatik
+belgilanadi (turli odamlar ulashgan yangilik yoki rasm spam hisoblanmaydi).
+"""
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from aiogram.types import Message
+from utils.ad_rules import normalize_text
+import config
+
+_TOKEN_RE = re.compile(r"\w+")
+_MASK64 = (1 << 64) - 1
+
+# 64 bitni 4 ta 16 bitlik bo'lakka ajratamiz: Hamming masofasi <= 3 bo'lsa,
+# kamida bitta bo'lak to'liq mos keladi (pigeonhole)
+_BANDS = 4
+_BAND_BITS = 64 // _BANDS
+_BAND_MASK = (1 << _BAND_BITS) - 1
+
+# Bitta fingerprint uchun kuzatiladigan yuboruvchilar soni (xotirani cheklash uchun)
+_MAX_SENDERS = 64
+
+
+# Har bir bitni alohida 8-bitlik "lane" ga yoyish jadvali: 64 ta bit hisoblagichini
+# bitta katta butun son ichida parallel qo'shish imkonini beradi (token boshiga 8 amal)
+_LANE_BITS = 8
+_SPREAD = [sum(((b >> j) & 1) << (_LANE_BITS * j) for j in range(8)) for b in range(256)]
+_LANE_MASK = (1 << _LANE_BITS) - 1
+
+
+def simhash(tokens: List[str]) -> int:
+    """Tokenlar ro'yxatidan 64-bitlik SimHash hisoblash (tokenlar soni < 256)"""
+    totals = 0
+    for token in tokens:
+        h = hash(token) & _MASK64
+        for k in range(8):
+            totals += _SPREAD[(h >> (8 * k)) & 0xFF] << (64 * k)
+    value = 0
+    half = len(tokens)
+    for bit in range(64):
+        # Bit ko'pchilik tokenlarda 1 bo'lsa, natijada ham 1
+        if ((totals >> (_LANE_BITS * bit)) & _LANE_MASK) * 2 > half:
+            value |= 1 << bit
+    return value
+
+
+def text_fingerprint(text: str) -> Optional[int]:
+    """Normallashtirilgan matn uchun SimHash (qisqa matn va buyruqlar uchun None)"""
+    if not text or text.startswith("/"):
+        return None
+    _, text_lower = normalize_text(text)
+    tokens = _TOKEN_RE.findall(text_lower)[:config.DUPLICATE_MAX_TOKENS]
+    if sum(len(t) for t in tokens) < config.DUPLICATE_MIN_TEXT_LENGTH:
+        return None
+    # So'zlar va qo'shni so'z juftliklari (tartib ham hisobga olinadi)
+    shingles = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return simhash(shingles)
+
+
+def media_fingerprint(message: Message) -> Optional[str]:
+    """Xabardagi media faylning file_unique_id si (stiker, ovoz, hujjat va audio bundan mustasno)"""
+    if message.photo:
+        return message.photo[-1].file_unique_id
+    for media in (message.video, message.animation, message.video_note):
+        if media:
+            return media.file_unique_id
+    return None
+
+
+def message_fingerprints(message: Message) -> List[Tuple[str, object]]:
+    """Xabarning barcha fingerprintlari: [('text', simhash), ('media', file_unique_id)]"""
+    fingerprints = []
+    text_fp = text_fingerprint(message.text or message.caption or "")
+    if text_fp is not None:
+        fingerprints.append(('text', text_fp))
+    media_fp = media_fingerprint(message)
+    if media_fp:
+        fingerprints.append(('media', media_fp))
+    return fingerprints
+
+
+class DuplicateDetector:
+    """Xotira hajmi cheklangan, vaqt oynasi bo'yicha takroriy xabarlar detektori"""
+
+    def __init__(self, window: float | None = None, max_entries: int | None = None,
+                 min_chats: int | None = None, max_distance: int | None = None):
+        self.window = window if window is not None else config.DUPLICATE_WINDOW_SECONDS
+        self.max_entries = max_entries if max_entries is not None else config.DUPLICATE_MAX_ENTRIES
+        self.min_chats = min_chats if min_chats is not None else config.DUPLICATE_MIN_CHATS
+        self.max_distance = max_distance if max_distance is not None else config.DUPLICATE_MAX_DISTANCE
+        # key -> {'last_seen': float, 'senders': {user_id: set(chat_id)}, 'flagged': bool};
+        # eng eski yozuv boshida turadi
+        self._entries: "OrderedDict[tuple, Dict]" = OrderedDict()
+        # SimHash bo'laklari bo'yicha indeks: [{band_value: set(simhash)}]
+        self._bands: List[Dict[int, set]] = [{} for _ in range(_BANDS)]
+        self.stats = {'observed': 0, 'duplicate_hits': 0, 'cross_chat_flags': 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _band_values(self, value: int):
+        for band in range(_BANDS):
+            yield band, (value >> (band * _BAND_BITS)) & _BAND_MASK
+
+    def _remove(self, key: tuple):
+        self._entries.pop(key, None)
+        kind, value = key
+        if kind == 'text':
+            for band, band_value in self._band_values(value):
+                bucket = self._bands[band].get(band_value)
+                if bucket is not None:
+                    bucket.discard(value)
+                    if not bucket:
+                        del self._bands[band][band_value]
+
+    def _evict(self, now: float):
+        """Muddati o'tgan va limitdan ortiq yozuvlarni o'chirish"""
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry['last_seen'] <= self.window and len(self._entries) <= self.max_entries:
+                break
+            self._remove(key)
+
+    def _resolve(self, kind: str, value) -> tuple:
+        """Matn uchun yaqin (Hamming <= max_distance) mavjud SimHash ni topish"""
+        if kind != 'text' or (kind, value) in self._entries:
+            return (kind, value)
+        for band, band_value in self._band_values(value):
+            for candidate in self._bands[band].get(band_value, ()):
+                if bin(candidate ^ value).count('1') <= self.max_distance:
+                    return ('text', candidate)
+        return (kind, value)
+
+    def _touch(self, key: tuple, now: float) -> Dict:
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = {'last_seen': now, 'senders': {}, 'flagged': False}
+            self._entries[key] = entry
+            kind, value = key
+            if kind == 'text':
+                for band, band_value in self._band_values(value):
+                    self._bands[band].setdefault(band_value, set()).add(value)
+        else:
+            entry['last_seen'] = now
+            self._entries.move_to_end(key)
+        return entry
+
+    def observe(self, fingerprints: List[Tuple[str, object]], chat_id: int, user_id: int) -> bool:
+        """
+        Xabarni qayd etish. Agar fingerprint avval reklama deb belgilangan bo'lsa
+        yoki oyna ichida bitta foydalanuvchi uni min_chats ta turli guruhga
+        tashlagan bo'lsa True qaytaradi.
+        """
+        if not fingerprints:
+            return False
+        now = time.monotonic()
+        self._evict(now)
+        self.stats['observed'] += 1
+        is_duplicate = False
+        for kind, value in fingerprints:
+            entry = self._touch(self._resolve(kind, value), now)
+            chats = entry['senders'].get(user_id)
+            if chats is None and len(entry['senders']) < _MAX_SENDERS:
+                chats = entry['senders'][user_id] = set()
+            if chats is not None and len(chats) < self.min_chats:
+                chats.add(chat_id)
+                if not entry['flagged'] and len(chats) >= self.min_chats:
+                    entry['flagged'] = True
+                    self.stats['cross_chat_flags'] += 1
+            is_duplicate = is_duplicate or entry['flagged']
+        if is_duplicate:
+            self.stats['duplicate_hits'] += 1
+        self._evict(now)
+        return is_duplicate
+
+    def is_flagged(self, fingerprints: List[Tuple[str, object]]) -> bool:
+        """Fingerprint oyna ichida reklama deb belgilanganmi (holat o'zgartirilmaydi)"""
+        now = time.monotonic()
+        for kind, value in fingerprints:
+            entry = self._entries.get(self._resolve(kind, value))
+            if entry is not None and entry['flagged'] and now - entry['last_seen'] <= self.window:
+                return True
+        return False
+
+    def flag(self, fingerprints: List[Tuple[str, object]]):
+        """Reklama deb topilgan xabarning fingerprintlarini belgilash"""
+        now = time.monotonic()
+        for kind, value in fingerprints:
+            self._touch(self._resolve(kind, value), now)['flagged'] = True
+        self._evict(now)
+
+
+detector = DuplicateDetector()
@@ -4,13 +4,15 @@ Majburiy obuna tekshirish funksiyalari
 from aiogram import Bot
 from aiogram.types import ChatMember, InlineKeyboardMarkup, InlineKeyboardButton
 from typing import List, Dict, Optional
-from database.db import Database
+from database.db import Database, get_db
 from utils.helpers import is_admin
+from utils.tracing import traced
 
-async def check_subscription(bot: Bot, user_id: int) -> Dict[str, bool]:
+@traced("subscription check")
+async def check_subscription(bot: Bot, user_id: int, db: Optional[Database] = None,
+                             channels: Optional[List[Dict]] = None) -> Dict[str, bool]:
     """Foydalanuvchining majburiy obuna kanallariga obuna ekanligini tekshirish"""
-    db = Database()
-    required_channels = db.get_required_channels()
+    required_channels = channels if channels is not None else (db or get_db()).get_required_channels()
     
     subscription_status = {}
     
@@ -24,25 +26,24 @@ async def check_subscription(bot: Bot, user_id: int) -> Dict[str, bool]:
     
     return subscription_status
 
-async def is_subscribed_to_all(bot: Bot, user_id: int) -> bool:
+async def is_subscribed_to_all(bot: Bot, user_id: int, db: Optional[Database] = None) -> bool:
     """Foydalanuvchi barcha majburiy kanallarga obuna ekanligini tekshirish"""
     # Adminlar majburiy obunadan mustasno
     if is_admin(user_id):
         return True
     
-    db = Database()
-    required_channels = db.get_required_channels()
+    required_channels = (db or get_db()).get_required_channels()
     
     # Agar majburiy obuna kanallari bo'lmasa, foydalanuvchi botdan foydalana oladi
     if not required_channels:
         return True
     
-    subscription_status = await check_subscription(bot, user_id)
+    subscription_status = await check_subscription(bot, user_id, channels=required_channels)
     return all(subscription_status.values())
 
-async def get_subscription_message_async(bot: Bot) -> tuple[str, Optional[InlineKeyboardMarkup]]:
+async def get_subscription_message_async(bot: Bot, db: Optional[Database] = None) -> tuple[str, Optional[InlineKeyboardMarkup]]:
     """Majburiy obuna haqida xabar matni va inline keyboard (private kanallar uchun linkni dinamik yaratadi)."""
-    db = Database()
+    db = db or get_db()
     required_channels = db.get_required_channels()
     if not required_channels:
         return "Majburiy obuna kanallari mavjud emas.", None
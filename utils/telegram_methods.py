@@ -0,0 +1,34 @@
+"""
+aiogram versiyasida hali mavjud bo'lmagan Bot API metodlari
+
+Bot API 7.0 da qo'shilgan ommaviy metodlar. Chaqirish: await bot(DeleteMessages(...))
+"""
+from typing import List, Optional, Union
+from aiogram.methods.base import TelegramMethod
+from aiogram.types import MessageId
+
+# deleteMessages / copyMessages bitta so'rovda qabul qiladigan maksimal xabarlar soni
+DELETE_MESSAGES_LIMIT = 100
+COPY_MESSAGES_LIMIT = 100
+
+
+class DeleteMessages(TelegramMethod[bool]):
+    """Bir nechta xabarni bitta so'rovda o'chirish (1-100 ta)"""
+
+    __returning__ = bool
+    __api_method__ = "deleteMessages"
+
+    chat_id: Union[int, str]
+    message_ids: List[int]
+
+
+class CopyMessages(TelegramMethod[List[MessageId]]):
+    """Bir nechta xabarni bitta so'rovda nusxalash (1-100 ta, albomlar saqlanadi)"""
+
+    __returning__ = List[MessageId]
+    __api_method__ = "copyMessages"
+
+    chat_id: Union[int, str]
+    from_chat_id: Union[int, str]
+    message_ids: List[int]
+    remove_caption: Optional[bool] = None
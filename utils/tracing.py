@@ -0,0 +1,162 @@
+"""
+Sekin update larni kuzatish (tracing)
+
+Har bir update uchun Trace yaratiladi (ContextVar orqali, handlerdan yaratilgan
+tasklarga ham o'tadi). Filtrlar, obuna tekshiruvi, SQLite va Bot API so'rovlari
+unga span sifatida yoziladi. TRACE_SLOW_THRESHOLD dan uzoq davom etgan update
+barcha spanlari bilan logga yoziladi, TRACE_PROFILE_SAMPLE_RATE ulushi esa
+cProfile bilan TRACE_PROFILE_DIR ga saqlanadi (pstats / snakeviz bilan ochiladi).
+"""
+import cProfile
+import functools
+import inspect
+import logging
+import os
+import random
+import time
+from contextvars import ContextVar, Token
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+import config
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar[Optional["Trace"]] = ContextVar('trace', default=None)
+# cProfile butun oqimni (boshqa tasklarni ham) o'lchaydi: bir vaqtda faqat bitta update profil qilinadi
+_profiling = False
+
+
+class Trace:
+    """Bitta update ning spanlari: (nom, boshlanish offseti, davomiyligi) soniyalarda"""
+
+    __slots__ = ('update_id', 'event', 'started', 'duration', 'spans', 'dropped', 'closed', 'profile_path')
+
+    def __init__(self, update_id: int, event: str):
+        self.update_id = update_id
+        self.event = event
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.spans: List[Tuple[str, float, float]] = []
+        self.dropped = 0
+        self.closed = False
+        self.profile_path: Optional[str] = None
+
+    def add(self, name: str, started: float, duration: float):
+        # Handler tugagandan keyin ishlayotgan fon tasklari trace ni o'zgartirmaydi
+        if self.closed:
+            return
+        if len(self.spans) >= config.TRACE_MAX_SPANS:
+            self.dropped += 1
+            return
+        self.spans.append((name, started - self.started, duration))
+
+    def close(self):
+        self.duration = time.perf_counter() - self.started
+        self.closed = True
+
+    def breakdown(self) -> str:
+        """Spanlar vaqt tartibida va nom bo'yicha jami (ichma-ich spanlar alohida sanaladi)"""
+        lines = [f"  +{offset:7.3f}s {duration:7.3f}s  {name}" for name, offset, duration in sorted(self.spans, key=lambda s: s[1])]
+        if self.dropped:
+            lines.append(f"  ... yana {self.dropped} ta span yozilmadi")
+        totals: Dict[str, list] = {}
+        for name, _, duration in self.spans:
+            total = totals.setdefault(name, [0, 0.0])
+            total[0] += 1
+            total[1] += duration
+        if totals:
+            lines.append("  jami: " + "; ".join(
+                f"{name} x{count} {seconds:.3f}s"
+                for name, (count, seconds) in sorted(totals.items(), key=lambda item: -item[1][1])
+            ))
+        return "\n".join(lines)
+
+
+def activate(trace: Trace) -> Token:
+    return _current.set(trace)
+
+
+def deactivate(token: Token):
+    _current.reset(token)
+
+
+def record(name: str, started: float, duration: float):
+    """Tayyor o'lchovni joriy trace ga yozish (trace bo'lmasa hech narsa qilmaydi)"""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, started, duration)
+
+
+@contextmanager
+def span(name: str):
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, started, time.perf_counter() - started)
+
+
+def traced(name: str):
+    """Async funksiya yoki filtr uchun dekorator: har bir chaqiruv span sifatida yoziladi"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await func(*args, **kwargs)
+        # aiogram argumentlarni getfullargspec bo'yicha uzatadi (__wrapped__ ga qaramaydi)
+        wrapper.__signature__ = inspect.signature(func)
+        return wrapper
+    return decorator
+
+
+def observe_db_query(statement: str, seconds: float):
+    """database.add_query_hook uchun"""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(f"db {statement}", time.perf_counter() - seconds, seconds)
+
+
+def start_profile() -> Optional[cProfile.Profile]:
+    """Tasodifiy tanlangan update uchun cProfile ni yoqish (boshqasi profil qilinayotgan bo'lsa - yo'q)"""
+    global _profiling
+    if _profiling or config.TRACE_PROFILE_SAMPLE_RATE <= 0 or random.random() >= config.TRACE_PROFILE_SAMPLE_RATE:
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Boshqa profiler (masalan, tashqi vosita) allaqachon ishlayapti
+        return None
+    _profiling = True
+    return profiler
+
+
+def finish(trace: Trace, profiler: Optional[cProfile.Profile] = None):
+    """Trace ni yopish: profilni saqlash va sekin bo'lsa logga yozish"""
+    global _profiling
+    trace.close()
+    if profiler is not None:
+        profiler.disable()
+        _profiling = False
+        try:
+            os.makedirs(config.TRACE_PROFILE_DIR, exist_ok=True)
+            trace.profile_path = os.path.join(
+                config.TRACE_PROFILE_DIR,
+                f"{time.strftime('%Y%m%d-%H%M%S')}_{trace.update_id}_{trace.event}_{int(trace.duration * 1000)}ms.prof"
+            )
+            profiler.dump_stats(trace.profile_path)
+        except OSError as e:
+            logger.warning(f"Profilni saqlashda xatolik: {e}")
+            trace.profile_path = None
+
+    if trace.duration >= config.TRACE_SLOW_THRESHOLD:
+        logger.warning(
+            "Sekin update #%s (%s): %.3f s, %d ta span%s\n%s",
+            trace.update_id, trace.event, trace.duration, len(trace.spans),
+            f", profil: {trace.profile_path}" if trace.profile_path else "",
+            trace.breakdown()
+        )